@@ -0,0 +1,89 @@
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# modules that should only be loaded on first use, not by `import defermi`
+LAZY_MODULES = [
+    'matplotlib.pyplot',
+    'pandas',
+    'mp_api',
+    'pymatgen.analysis.defects',
+    'pymatgen.analysis.phase_diagram',
+    'pymatgen.io.vasp',
+    'defermi.plotter',
+    'defermi.corrections.kumagai',
+    'defermi.corrections.freysoldt',
+    'defermi.chempots.generator',
+    ]
+
+
+def time_import(module='defermi', repeats=5):
+    """
+    Time the import of a module in fresh interpreter processes.
+
+    Parameters
+    ----------
+    module : str
+        Name of the module to import.
+    repeats : int
+        Number of fresh processes to spawn.
+
+    Returns
+    -------
+    timings : list
+        Import times in seconds, one per process.
+    """
+    code = (
+        'import time; t0 = time.perf_counter(); '
+        f'import {module}; '
+        'print(time.perf_counter() - t0)'
+        )
+    timings = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def get_loaded_modules(module='defermi', modules=None):
+    """
+    Check which of `modules` are loaded after importing `module` in a fresh process.
+
+    Returns
+    -------
+    loaded : dict
+        Dictionary with module names as keys and bools as values.
+    """
+    modules = modules or LAZY_MODULES
+    code = (
+        f'import sys, json; import {module}; '
+        f'print(json.dumps({{m: m in sys.modules for m in {modules!r}}}))'
+        )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of defermi.')
+    parser.add_argument('-m', '--module', default='defermi', help='Module to import (default: defermi)')
+    parser.add_argument('-n', '--repeats', type=int, default=5, help='Number of fresh processes (default: 5)')
+    args = parser.parse_args()
+
+    timings = time_import(args.module, args.repeats)
+    result = {
+        'module': args.module,
+        'repeats': args.repeats,
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'timings': timings,
+        'loaded_lazy_modules': [m for m, v in get_loaded_modules(args.module).items() if v],
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
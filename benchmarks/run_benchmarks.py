@@ -0,0 +1,163 @@
+"""
+Benchmark suite for the thermodynamics hot paths of defermi.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py -o bench_output.json
+
+Results are written as json with timings in seconds for each benchmark,
+together with the parameters of the run and version information, so that
+runs on different versions can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+
+sys.path.insert(0,os.path.dirname(os.path.abspath(__file__)))
+
+from bench_import import time_import
+import synthetic
+
+
+def time_function(function,repeats=3):
+    """
+    Time a function call `repeats` times, after an untimed warm-up call
+    (lazy imports are not counted).
+
+    Returns
+    -------
+    timings : dict
+        Dictionary with "min", "median", "mean" and "timings" (all in seconds).
+    """
+    function()
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - t0)
+    return {'min':min(timings),'median':statistics.median(timings),'mean':statistics.mean(timings),'timings':timings}
+
+
+def get_benchmarks(tmpdir,ndopants=2,ncharges=3,npoints=20,supercell=5,temperature=1000,quench_temperature=300):
+    """
+    Build the benchmarks.
+
+    Parameters
+    ----------
+    tmpdir : str
+        Directory for the files written by the benchmarks, must exist while they run.
+
+    Returns
+    -------
+    benchmarks : dict
+        Dictionary with benchmark names as keys and functions without arguments as values.
+    info : dict
+        Size of the synthetic inputs.
+    """
+    from defermi.structure import defect_finder
+    from defermi.analysis import DefectsAnalysis
+    from defermi.thermodynamics import DefectThermodynamics
+
+    da, chempots = synthetic.get_synthetic_analysis(ndopants=ndopants,ncharges=ncharges)
+    reservoirs = synthetic.get_synthetic_reservoirs(chempots,temperature=temperature,npoints=npoints)
+    bulk, defect = synthetic.get_supercell_with_defects(size=supercell)
+    doses = {'mdos':synthetic.get_effective_mass_dos(),'dos':synthetic.get_explicit_dos()}
+    ef = synthetic.BAND_GAP/2
+    doping_specie = {'name':'Dop','charge':1}
+
+    json_path = os.path.join(tmpdir,'analysis.json')
+    da.to_json(json_path)
+
+    benchmarks = {}
+    benchmarks['defect_concentrations'] = lambda: da.defect_concentrations(chempots,temperature,fermi_level=ef)
+    benchmarks['charge_transition_levels'] = lambda: da.charge_transition_levels()
+    for label, dos in doses.items():
+        dt = DefectThermodynamics(da,bulk_dos=dos)
+        benchmarks[f'solve_fermi_level[{label}]'] = (
+            lambda dos=dos: da.solve_fermi_level(chempots,bulk_dos=dos,temperature=temperature,xtol=1e-05))
+        benchmarks[f'brouwer[{label}]'] = (
+            lambda dt=dt: dt.get_pO2_thermodata(reservoirs,temperature=temperature))
+        benchmarks[f'brouwer_quenched[{label}]'] = (
+            lambda dt=dt: dt.get_pO2_quenched_thermodata(reservoirs,temperature,quench_temperature))
+        benchmarks[f'doping[{label}]'] = (
+            lambda dt=dt: dt.get_variable_species_thermodata(doping_specie,(1e10,1e20),chempots,temperature,npoints=npoints))
+        benchmarks[f'doping_quenched[{label}]'] = (
+            lambda dt=dt: dt.get_variable_species_quenched_thermodata(doping_specie,(1e10,1e20),chempots,
+                                                                    temperature,quench_temperature,npoints=npoints))
+        dt_fast = DefectThermodynamics(da,bulk_dos=dos,engine='fast')
+        benchmarks[f'brouwer_quenched[{label},fast]'] = (
+            lambda dt=dt_fast: dt.get_pO2_quenched_thermodata(reservoirs,temperature,quench_temperature))
+    benchmarks['defect_finder'] = lambda: defect_finder(defect,bulk)
+    benchmarks['json_save'] = lambda: da.to_json(json_path)
+    benchmarks['json_load'] = lambda: DefectsAnalysis.from_json(json_path)
+
+    info = {
+        'entries':len(da.entries),
+        'elements':len(chempots),
+        'supercell_sites':len(bulk),
+        }
+    return benchmarks, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run defermi benchmarks and write timings as json.')
+    parser.add_argument('--dopants',type=int,default=2,help='Number of dopant elements in the synthetic analysis (default: 2)')
+    parser.add_argument('--charges',type=int,default=3,help='Number of charge states per defect species (default: 3)')
+    parser.add_argument('--npoints',type=int,default=20,help='Number of points in sweeps (default: 20)')
+    parser.add_argument('--supercell',type=int,default=5,help='Supercell size for defect_finder (default: 5)')
+    parser.add_argument('--repeats',type=int,default=3,help='Number of repeats for each benchmark (default: 3)')
+    parser.add_argument('-k','--select',default=None,help='Run only benchmarks whose name contains this string')
+    parser.add_argument('-o','--output',default=None,help='Output json file, if not set results are printed')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore') # residual charge warnings from synthetic data
+
+    params = {
+        'ndopants':args.dopants,
+        'ncharges':args.charges,
+        'npoints':args.npoints,
+        'supercell':args.supercell,
+        }
+    results = {}
+    if not args.select or args.select in 'import':
+        timings = time_import('defermi',args.repeats)
+        results['import'] = {'min':min(timings),'median':statistics.median(timings),
+                             'mean':statistics.mean(timings),'timings':timings}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        benchmarks, info = get_benchmarks(tmpdir,**params)
+        for name, function in benchmarks.items():
+            if args.select and args.select not in name:
+                continue
+            results[name] = time_function(function,repeats=args.repeats)
+            print(f'{name:40s} {results[name]["median"]:.4f} s',file=sys.stderr)
+    params['repeats'] = args.repeats
+    params.update(info)
+
+    try:
+        from importlib.metadata import version
+        defermi_version = version('defermi')
+    except Exception:
+        defermi_version = None
+    output = {
+        'defermi_version':defermi_version,
+        'python_version':platform.python_version(),
+        'platform':platform.platform(),
+        'date':datetime.now(timezone.utc).isoformat(),
+        'parameters':params,
+        'results':results,
+        }
+    if args.output:
+        with open(args.output,'w') as file:
+            json.dump(output,file,indent=2)
+    else:
+        print(json.dumps(output,indent=2))
+
+
+if __name__ == '__main__':
+    main()
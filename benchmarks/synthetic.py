@@ -0,0 +1,131 @@
+"""
+Synthetic inputs for benchmarks: DefectsAnalysis of configurable size,
+effective mass and explicit DOS, pressure reservoirs and large supercells.
+"""
+import warnings
+import numpy as np
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+
+from defermi.analysis import DefectsAnalysis
+from defermi.chempots.core import Chempots
+from defermi.chempots.oxygen import get_oxygen_chempot_from_pO2
+from defermi.chempots.reservoirs import PressureReservoirs
+from defermi.defects import get_defect_from_string
+from defermi.entries import DefectEntry
+
+HOST = ['Sr','Ti','O']
+CATIONS = ['Sr','Ti']
+DOPANTS = ['La','Nb','Fe','Al','Ga','Sc','Y','Mn','Co','Ni','Cu','Zn','Mg','Ca','Ba',
+           'Zr','Hf','Ta','V','Cr','In','Ce','Pr','Nd','Sm','Eu','Gd','Dy','Er','Yb']
+CHEMPOTS = {'Sr':-5.0,'Ti':-10.0,'O':-7.0}
+BAND_GAP = 3.2
+BULK_VOLUME = 59.319 * 8 # 2x2x2 perovskite supercell
+
+
+def get_unit_cell():
+    """
+    Cubic SrTiO3 unit cell.
+    """
+    return Structure(Lattice.cubic(3.905),['Sr','Ti','O','O','O'],
+                     [[0,0,0],[0.5,0.5,0.5],[0.5,0.5,0],[0.5,0,0.5],[0,0.5,0.5]])
+
+
+def get_defect_names(ndopants=2):
+    """
+    Names of vacancies, oxygen interstitial and substitutions of `ndopants` dopants on cation sites.
+    """
+    if ndopants > len(DOPANTS):
+        raise ValueError(f'Max number of dopants is {len(DOPANTS)}')
+    names = [f'Vac_{el}' for el in HOST] + ['Int_O']
+    for dop in DOPANTS[:ndopants]:
+        for host in CATIONS:
+            names.append(f'Sub_{dop}_on_{host}')
+    return names
+
+
+def get_synthetic_analysis(ndopants=2,ncharges=3,seed=0):
+    """
+    DefectsAnalysis with random formation energies.
+
+    Parameters
+    ----------
+    ndopants : int
+        Number of dopant elements, each one substituting on both cation sites.
+    ncharges : int
+        Number of charge states for each defect species.
+    seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    da : DefectsAnalysis
+    chempots : Chempots
+        Chemical potentials for all elements.
+    """
+    rng = np.random.default_rng(seed)
+    chempots = CHEMPOTS.copy()
+    for dop in DOPANTS[:ndopants]:
+        chempots[dop] = -5.0 + rng.uniform(-2,2)
+    chempots = Chempots(chempots)
+
+    entries = []
+    for name in get_defect_names(ndopants):
+        sign = -1 if name.startswith('Vac_Sr') or name.startswith('Vac_Ti') or name.startswith('Int') else 1
+        charges = [sign*q for q in range(ncharges)]
+        for q in charges:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore') # bulk structure not stored
+                defect = get_defect_from_string(name,charge=q,multiplicity=1,bulk_volume=BULK_VOLUME)
+            # formation energy at VBM between 1 and 5 eV, transition levels inside the gap
+            eform = rng.uniform(1,5) + abs(q)*rng.uniform(0,BAND_GAP/2)
+            energy_diff = eform + sum([defect.delta_atoms[el]*chempots[el] for el in defect.delta_atoms])
+            entries.append(DefectEntry(defect,energy_diff=energy_diff))
+
+    return DefectsAnalysis(entries,band_gap=BAND_GAP,vbm=0), chempots
+
+
+def get_effective_mass_dos():
+    """
+    DOS with effective masses.
+    """
+    return {'m_eff_e':0.5,'m_eff_h':0.4}
+
+
+def get_explicit_dos(npoints=2000):
+    """
+    Explicit DOS dict with parabolic bands on a uniform energy grid.
+    """
+    energies = np.linspace(-6,BAND_GAP+6,npoints)
+    densities = np.zeros(npoints)
+    vb = energies < 0
+    cb = energies > BAND_GAP
+    densities[vb] = 2*np.sqrt(-energies[vb])
+    densities[cb] = 2*np.sqrt(energies[cb]-BAND_GAP)
+    return {'energies':energies,'densities':densities,'structure':get_unit_cell()}
+
+
+def get_synthetic_reservoirs(chempots,temperature=1000,pressure_range=(1e-20,1e10),npoints=50):
+    """
+    PressureReservoirs with variable oxygen chempot and constant chempots for other elements.
+    """
+    res_dict = {}
+    muO_ref = chempots['O'] + 2 # reference at O-rich conditions
+    for p in np.logspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints):
+        mu = chempots.copy()
+        mu['O'] = get_oxygen_chempot_from_pO2(temperature,p,muO_reference=muO_ref)
+        res_dict[float(p)] = mu
+    return PressureReservoirs(res_dict,temperature=temperature,mu_refs=Chempots({el:0 for el in chempots}))
+
+
+def get_supercell_with_defects(size=5):
+    """
+    Bulk and defect supercells (size x size x size) with an oxygen vacancy and a La substitution on Sr.
+    """
+    bulk = get_unit_cell() * (size,size,size)
+    defect = bulk.copy()
+    defect.replace(0,'La')
+    oxygen_index = [i for i,site in enumerate(defect) if site.specie.symbol == 'O'][0]
+    defect.remove_sites([oxygen_index])
+    return bulk, defect
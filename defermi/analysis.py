@@ -1,38 +1,28 @@
 
 import numpy as np
-from scipy.optimize import bisect, root_scalar, minimize_scalar, minimize
 from monty.json import MontyDecoder, MSONable, MontyEncoder
 from abc import ABCMeta
-import pandas as pd
 import os
 import os.path as op
 import json
 import copy
 import warnings
-import matplotlib.pyplot as plt
 
 from .chempots.core import Chempots
 from .chempots.reservoirs import Reservoirs
-from .chempots.generator import generate_chempots_from_mp, generate_pressure_reservoirs_from_precursors
-from .chempots.oxygen import get_pressure_reservoirs_from_precursors, get_oxygen_pressure_reservoirs
-from .corrections.kumagai import get_kumagai_correction
-from .corrections.freysoldt import get_freysoldt_correction_from_locpot
 from .defects import Defect, get_defect_from_string
-from .electronic_structure import get_carrier_concentrations
-from .entries import DefectEntry, _get_computed_entry_from_path
-from .plotter import (
-                    plot_pO2_vs_concentrations,
-                    plot_variable_species_vs_concentrations,
-                    plot_binding_energies,
-                    plot_formation_energies,
-                    plot_charge_transition_levels
-                    )
+from .engines import check_engine, CarriersKernel, DefectsKernel
+from .entries import DefectEntry
+from .instrumentation import is_collecting, record_solve, stage_timer
 from .tools.utils import get_object_feature, select_objects, sort_objects
 
+# Plotting, charge corrections, Materials Project access and VASP I/O are 
+# imported inside the methods that use them to keep `import defermi` fast.
+
 
 class DefectsAnalysis(MSONable,metaclass=ABCMeta):
     
-    def __init__(self, entries, band_gap, vbm=0, sort_entries=True):
+    def __init__(self, entries, band_gap, vbm=0, sort_entries=True, engine='reference'):
         """ 
         Class to compute collective properties starting from single calculations of point defects.
 
@@ -44,11 +34,18 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             Band gap of the pristine material in eV.
         vbm: float
             Valence band maximum of the pristine material in eV.
+        engine : str
+            Engine used to compute concentrations and to solve charge neutrality.
+            "reference" evaluates each entry separately, "fast" evaluates all entries 
+            at once with numpy arrays and reuses the DOS integration setup within a solve.
+            Entries with custom formation energy or concentration functions are always 
+            computed with the "reference" engine.
 
         """
         self.entries = self.sort_entries(inplace=False,entries=entries) if sort_entries else entries
         self.band_gap = band_gap
         self.vbm = vbm
+        self.engine = check_engine(engine)
         self.groups = self._group_entries()
         self.names = list(self.groups.keys())
         self._thermodata = None
@@ -83,7 +80,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         return groups
             
     def copy(self):
-        return DefectsAnalysis(entries=self.entries,band_gap=self.band_gap,vbm=self.vbm)
+        return DefectsAnalysis(entries=self.entries,band_gap=self.band_gap,vbm=self.vbm,engine=self.engine)
     
     @property
     def chempots(self):
@@ -137,7 +134,8 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         "@class": self.__class__.__name__,
         "entries" : [e.as_dict() for e in self.entries],
         "vbm":self.vbm,
-        "band_gap":self.band_gap
+        "band_gap":self.band_gap,
+        "engine":self.engine
             }
         return d
 
@@ -161,7 +159,8 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         entries = [DefectEntry.from_dict(e) for e in d['entries']]        
         vbm = d['vbm']
         band_gap = d['band_gap']
-        return cls(entries,vbm,band_gap)
+        engine = d.get('engine','reference')
+        return cls(entries,band_gap=band_gap,vbm=vbm,engine=engine)
 
 
     @staticmethod
@@ -243,6 +242,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         Check docs in `from_dataframe` function for file formatting requirements.
 
         """
+        import pandas as pd
         if '.json' in filename or format == 'json':
             return DefectsAnalysis.from_json(filename)
         elif '.pkl' in filename or format == 'pkl':
@@ -386,6 +386,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                     if dielectric_tensor:
                         ck['dielectric_tensor'] = dielectric_tensor
                     ck['get_correction_data'] = False
+                    from .corrections.kumagai import get_kumagai_correction
                     corr = get_kumagai_correction(**ck)
 
                 elif get_charge_correction == 'freysoldt':
@@ -396,11 +397,13 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                     ck['finder_kwargs'] = finder_kwargs
                     if dielectric_tensor:
                         ck['dielectric_tensor'] = dielectric_tensor
+                    from .corrections.freysoldt import get_freysoldt_correction_from_locpot
                     corr = get_freysoldt_correction_from_locpot(**ck)
 
                 if get_charge_correction:
                     if type(corr) == tuple:
                         corr = corr[0]
+                        import matplotlib.pyplot as plt
                         plt.show()
                     entry.set_corrections(**{get_charge_correction:corr})
         
@@ -482,6 +485,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                     d[key] = fn(e)        
 
             table.append(d)
+        import pandas as pd
         df = pd.DataFrame(table)
 
         return df
@@ -634,6 +638,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                 Absolute value of electron concentration in 1/cm^3
 
         """   
+        from .electronic_structure import get_carrier_concentrations
         return get_carrier_concentrations(
                                     dos=bulk_dos,
                                     fermi_level=fermi_level,
@@ -717,6 +722,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                             fixed_concentrations=None,
                             per_unit_volume=True,
                             eform_kwargs={},
+                            engine=None,
                             **kwargs):
         """
         Compute concentrations of all defects.
@@ -766,6 +772,8 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             Get concentrations in cm^-3. If False they are per unit cell.
         eform_kwargs : dict
                 Kwargs to pass to `self.formation_energy`.
+        engine : str
+            "reference" or "fast". If None `self.engine` is used.
         kwargs : dict
             Additional custom kwargs to pass to `entry.defect_concentration`.
 
@@ -775,6 +783,17 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             DefectConcentrations object, behaves like a list.
 
         """
+        if self._use_fast_engine(engine):
+            concs = DefectsKernel(self).concentrations(
+                                                chemical_potentials=chemical_potentials,
+                                                temperature=temperature,
+                                                fermi_level=fermi_level,
+                                                fixed_concentrations=fixed_concentrations,
+                                                per_unit_volume=per_unit_volume)
+            return DefectConcentrations([
+                        SingleDefConc(name=e.name,charge=e.charge,conc=float(c)) 
+                        for e,c in zip(self.entries,concs)])
+        
         concentrations = []
         if fixed_concentrations:
             dc = self.defect_concentrations(
@@ -822,6 +841,11 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         return DefectConcentrations(concentrations)
 
 
+    def _use_fast_engine(self,engine=None):
+        engine = check_engine(engine or self.engine)
+        return engine == 'fast' and DefectsKernel.is_supported(self)
+
+
     def _get_frozen_correction(self,e,frozen,dc):
         corr = 1
         lower_limit = 1e-250
@@ -902,7 +926,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             self.entries = output_entries
             return
         else:
-            return DefectsAnalysis(entries=output_entries, band_gap=self.band_gap, vbm=self.vbm)
+            return DefectsAnalysis(entries=output_entries, band_gap=self.band_gap, vbm=self.vbm, engine=self.engine)
 
 
     def formation_energies(self,
@@ -1031,7 +1055,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                 if da.vbm != previous_da.vbm and da.band_gap != previous_da.band_gap:
                     raise ValueError('Cannot merge entries, band gap and VBM are different')
             new_entries = new_entries + da.entries
-        return DefectsAnalysis(entries=new_entries, band_gap=self.band_gap, vbm=self.vbm)
+        return DefectsAnalysis(entries=new_entries, band_gap=self.band_gap, vbm=self.vbm, engine=self.engine)
         
 
     def plot_brouwer_diagram(self,
@@ -1050,6 +1074,8 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                             xtol=1e-20,
                             eform_kwargs={},
                             dconc_kwargs={},
+                            adaptive=False,
+                            adaptive_kwargs={},
                             **kwargs):
         """
         Plot Brouwer diagram (defect concentrations vs oxygen partial pressure). Wrapper function for 
@@ -1129,13 +1155,21 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         pressure_range : tuple
             Range in which to evaluate the partial pressure. Only used if `reservoirs` are not provided.
         npoints : int
-            Number of data points to interpolate the partial pressure with.
+            Number of data points to interpolate the partial pressure with. If `adaptive` is True,
+            number of points of the initial grid.
         xtol : float
             Tolerance for bisect (scipy) to solve charge neutrality.
         eform_kwargs : dict
             Kwargs to pass to `entry.formation_energy`.
         dconc_kwargs : dict
             Kwargs to pass to `entry.defect_concentration`.
+        adaptive : bool
+            Refine the partial pressure grid where the Fermi level or the concentrations change
+            regime, instead of using `npoints` uniformly spaced points. Requires `precursors` and 
+            `oxygen_ref` instead of `reservoirs`. See `DefectThermodynamics.get_pO2_adaptive_thermodata`.
+        adaptive_kwargs : dict
+            Kwargs to pass to `DefectThermodynamics.get_pO2_adaptive_thermodata` 
+            ("max_npoints", "fermi_level_tol", "concentration_tol").
         kwargs: dict
             Kwargs to pass to `plot_pO2_vs_concentrations`.
 
@@ -1145,39 +1179,17 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             matplotlib object.
 
         """
+        from .plotter import plot_pO2_vs_concentrations
         from .thermodynamics import DefectThermodynamics
         
         # if reservoirs not provided, use precursors
-        if not reservoirs:
-            # if precursor energies not provided, pull from MP
-            if type(precursors) in (str,list):
-                reservoirs = generate_pressure_reservoirs_from_precursors(
-                                                        precursors=precursors,
-                                                        temperature=temperature,
-                                                        oxygen_ref=oxygen_ref,
-                                                        pressure_range=pressure_range,
-                                                        npoints=npoints)
-                
-            # if precursors not provided, if only oxygen is present use oxygen_ref
-            elif not precursors:
-                if self.elements != ['O']:
-                    raise ValueError('You need to either directly provide reservoirs, or precursors + oxygen chempot reference')
-                if not oxygen_ref:
-                    raise ValueError('You need to provide the oxygen chempot reference when using precursors')
-
-                if self.elements == ['O']:
-                    reservoirs = get_oxygen_pressure_reservoirs(
-                                                                oxygen_ref=oxygen_ref,
-                                                                temperature=temperature,
-                                                                pressure_range=pressure_range,
-                                                                npoints=npoints)
-            else:
-                reservoirs = get_pressure_reservoirs_from_precursors(
-                                                                    precursors=precursors,
-                                                                    oxygen_ref=oxygen_ref,
-                                                                    temperature=temperature,
-                                                                    pressure_range=pressure_range,
-                                                                    npoints=npoints)
+        if not reservoirs and not adaptive:
+            reservoirs = self._generate_pressure_reservoirs(
+                                                    temperature=temperature,
+                                                    precursors=precursors,
+                                                    oxygen_ref=oxygen_ref,
+                                                    pressure_range=pressure_range,
+                                                    npoints=npoints)
             # store reservoirs
             self._chempots = reservoirs
                 
@@ -1190,8 +1202,29 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                                                 eform_kwargs=eform_kwargs,
                                                 dconc_kwargs=dconc_kwargs)
         
+        if adaptive:
+            if reservoirs:
+                raise ValueError('Adaptive pressure grid requires precursors and oxygen_ref instead of reservoirs')
+            def get_reservoirs(partial_pressures):
+                return self._generate_pressure_reservoirs(
+                                                    temperature=temperature,
+                                                    precursors=precursors,
+                                                    oxygen_ref=oxygen_ref,
+                                                    partial_pressures=partial_pressures)
+            thermodata = defects_thermo.get_pO2_adaptive_thermodata(
+                                                            get_reservoirs=get_reservoirs,
+                                                            pressure_range=pressure_range,
+                                                            temperature=temperature,
+                                                            npoints=npoints,
+                                                            quench_temperature=quench_temperature,
+                                                            quenched_species=quenched_species,
+                                                            quench_elements=quench_elements,
+                                                            name='QuenchedBrowerDiagram' if quench_temperature else 'BrowerDiagram',
+                                                            **adaptive_kwargs)
+            # store reservoirs
+            self._chempots = get_reservoirs(thermodata.partial_pressures)
         # if quenching temperature is provided, use quenched routine
-        if quench_temperature:
+        elif quench_temperature:
             thermodata = defects_thermo.get_pO2_quenched_thermodata(
                                                                     reservoirs=reservoirs,
                                                                     initial_temperature=temperature,
@@ -1334,6 +1367,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         self._thermodata = thermodata
         if 'xlim' not in kwargs.keys():
             kwargs['xlim'] = concentration_range
+        from .plotter import plot_variable_species_vs_concentrations
         plt = plot_variable_species_vs_concentrations(thermodata, **kwargs)
 
         return plt
@@ -1418,6 +1452,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             matplotlib object.
         
         """
+        from .plotter import plot_formation_energies
         entries = entries or self.entries
         kwargs = {
             'entries':entries,
@@ -1506,6 +1541,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             matplotlib object.
         
         """        
+        from .plotter import plot_binding_energies
         return plot_binding_energies(entries=self.entries,
                                     vbm=self.vbm,
                                     band_gap=self.band_gap,
@@ -1558,6 +1594,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             matplotlib object.
         
         """        
+        from .plotter import plot_charge_transition_levels
         entries = entries or self.entries
         return plot_charge_transition_levels(entries=entries,
                                             vbm=self.vbm,
@@ -1704,7 +1741,9 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                         external_defects=[],
                         xtol=1e-20,
                         eform_kwargs={},
-                        dconc_kwargs={}):
+                        dconc_kwargs={},
+                        engine=None,
+                        fermi_level_guess=None):
         """
         Solve charge neutrality and get the value of Fermi level at thermodynamic equilibrium.
         
@@ -1757,6 +1796,12 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             Kwargs to pass to `entry.formation_energy`.
         dconc_kwargs : dict
             Kwargs to pass to `entry.defect_concentration`.
+        engine : str
+            "reference" or "fast". If None `self.engine` is used.
+        fermi_level_guess : float
+            Estimate of the Fermi level (e.g. from `defermi.engines.BrouwerApproximation`). 
+            Bisection is restricted to a 0.2 eV window around the guess if it brackets the 
+            solution, otherwise the whole range is used.
 
         Returns
         -------
@@ -1766,20 +1811,49 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         """
         if type(chemical_potentials) in (tuple, list):
             chemical_potentials = self._generate_chemical_potentials(target=chemical_potentials)
-        def _get_total_q(ef):
-            qd_tot = self._get_total_charge(fermi_level=ef,
-                                            chemical_potentials=chemical_potentials,
-                                            bulk_dos=bulk_dos,
+        if self._use_fast_engine(engine):
+            defects_kernel = DefectsKernel(self)
+            carriers_kernel = CarriersKernel(bulk_dos,band_gap=self.band_gap)
+            qd_ext = sum([d_ext['charge'] * d_ext['conc'] for d_ext in external_defects])
+            mu = defects_kernel.get_chempots_vector(chemical_potentials)
+            def _get_total_q(ef):
+                qd_tot = defects_kernel.total_charge(
+                                            chemical_potentials=mu,
                                             temperature=temperature,
-                                            fixed_concentrations=fixed_concentrations,
-                                            external_defects=external_defects,
-                                            eform_kwargs=eform_kwargs,
-                                            dconc_kwargs=dconc_kwargs)
-            return qd_tot
+                                            fermi_level=ef,
+                                            fixed_concentrations=fixed_concentrations)
+                h, n = carriers_kernel(fermi_level=ef,temperature=temperature)
+                return float(qd_tot + qd_ext + h - n)
+        else:
+            def _get_total_q(ef):
+                qd_tot = self._get_total_charge(fermi_level=ef,
+                                                chemical_potentials=chemical_potentials,
+                                                bulk_dos=bulk_dos,
+                                                temperature=temperature,
+                                                fixed_concentrations=fixed_concentrations,
+                                                external_defects=external_defects,
+                                                eform_kwargs=eform_kwargs,
+                                                dconc_kwargs=dconc_kwargs)
+                return qd_tot
         
-        root = bisect(_get_total_q, -1, self.band_gap + 1.,xtol=xtol) # set full_output=True for bisect info 
+        from scipy.optimize import bisect
+        bracket = (-1, self.band_gap + 1.)
+        nguess_calls = 0
+        if fermi_level_guess is not None:
+            window = (fermi_level_guess - 0.1, fermi_level_guess + 0.1)
+            nguess_calls = 2
+            if _get_total_q(window[0]) * _get_total_q(window[1]) < 0:
+                bracket = window
+        root, info = bisect(_get_total_q, *bracket,xtol=xtol,full_output=True)
     
         qd_tot = _get_total_q(root)
+        if is_collecting():
+            record_solve(
+                        iterations=info.iterations,
+                        function_calls=info.function_calls + nguess_calls + 1,
+                        residual=qd_tot,
+                        fermi_level=root,
+                        temperature=temperature)
         if abs(qd_tot) > 1e10:
             warnings.warn(
                     f"Fermi level solver with xtol={xtol} yields high residual charge: "
@@ -1953,6 +2027,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
                         key = feature
                     d[key] = get_object_feature(e,feature)
             table.append(d)
+        import pandas as pd
         df = pd.DataFrame(table)
         return df
     
@@ -1988,6 +2063,7 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
             qd_tot += d_ext['charge'] * d_ext['conc']
 
         # charge carriers (holes and electrons)
+        from .electronic_structure import get_carrier_concentrations
         h, n = get_carrier_concentrations(
                                 dos=bulk_dos,
                                 fermi_level=fermi_level,
@@ -1997,10 +2073,61 @@ class DefectsAnalysis(MSONable,metaclass=ABCMeta):
         return qd_tot
 
 
+    def _generate_pressure_reservoirs(self,
+                                    temperature,
+                                    precursors=None,
+                                    oxygen_ref=None,
+                                    pressure_range=(1e-20,1e10),
+                                    npoints=50,
+                                    partial_pressures=None):
+        """
+        Generate PressureReservoirs from precursors and oxygen reference chempot.
+        If precursors are provided as str or list the energies are pulled from the Materials Project database.
+        If precursors are not provided only oxygen defects are allowed.
+        If `partial_pressures` are provided `pressure_range` and `npoints` are ignored.
+        """
+        from .chempots.generator import generate_pressure_reservoirs_from_precursors
+        from .chempots.oxygen import get_pressure_reservoirs_from_precursors, get_oxygen_pressure_reservoirs
+        with stage_timer('reservoirs'):
+            # if precursor energies not provided, pull from MP
+            if type(precursors) in (str,list):
+                reservoirs = generate_pressure_reservoirs_from_precursors(
+                                                        precursors=precursors,
+                                                        temperature=temperature,
+                                                        oxygen_ref=oxygen_ref,
+                                                        pressure_range=pressure_range,
+                                                        npoints=npoints,
+                                                        partial_pressures=partial_pressures)
+            
+            # if precursors not provided, if only oxygen is present use oxygen_ref
+            elif not precursors:
+                if self.elements != ['O']:
+                    raise ValueError('You need to either directly provide reservoirs, or precursors + oxygen chempot reference')
+                if not oxygen_ref:
+                    raise ValueError('You need to provide the oxygen chempot reference when using precursors')
+
+                reservoirs = get_oxygen_pressure_reservoirs(
+                                                            oxygen_ref=oxygen_ref,
+                                                            temperature=temperature,
+                                                            pressure_range=pressure_range,
+                                                            npoints=npoints,
+                                                        partial_pressures=partial_pressures)
+            else:
+                reservoirs = get_pressure_reservoirs_from_precursors(
+                                                                    precursors=precursors,
+                                                                    oxygen_ref=oxygen_ref,
+                                                                    temperature=temperature,
+                                                                    pressure_range=pressure_range,
+                                                                    npoints=npoints,
+                                                        partial_pressures=partial_pressures)
+        return reservoirs
+
+
     def _generate_chemical_potentials(self,target):
         """
         Generate chemical potentials with .chempots.generator
         """
+        from .chempots.generator import generate_chempots_from_mp
         if type(target) in (tuple, list):
             composition, element = target
             chemical_potentials = generate_chempots_from_mp(
@@ -2324,10 +2451,63 @@ class DefectConcentrations:
             
         return select_objects(objects=input_concs,mode=mode,exclude=exclude,
                               functions=functions,**kwargs)
-    
-                    
 
 
-        
-        
-        
+def get_concentrations_array(defect_concentrations,output='total',**kwargs):
+    """
+    Get concentrations of a list of DefectConcentrations (e.g. a Brouwer diagram) as a single
+    array with shape (number of points, number of series). All DefectConcentrations must 
+    contain the same defect entries in the same order, as those computed with the same 
+    DefectsAnalysis.
+
+    Parameters
+    ----------
+    defect_concentrations : list
+        List of DefectConcentrations objects.
+    output : str
+        Type of output for defect concentrations:
+
+        - "all": The output is the concentration of every defect entry.
+        - "stable": The output is the concentration of the stable charge for every defect at each point.
+        - "total": The output is the sum of the concentration in every charge for each specie.
+
+    kwargs : dict
+        Kwargs to pass to `DefectConcentrations.filter_concentrations(**kwargs)`, the selection
+        is done on the first DefectConcentrations and applied to all points.
+
+    Returns
+    -------
+    names : list
+        Names of the series.
+    charges : numpy.ndarray
+        Charges of the series. For "all" the shape is (number of series,), for "stable" 
+        (number of points, number of series). None for "total".
+    concentrations : numpy.ndarray
+        Concentrations with shape (number of points, number of series).
+    """
+    first = defect_concentrations[0]
+    if kwargs:
+        selected = set(id(c) for c in first.filter_concentrations(**kwargs))
+        indexes = [i for i,c in enumerate(first) if id(c) in selected]
+    else:
+        indexes = list(range(len(first)))
+    entries_names = [first[i].name for i in indexes]
+    entries_charges = np.array([first[i].charge for i in indexes])
+    concentrations = np.array([[dc.concentrations[i].conc for i in indexes] for dc in defect_concentrations],
+                              dtype=float).reshape(len(defect_concentrations),len(indexes))
+    if output == 'all':
+        return entries_names, entries_charges, concentrations
+
+    names = list(dict.fromkeys(entries_names))
+    groups = [[i for i,n in enumerate(entries_names) if n == name] for name in names]
+    if output == 'total':
+        totals = np.stack([concentrations[:,group].sum(axis=1) for group in groups],axis=1) if groups else concentrations
+        return names, None, totals
+    elif output == 'stable':
+        # stable charge has the highest concentration, the last one is taken for equal concentrations
+        stable_indexes = np.stack([np.array(group)[len(group) - 1 - np.argmax(concentrations[:,group[::-1]],axis=1)]
+                                   for group in groups],axis=1) if groups else np.zeros(concentrations.shape,dtype=int)
+        stable_concentrations = np.take_along_axis(concentrations,stable_indexes,axis=1)
+        return names, entries_charges[stable_indexes], stable_concentrations
+    else:
+        raise ValueError('The options for output are "all", "stable" or "total".')
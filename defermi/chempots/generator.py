@@ -157,6 +157,7 @@ def generate_pressure_reservoirs_from_precursors(
                                             npoints=50,
                                             get_pressures_as_strings=False,
                                             thermo_type='GGA_GGA+U',
+                                            partial_pressures=None,
                                             **kwargs):
     """
     Generate reservoirs dependent on oxygen partial pressure (`PressureReservoirs`)
@@ -174,14 +175,17 @@ def generate_pressure_reservoirs_from_precursors(
         Compositions of precursors.
     oxygen_ref : float
         Absolute chempot of oxygen at 0K. If not provided it is pulled from the MP database.
-    temperature : float
-        Temperature in K.
+    temperature : float or list
+        Temperature in K. If a list is provided, a dictionary with temperatures as keys
+        and PressureReservoirs as values is returned.
     pressure_range : tuple
         Range in which to evaluate the partial pressure . The default is from 1e-20 to 1e10.
     npoints : int
         Number of data points to interpolate the partial pressure with. The default is 50.
     get_pressures_as_strings : bool
         Get pressure values (keys in the Reservoirs dict) as strings. The default is set to floats.
+    partial_pressures : list
+        Partial pressure values in atm. If provided `pressure_range` and `npoints` are ignored.
 
     Returns
     -------
@@ -194,20 +198,15 @@ def generate_pressure_reservoirs_from_precursors(
     print('Pulling precursors energies from Materials Project database')
     if type(precursors) == str:
         precursors = [precursors]
+    compositions = list(precursors) if oxygen_ref else list(precursors) + ['O2']
+    # energies of all precursors are retrieved with a single request
+    energies_pfu = MPDatabase().get_stable_energies_pfu_from_compositions(
+                                                            compositions=compositions,
+                                                            thermo_types=[thermo_type],
+                                                            **kwargs)
     if not oxygen_ref:
-        oxygen_ref = MPDatabase().get_stable_energy_pfu_from_composition(
-                                                                composition='O2',
-                                                                thermo_types=[thermo_type],
-                                                                **kwargs)
-        oxygen_ref /= 2       
-    
-    precursors_dict = {}
-    for prec in precursors:
-        energy_pfu = MPDatabase().get_stable_energy_pfu_from_composition(
-                                                                composition=prec,
-                                                                thermo_types=[thermo_type],
-                                                                **kwargs)
-        precursors_dict[prec] = energy_pfu
+        oxygen_ref = energies_pfu['O2'] / 2
+    precursors_dict = {prec:energies_pfu[prec] for prec in precursors}
 
     reservoirs = get_pressure_reservoirs_from_precursors(
                                             precursors=precursors_dict,
@@ -215,7 +214,8 @@ def generate_pressure_reservoirs_from_precursors(
                                             temperature=temperature,
                                             pressure_range=pressure_range,
                                             npoints=npoints,
-                                            get_pressures_as_strings=get_pressures_as_strings)
+                                            get_pressures_as_strings=get_pressures_as_strings,
+                                            partial_pressures=partial_pressures)
     
     return reservoirs
 
@@ -7,7 +7,6 @@ Created on Wed Mar 18 13:12:05 2020
 """
 from itertools import product
 import numpy as np
-from pymatgen.core.periodic_table import Element
 from pymatgen.core.composition import Composition
 
 
@@ -15,6 +14,11 @@ from .core import Chempots, chempot_ideal_gas
 from .phase_diagram import PDHandler
 from .reservoirs import PressureReservoirs
 
+# Reuter and Scheffler data for mu_O(T,p0), the linear fit is computed once at import
+_TEMPERATURES_STANDARD = np.array([100,200,300,400,500,600,700,800,900,1000])
+_MU_O_STANDARD = np.array([-0.08, -0.17,-0.27,-0.38,-0.50,-0.61,-0.73,-0.85,-0.98,-1.10])
+_MU_O_STANDARD_FIT = np.poly1d(np.polyfit(_TEMPERATURES_STANDARD,_MU_O_STANDARD,1))
+
 
 def get_oxygen_chempot_standard_finite_temperature(temperature,muO_reference=None):
     """
@@ -25,23 +29,18 @@ def get_oxygen_chempot_standard_finite_temperature(temperature,muO_reference=Non
     
     Parameters
     ----------
-    temperature : float
+    temperature : float or np.array
         Temperature in Kelvin.
     muO_ref : float
         Oxygen reference chemical potential (O2 molecule, T = 0K)
 
     Returns
     -------
-    chempot : float
+    chempot : float or np.array
         Chemical potential at standard p0 at given temperature.
 
     """
-    T = np.array([100,200,300,400,500,600,700,800,900,1000])
-    mu_0 = np.array([-0.08, -0.17,-0.27,-0.38,-0.50,-0.61,-0.73,-0.85,-0.98,-1.10])
-    
-    coef = np.polyfit(T,mu_0,1)
-    poly1d_fn = np.poly1d(coef)
-    muO = poly1d_fn(temperature) # delta value
+    muO = _MU_O_STANDARD_FIT(temperature) # delta value
     if muO_reference:
         muO += muO_reference
     return muO
@@ -69,6 +68,50 @@ def get_oxygen_chempot_from_pO2(temperature=300,partial_pressure=0.2,muO_referen
     return chempot_ideal_gas(muO,temperature,partial_pressure)  
 
 
+def get_oxygen_chempot_grid(temperatures,partial_pressures,muO_reference=None):
+    """
+    Get oxygen chemical potentials (delta) on a grid of temperatures and partial pressures,
+    computed with array operations.
+
+    Parameters
+    ----------
+    temperatures : float or np.array
+        Temperatures in Kelvin.
+    partial_pressures : float or np.array
+        Partial pressures.
+    muO_reference : float
+        Oxygen reference chemical potential (O2 molecule, T = 0K).
+
+    Returns
+    -------
+    chempots : np.array
+        Array (ntemperatures x npressures) of oxygen chemical potentials.
+
+    """
+    T = np.atleast_1d(np.asarray(temperatures,dtype=float))[:,None]
+    p = np.atleast_1d(np.asarray(partial_pressures,dtype=float))[None,:]
+    return get_oxygen_chempot_from_pO2(temperature=T,partial_pressure=p,muO_reference=muO_reference)
+
+
+def _get_partial_pressures(pressure_range,npoints,partial_pressures=None):
+    if partial_pressures is not None:
+        return np.asarray(partial_pressures,dtype=float)
+    return np.logspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints,base=10)
+
+
+def _get_pressure_keys(partial_pressures,get_pressures_as_strings=False):
+    """
+    Keys of PressureReservoirs from partial pressures, computed once for all temperatures.
+    """
+    if get_pressures_as_strings:
+        return [str("%.1g" % p) for p in partial_pressures]
+    return [float("{:.3e}".format(p)) for p in partial_pressures]
+
+
+def _is_sequence(temperature):
+    return type(temperature) in (list,tuple,np.ndarray)
+
+
 def get_pressure_reservoirs_from_chempot_limits(composition,
                                                 temperature,
                                                 pressure_range=(1e-20,1e10),
@@ -91,15 +134,21 @@ def get_pressure_reservoirs_from_phase_diagram(phase_diagram,
                                                pressure_range=(1e-20,1e10),
                                                interpolation_function=None,
                                                npoints=50,
-                                               get_pressures_as_strings=False):
+                                               get_pressures_as_strings=False,
+                                               lower_bounds=None,
+                                               partial_pressures=None):
     """
     Generate Reservoirs object with a set of different chemical potentials starting from a range of oxygen partial pressure.
-    The code distinguishes between 2-component and 3-component phase diagrams.
+    The code distinguishes between 2-component, 3-component and N-component phase diagrams.
     
     In the case of a 2-comp PD the other chemical potential is calculated directly from the formation energy of the phase
     with target composition.
     In the case of a 3-comp PD the set of chemical potentials is obtained first calculating the boundary phases starting
     from the constant value of muO, then the arithmetic average between this two points in the stability diagram is taken.
+    In the case of PD with more than 3 components the barycenter of the vertices of the stability region at 
+    constant muO is taken (see `StabilityPolytope`).
+    The geometry of the stability region is computed once (see `PhaseBoundaries`) and evaluated for all pressures
+    and temperatures.
     
     In the case where there are some extrinsic elements not belonging to the PD, they must be added in the 
     extrinsic_chempots_range dictionary ({element:(O_poor_chempot,O_rich_chempot)}). The chempots of extrinsic elements 
@@ -111,8 +160,9 @@ def get_pressure_reservoirs_from_phase_diagram(phase_diagram,
         Pymatgen PhaseDiagram object.
     target_comp : str or Composition
         Composition of target phase.
-    temperature : float
-        Temperature in Kelvin.
+    temperature : float or list
+        Temperature in Kelvin. If a list is provided, a dictionary with temperatures as keys
+        and PressureReservoirs as values is returned.
     extrinsic_chempots_range : dict
         Dictionary with chemical potentials of elements not belonging to the PD ({element:(O_poor_chempot,O_rich_chempot)}). 
         The default is None.
@@ -123,10 +173,16 @@ def get_pressure_reservoirs_from_phase_diagram(phase_diagram,
 
         interpolation_function(element,boundary_reservoir): The function inputs are the target 
         element and the boundary_reservoirs ({'<label>':{element:value}}). If None the mean is used.    
+        For PD with more than 3 components the boundary reservoirs are the vertices of the stability region.
     npoints : int
         Number of data points to interpolate the partial pressure with. The default is 50.
     get_pressures_as_strings : bool
         Get pressure values (keys in the Reservoirs dict) as strings. The default is set to floats.
+    lower_bounds : dict
+        Lower limits of chemical potentials (delta mu) for elements of the PD that are not in the
+        target composition ({el:value}). Only used for PD with more than 3 components.
+    partial_pressures : list
+        Partial pressure values in atm. If provided `pressure_range` and `npoints` are ignored.
 
     Returns
     -------
@@ -134,57 +190,84 @@ def get_pressure_reservoirs_from_phase_diagram(phase_diagram,
         PressureReservoirs object. The dictionary is organized as {partial_pressure:chempots}.
 
     """
-    chempots_dict = {}
-    reservoirs = {}
     pd = phase_diagram
     if type(target_composition) == str:
         target_comp = Composition(target_composition)
     else:
         target_comp = target_composition
-    partial_pressures = np.logspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints,base=10)
-    mu_standard = get_oxygen_chempot_standard_finite_temperature(temperature)
+    pdh = PDHandler(pd)
+
+    temperatures = temperature if _is_sequence(temperature) else [temperature]
+    partial_pressures = _get_partial_pressures(pressure_range,npoints,partial_pressures)
+    keys = _get_pressure_keys(partial_pressures,get_pressures_as_strings)
+    muO_grid = np.round(get_oxygen_chempot_grid(temperatures,partial_pressures),6) # delta values, as stored in Chempots
+    reservoirs = {T: _get_pressure_reservoirs_from_pdhandler(pdh,target_comp,T,muO_grid[i],keys,extrinsic_chempots_range,
+                                                             interpolation_function,lower_bounds)
+                  for i,T in enumerate(temperatures)}
+    return reservoirs if _is_sequence(temperature) else reservoirs[temperature]
+
+
+def _get_pressure_reservoirs_from_pdhandler(pdh,
+                                            target_comp,
+                                            temperature,
+                                            muO,
+                                            keys,
+                                            extrinsic_chempots_range=None,
+                                            interpolation_function=None,
+                                            lower_bounds=None):
+    pd = pdh.pd
     
-    for idx,p in enumerate(partial_pressures):
-        muO = chempot_ideal_gas(mu_standard,temperature=temperature,partial_pressure=p) #delta value
-        fixed_chempot = Chempots({'O':muO})
-        
-        if len(pd.elements) == 2: # 2-component PD case
-            pdh = PDHandler(pd)
-            mu = pdh.calculate_single_chempot(target_comp, fixed_chempot)
-            for el in target_comp.elements:
-                if el is not Element('O'):
-                    chempots = fixed_chempot.copy()
-                    chempots.update({el.symbol:mu})
-                
-        elif len(pd.elements) == 3: # 3-component PD case
-            pdh = PDHandler(pd)
-            boundary_res = pdh.get_phase_boundaries_chempots(target_comp, fixed_chempot)
-            for el in list(boundary_res.values())[0]:
-                if interpolation_function:
-                    chempots_dict[el] = interpolation_function(el,boundary_res)
-                else:
-                    chempots_dict[el] = np.mean(np.array([mu[el] for mu in boundary_res.values()]))
-                
-        elif len(pd.elements) > 3: 
-            raise NotImplementedError('Not implemented for PD with more than 3 components')
-        
-        chempots = Chempots(chempots_dict)
-        chempots_abs = chempots.get_absolute(pdh.mu_refs)
-        
-        if extrinsic_chempots_range:
-            for el in extrinsic_chempots_range:
-                mu_el_O_poor,mu_el_O_rich = extrinsic_chempots_range[el][0], extrinsic_chempots_range[el][1]
-                chempots_abs[el] = mu_el_O_poor + ((mu_el_O_rich - mu_el_O_poor)/npoints)*idx 
-                    
-        if get_pressures_as_strings:
-            p = "%.1g" % p
-            p = str(p)
+    if len(pd.elements) == 2: # 2-component PD case
+        el = [el.symbol for el in target_comp.elements if el.symbol != 'O'][0]
+        form_energy = pdh.get_formation_energy_from_stable_comp(target_comp)
+        mu_el = (form_energy - target_comp['O']*muO) / target_comp[el]
+        chempots_arrays = {el:mu_el,'O':muO}
+            
+    elif len(pd.elements) == 3: # 3-component PD case
+        phase_boundaries = pdh.get_phase_boundaries(target_comp,element='O')
+        if interpolation_function:
+            chempots_arrays = {el:[] for el in phase_boundaries.elements + ['O']}
+            for mu in muO:
+                boundary_res = phase_boundaries.get_phase_boundaries_chempots(mu)
+                for el in chempots_arrays:
+                    chempots_arrays[el].append(interpolation_function(el,boundary_res))
         else:
-            p = float("{:.3e}".format(p))
-        reservoirs[p] = chempots_abs
+            boundaries = np.round(phase_boundaries.get_boundaries_arrays(muO),6)
+            mean = boundaries.mean(axis=1)
+            chempots_arrays = {el:mean[:,j] for j,el in enumerate(phase_boundaries.elements)}
+            chempots_arrays['O'] = muO
+
+    elif len(pd.elements) > 3: # N-component PD case
+        polytope = pdh.get_stability_polytope(target_comp,lower_bounds=lower_bounds)
+        if interpolation_function:
+            chempots_arrays = {el:[] for el in polytope.elements}
+            for mu in muO:
+                vertices = polytope.get_vertices({'O':mu})
+                boundary_res = {f'vertex_{i}':Chempots(dict(zip(polytope.elements,v))) for i,v in enumerate(vertices)}
+                for el in chempots_arrays:
+                    chempots_arrays[el].append(interpolation_function(el,boundary_res))
+        else:
+            barycenters = polytope.get_barycenters('O',muO)
+            chempots_arrays = {el:barycenters[:,j] for j,el in enumerate(polytope.elements)}
+    
+    elements = list(chempots_arrays.keys())
+    chempots_relative = np.round(np.array([chempots_arrays[el] for el in elements],dtype=float).T,6) # as in Chempots
+    mu_refs = np.array([pdh.mu_refs[el] for el in elements])
+    chempots_absolute = np.round(chempots_relative + mu_refs[None,:],6)
+    
+    if extrinsic_chempots_range:
+        npoints = len(keys)
+        for el in extrinsic_chempots_range:
+            mu_el_O_poor,mu_el_O_rich = extrinsic_chempots_range[el][0], extrinsic_chempots_range[el][1]
+            values = mu_el_O_poor + ((mu_el_O_rich - mu_el_O_poor)/npoints)*np.arange(npoints)
+            if el in elements:
+                chempots_absolute[:,elements.index(el)] = values
+            else:
+                elements.append(el)
+                chempots_absolute = np.hstack((chempots_absolute,values[:,None]))
 
-        
-    return PressureReservoirs(reservoirs,temperature,phase_diagram=pd,are_chempots_delta=False)
+    return PressureReservoirs.from_array(chempots_absolute,keys,elements,ndecimals=None,temperature=temperature,
+                                         phase_diagram=pd,are_chempots_delta=False)
 
 
 def get_pressure_reservoirs_from_precursors(precursors,
@@ -192,7 +275,8 @@ def get_pressure_reservoirs_from_precursors(precursors,
                                             temperature,
                                             pressure_range=(1e-20,1e10),
                                             npoints=50,
-                                            get_pressures_as_strings=False):
+                                            get_pressures_as_strings=False,
+                                            partial_pressures=None):
     """
     Get PressureReservoirs object starting from the oxygen reference chemical potential at 0 K and the synthesis precursors.
     Chemical potentials are found from the energies of the precursors and the oxygen chempot value 
@@ -204,14 +288,17 @@ def get_pressure_reservoirs_from_precursors(precursors,
         Dictionaly with formulas (str) as keys and total energies (float) as values.
     oxygen_ref : float
         Absolute chempot of oxygen at 0K.
-    temperature : float
-        Temperature in K.
+    temperature : float or list
+        Temperature in K. If a list is provided, a dictionary with temperatures as keys
+        and PressureReservoirs as values is returned.
     pressure_range : tuple
         Range in which to evaluate the partial pressure . The default is from 1e-20 to 1e10.
     npoints : int
         Number of data points to interpolate the partial pressure with. The default is 50.
     get_pressures_as_strings : bool
         Get pressure values (keys in the Reservoirs dict) as strings. The default is set to floats.
+    partial_pressures : list
+        Partial pressure values in atm. If provided `pressure_range` and `npoints` are ignored.
 
     Returns
     -------
@@ -219,44 +306,58 @@ def get_pressure_reservoirs_from_precursors(precursors,
         PressureReservoirs object.
 
     """
-    row_elements = []
-    for formula in precursors.keys():
-        comp = Composition(formula)
+    row_elements, A, energies, oxygen_amounts = _get_precursors_system(precursors)
+    # only the oxygen term of the energies depends on pressure, the minimum-norm least squares 
+    # solution is linear in the right-hand side: X(muO) = X_energies - X_oxygen * muO
+    X_energies = np.linalg.lstsq(A, energies, rcond=None)[0]
+    X_oxygen = np.linalg.lstsq(A, oxygen_amounts, rcond=None)[0]
+
+    temperatures = temperature if _is_sequence(temperature) else [temperature]
+    partial_pressures = _get_partial_pressures(pressure_range,npoints,partial_pressures)
+    keys = _get_pressure_keys(partial_pressures,get_pressures_as_strings)
+    muO_grid = np.round(oxygen_ref + get_oxygen_chempot_grid(temperatures,partial_pressures),6) # as stored in Chempots
+
+    reservoirs_dict = {}
+    for muO,T in zip(muO_grid,temperatures):
+        X = X_energies[None,:] - muO[:,None] * X_oxygen[None,:]
+        reservoirs_dict[T] = PressureReservoirs.from_array(np.hstack((muO[:,None],X)),keys,['O'] + row_elements,
+                                                           ndecimals=None,temperature=T,mu_refs=Chempots({'O':oxygen_ref}),
+                                                           are_chempots_delta=False)
+    
+    return reservoirs_dict if _is_sequence(temperature) else reservoirs_dict[temperature]
+
+
+def _get_precursors_system(precursors):
+    """
+    Get the linear system for the chemical potentials of the precursors elements (oxygen excluded).
+    Compositions are parsed only once.
+
+    Returns
+    -------
+    elements : list
+        Elements of the precursors other than oxygen, in order of appearance.
+    A : np.array
+        Stoichiometry matrix (nprecursors x nelements).
+    energies : np.array
+        Energies of the precursors.
+    oxygen_amounts : np.array
+        Amount of oxygen in each precursor.
+    """
+    compositions = [Composition(formula) for formula in precursors.keys()]
+    elements = []
+    for comp in compositions:
         for element in comp.elements:
             el = element.symbol
-            if el not in row_elements and el != 'O':
-                row_elements.append(el)
-    A = []
-    N = len(row_elements)
-    for formula in precursors.keys():
-        a = np.zeros(N)
-        comp = Composition(formula)
-        for element,coeff in comp.items():
-            el = element.symbol
-            if el != 'O':
-                a[row_elements.index(el)] = coeff
-        A.append(a)
-
-    reservoirs = get_oxygen_pressure_reservoirs(oxygen_ref=oxygen_ref,
-                                            temperature=temperature,
-                                            pressure_range=pressure_range,
-                                            npoints=npoints,
-                                            get_pressures_as_strings=get_pressures_as_strings)
-    for chempots in reservoirs.values():
-        muO = chempots['O']
-        B = []
-        for formula,energy in precursors.items():
-            comp = Composition(formula)
-            b = energy - comp['O']*muO
-            B.append(b)
-        X = np.linalg.lstsq(A, B, rcond=None)[0]
-        for index,el in enumerate(row_elements):
-            chempots[el] = X[index]
-    
-    return reservoirs
+            if el not in elements and el != 'O':
+                elements.append(el)
+    A = np.array([[comp[el] for el in elements] for comp in compositions],dtype=float)
+    energies = np.array(list(precursors.values()),dtype=float)
+    oxygen_amounts = np.array([comp['O'] for comp in compositions],dtype=float)
+    return elements, A, energies, oxygen_amounts
 
 
-def get_oxygen_pressure_reservoirs(oxygen_ref,temperature,pressure_range=(1e-20,1e10),npoints=50,get_pressures_as_strings=False):
+def get_oxygen_pressure_reservoirs(oxygen_ref,temperature,pressure_range=(1e-20,1e10),npoints=50,get_pressures_as_strings=False,
+                                   partial_pressures=None):
     """
     Get PressureReservoirs object for oxygen starting from the reference value.
 
@@ -264,14 +365,17 @@ def get_oxygen_pressure_reservoirs(oxygen_ref,temperature,pressure_range=(1e-20,
     ----------
     oxygen_ref : float
         Absolute chempot of oxygen at 0K.
-    temperature : float
-        Temperature.
+    temperature : float or list
+        Temperature. If a list is provided, a dictionary with temperatures as keys
+        and PressureReservoirs as values is returned.
     pressure_range : tuple
         Range in which to evaluate the partial pressure . The default is from 1e-20 to 1e10.
     npoints : int
         Number of data points to interpolate the partial pressure with. The default is 50.
     get_pressures_as_strings : bool
         Get pressure values (keys in the Reservoirs dict) as strings. The default is set to floats.
+    partial_pressures : list
+        Partial pressure values in atm. If provided `pressure_range` and `npoints` are ignored.
 
     Returns
     -------
@@ -279,27 +383,17 @@ def get_oxygen_pressure_reservoirs(oxygen_ref,temperature,pressure_range=(1e-20,
         PressureReservoirs object.
 
     """
-    reservoirs = {}
-    mu_refs = Chempots({'O':oxygen_ref})
-    partial_pressures = np.logspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints,base=10)
-    mu_standard = get_oxygen_chempot_standard_finite_temperature(temperature)
-    for p in partial_pressures:
-        mu = {}
-        muO = chempot_ideal_gas(mu_standard,temperature=temperature,partial_pressure=p)
-        mu.update({'O':oxygen_ref + muO})
-        if get_pressures_as_strings:
-            p = "%.1g" % p
-            p = str(p)
-        else:
-            p = float("{:.3e}".format(p))
-        reservoirs[p] = Chempots(mu)
+    temperatures = temperature if _is_sequence(temperature) else [temperature]
+    partial_pressures = _get_partial_pressures(pressure_range,npoints,partial_pressures)
+    keys = _get_pressure_keys(partial_pressures,get_pressures_as_strings)
+    muO_grid = oxygen_ref + get_oxygen_chempot_grid(temperatures,partial_pressures)
     
-    return PressureReservoirs(reservoirs,temperature,phase_diagram=None,
-                              mu_refs=mu_refs,are_chempots_delta=False)
+    reservoirs = {T: PressureReservoirs.from_array(muO[:,None],keys,['O'],temperature=T,phase_diagram=None,
+                                                   mu_refs=Chempots({'O':oxygen_ref}),are_chempots_delta=False)
+                  for muO,T in zip(muO_grid,temperatures)}
+    return reservoirs if _is_sequence(temperature) else reservoirs[temperature]
 
-    
 
-        
 def get_barycenter_chemical_potentials_absolute(composition,
                                                 energy,
                                                 oxygen_chempot_absolute,
@@ -318,34 +412,40 @@ def get_barycenter_chemical_potentials_absolute(composition,
     ----------
     composition: str or pymatgen.core.Composition
         Target composition.
-    formation_energy: float
-        Formation energy (eV/f.u.)
-    oxygen_mu_relative: float
-        fixed chemical potential of oxygen relative to the oxygen molecule.
-    min_relative_chempots: dict or Chempots
-        Lower limit of chemical potentials, relative values ({element:chempot}) 
-    max_relative_chempots: dict or Chempots
-        Higher limit of chemical potentials, relative values ({element:chempot})
+    energy: float
+        Total energy (eV/f.u.)
+    oxygen_chempot_absolute: float or np.array
+        Fixed absolute chemical potential of oxygen. If an array is provided, 
+        the barycenters for all values are computed at once.
+    mu_refs : dict or Chempots
+        Chemical potentials of the elemental references.
+    min_absolute_chempots: dict or Chempots
+        Lower limit of chemical potentials, absolute values ({element:chempot}) 
+    max_absolute_chempots: dict or Chempots
+        Higher limit of chemical potentials, absolute values ({element:chempot})
     
     Returns:
-        Dictionary with chemical potentials, taken from the center of the
-        allowed N-1 dimensional hyperplane.
+        Chempots with chemical potentials, taken from the center of the
+        allowed N-1 dimensional hyperplane. If `oxygen_chempot_absolute` is an array,
+        dictionary with arrays of chemical potentials.
 
     """ 
     if isinstance(composition, str):
         composition = Composition(composition)
 
     formation_energy = energy - sum([number*mu_refs[el.symbol] for el,number in composition.items()])
-    oxygen_chempot_relative = oxygen_chempot_absolute - mu_refs['O']
+    oxygen_chempot_relative = np.asarray(oxygen_chempot_absolute) - mu_refs['O']
     min_relative_chempots = Chempots(min_absolute_chempots).get_referenced(mu_refs) if min_absolute_chempots else None
-    max_absolute_chempots = Chempots(max_absolute_chempots).get_referenced(mu_refs) if max_absolute_chempots else None
+    max_relative_chempots = Chempots(max_absolute_chempots).get_referenced(mu_refs) if max_absolute_chempots else None
     
     barycenter_chempots_relative = get_barycenter_chemical_potentials_relative(composition=composition,
                                                    formation_energy=formation_energy,
                                                    oxygen_chempot_relative=oxygen_chempot_relative,
                                                    min_relative_chempots=min_relative_chempots,
-                                                   max_relative_chempots=max_absolute_chempots)
+                                                   max_relative_chempots=max_relative_chempots)
     
+    if np.ndim(oxygen_chempot_absolute):
+        return {el:mu + mu_refs[el] for el,mu in barycenter_chempots_relative.items()}
     return Chempots(barycenter_chempots_relative).get_absolute(mu_refs)
         
 
@@ -364,14 +464,20 @@ def get_barycenter_chemical_potentials_relative(composition,
     - Formation energy of target phase
     - lower and/or upper chemical potential limits for each element
     
+    The vertices of the feasible region are the intersections of the formation energy 
+    hyperplane with the edges of the box defined by the chemical potential limits.
+    They are computed with array operations for all edges (N*2^(N-1) for N non-oxygen elements)
+    and all values of the oxygen chemical potential at once.
+    
     Parameters
     ----------
     composition: str or pymatgen.core.Composition
         Target composition.
     formation_energy: float
         Formation energy (eV/f.u.)
-    oxygen_mu_relative: float
-        fixed chemical potential of oxygen relative to the oxygen molecule.
+    oxygen_chempot_relative: float or np.array
+        Fixed chemical potential of oxygen relative to the oxygen molecule. If an array 
+        is provided, the barycenters for all values are computed at once.
     min_relative_chempots: dict or Chempots
         Lower limit of chemical potentials, relative values ({element:chempot}) 
     max_relative_chempots: dict or Chempots
@@ -380,10 +486,11 @@ def get_barycenter_chemical_potentials_relative(composition,
     Returns
     -------
         Dictionary with chemical potentials, taken from the center of the
-        allowed N-1 dimensional hyperplane.
+        allowed N-1 dimensional hyperplane. If `oxygen_chempot_relative` is an array,
+        the values are arrays.
         
     """
-    muO_relative = oxygen_chempot_relative
+    muO_relative = np.asarray(oxygen_chempot_relative,dtype=float)
     if isinstance(composition, str):
         composition = Composition(composition)
     
@@ -393,50 +500,43 @@ def get_barycenter_chemical_potentials_relative(composition,
 
     n_O = el_amount_dict['O']
     non_oxygen_elements = [el for el in el_amount_dict if el !='O']
-    constraint = formation_energy - n_O * muO_relative
-    chempot_boundaries = {}
-    for el in non_oxygen_elements:
-        if min_relative_chempots and el in min_relative_chempots.keys():
-            mu_min = min_relative_chempots[el]
-        else:
-            mu_min = float("-inf")
-        if max_relative_chempots and el in max_relative_chempots.keys():
-            mu_max = max_relative_chempots[el]
-        else:
-            mu_max = 0.0
-        chempot_boundaries[el] = (mu_min,mu_max)
+    N = len(non_oxygen_elements)
+    amounts = np.array([el_amount_dict[el] for el in non_oxygen_elements])
+    constraints = formation_energy - n_O * np.atleast_1d(muO_relative)
+    mu_min = np.array([min_relative_chempots[el] if min_relative_chempots and el in min_relative_chempots.keys() 
+                       else -np.inf for el in non_oxygen_elements])
+    mu_max = np.array([max_relative_chempots[el] if max_relative_chempots and el in max_relative_chempots.keys() 
+                       else 0.0 for el in non_oxygen_elements])
     
-    allowed_vertices = []
-    # iterate over all possible permutations of chempot ranges
-    for node in product(*[chempot_boundaries[el] for el in non_oxygen_elements]):
-        for idx in range(len(non_oxygen_elements)):
-            mu_values = list(node)
-            el_free = non_oxygen_elements[idx]
-            n_el_free = el_amount_dict[el_free]
-            
-            fixed_sum = sum(el_amount_dict[non_oxygen_elements[i]] * mu_values[i]
-                            for i in range(len(non_oxygen_elements)) if i != idx)
-            
-            mu_free = (constraint - fixed_sum) / n_el_free  # solve free chemical potentials
-            
-            mu_min, mu_max = chempot_boundaries[el_free]
-            if mu_min <= mu_free <= mu_max:  #if solved chempot is within limits, we add vertex to N-1 chempot hyperplane
-                mu_values[idx] = mu_free
-                vertex = dict(zip(non_oxygen_elements, mu_values))
-                allowed_vertices.append(vertex)
+    # all combinations of min/max limits for the N-1 fixed elements of each box edge
+    corners = np.array(list(product([False,True],repeat=N-1)),dtype=bool).reshape(-1,N-1)
+    sums = np.zeros((len(constraints),N))
+    nvertices = np.zeros(len(constraints))
+    for idx in range(N): # free element
+        others = [i for i in range(N) if i != idx]
+        mu_values = np.where(corners,mu_max[others],mu_min[others])
+        finite = np.all(np.isfinite(mu_values),axis=1)
+        mu_values[~finite] = 0
+        fixed_sum = mu_values @ amounts[others]
+        mu_free = (constraints[:,None] - fixed_sum[None,:]) / amounts[idx] # solve free chemical potentials
+        # if solved chempot is within limits, the vertex belongs to the N-1 chempot hyperplane
+        allowed = finite[None,:] & (mu_free >= mu_min[idx]) & (mu_free <= mu_max[idx])
+        sums[:,idx] += np.where(allowed,mu_free,0).sum(axis=1)
+        sums[:,others] += allowed @ mu_values
+        nvertices += allowed.sum(axis=1)
                 
-    if not allowed_vertices:
+    if np.any(nvertices == 0):
         raise ValueError("No feasible chemical potential points found under the given constraints.")
-        
-    barycenter = {el:0 for el in non_oxygen_elements}
-    for vertex in allowed_vertices:
-        for el, mu in vertex.items():
-            barycenter[el] += mu
-    for el in barycenter.keys():
-        barycenter[el] /= len(allowed_vertices)
-    barycenter['O'] = muO_relative
+    
+    barycenter_values = sums / nvertices[:,None]
+    if muO_relative.ndim == 0:
+        barycenter = {el:float(barycenter_values[0,i]) for i,el in enumerate(non_oxygen_elements)}
+        barycenter['O'] = float(muO_relative)
+    else:
+        barycenter = {el:barycenter_values[:,i] for i,el in enumerate(non_oxygen_elements)}
+        barycenter['O'] = muO_relative
     
     return barycenter        
         
         
-        
\ No newline at end of file
+        
@@ -7,12 +7,9 @@ Created on Mon Jun  2 16:39:01 2025
 """
 
 import numpy as np
-from pandas import DataFrame
-import matplotlib.pyplot as plt
 from pymatgen.core.periodic_table import Element
 from pymatgen.core.composition import Composition
 from pymatgen.symmetry.groups import SpaceGroup
-from pymatgen.analysis.phase_diagram import GrandPotentialPhaseDiagram, PDPlotter
 
 from ..tools.utils import format_composition
 from .core import Chempots
@@ -39,8 +36,40 @@ class PDHandler:
             Pymatgen PhaseDiagram object
 
         """
-        self.pd = phase_diagram 
+        self.pd = phase_diagram
+
+
+    @property
+    def pd(self):
+        return self._pd
+
+    @pd.setter
+    def pd(self,phase_diagram):
+        # new phase diagram: rebuild lookup tables and clear cached stability regions
+        self._pd = phase_diagram
+        self._stability_regions = {}
+        self.update_tables()
+
+
+    def update_tables(self):
+        """
+        Build lookup tables keyed by reduced composition (entries, stable entries and formation 
+        energies of the stable phases), so that the queries on compositions do not scan the phase 
+        diagram. Called automatically when `pd` is set.
+        """
+        pd = self.pd
         self.mu_refs = self.get_chempots_reference()
+        self._entries = {}
+        for e in pd.all_entries:
+            comp, factor = e.composition.get_reduced_composition_and_factor()
+            self._entries.setdefault(comp,[]).append((e,factor))
+        self._stable_entries = {}
+        self._stable_formation_energies = {}
+        for e in pd.stable_entries:
+            comp, factor = e.composition.get_reduced_composition_and_factor()
+            if comp not in self._stable_entries:
+                self._stable_entries[comp] = (e,factor)
+                self._stable_formation_energies[comp] = pd.get_form_energy(e)/factor
 
 
     def calculate_single_chempot(self,comp,chempots_ref):
@@ -55,10 +84,11 @@ class PDHandler:
         chempots_ref : Dict
             Dictionary with element symbols as keys and respective chemical potential as value ({el:chempot}).
             The chemical potentials used here are the ones relative to the reference (delta_mu).
+            Values can be arrays, in which case the chemical potential is evaluated element-wise.
 
         Returns
         -------
-        mu : float
+        mu : float or np.array
             Chemical potential.
 
         """        
@@ -131,6 +161,7 @@ class PDHandler:
                 d['Structure'] = None
             d['Formation energy p.a (eV)'] = np.around(self.pd.get_form_energy_per_atom(e),decimals=2)
             phases.append(d)
+        from pandas import DataFrame
         df = DataFrame(phases)
         return df
 
@@ -151,13 +182,8 @@ class PDHandler:
 
        """
        comp = _get_composition_object(comp)
-       target_entries=[]
-       pd = self.pd
-       for e in pd.all_entries:
-           if e.composition.reduced_composition == comp:
-               target_entries.append(e)
-       if target_entries != []:
-           return target_entries
+       if comp in self._entries:
+           return [e for e,factor in self._entries[comp]]
        else:
            raise ValueError('No entry has been found for target composition:%s' %comp.reduced_formula)
 
@@ -178,12 +204,8 @@ class PDHandler:
 
         """
         comp = _get_composition_object(comp)
-        pd = self.pd
-        energies = {}
-        for e in self.get_entries_from_comp(comp):
-            factor = e.composition.get_reduced_composition_and_factor()[1]
-            energies[e] = e.energy/factor
-        return energies
+        self.get_entries_from_comp(comp) # check composition
+        return {e:e.energy/factor for e,factor in self._entries[comp]}
             
 
     def get_energy_from_stable_comp(self,comp):
@@ -202,10 +224,8 @@ class PDHandler:
 
         """
         comp = _get_composition_object(comp)
-        pd = self.pd
         entry = self.get_stable_entry_from_comp(comp)
-        factor = entry.composition.get_reduced_composition_and_factor()[1]
-        return entry.energy/factor
+        return entry.energy/self._stable_entries[comp][1]
 
 
     def get_formation_energies_from_comp(self,comp):
@@ -224,12 +244,8 @@ class PDHandler:
         
         """
         comp = _get_composition_object(comp)
-        pd = self.pd
-        form_energies = {}
-        for e in self.get_entries_from_comp(comp):
-            factor = e.composition.get_reduced_composition_and_factor()[1]
-            form_energies[e] = pd.get_form_energy(e)/factor
-        return form_energies
+        self.get_entries_from_comp(comp) # check composition
+        return {e:self.pd.get_form_energy(e)/factor for e,factor in self._entries[comp]}
             
 
     def get_formation_energy_from_stable_comp(self,comp):
@@ -248,16 +264,16 @@ class PDHandler:
 
         """
         comp = _get_composition_object(comp)
-        pd = self.pd
-        entry = self.get_stable_entry_from_comp(comp)
-        factor = entry.composition.get_reduced_composition_and_factor()[1]
-        return pd.get_form_energy(entry)/factor
+        if comp in self._stable_formation_energies:
+            return self._stable_formation_energies[comp]
+        raise ValueError('No stable entry has been found for target composition:%s' %comp.reduced_formula)
         
 
     def get_phase_boundaries_chempots(self,comp,chempot_ref):
         """
         Given a composition and a fixed chemical potential, this function analises the composition of the boundary phases
-        and the associated chemical potentials at the boundaries. Only works for 3 component PD.
+        and the associated chemical potentials at the boundaries. Only works for 3 component PD,
+        for PD with more components use `get_stability_polytope`.
 
         Parameters
         ----------
@@ -286,6 +302,56 @@ class PDHandler:
         return chempots      
                   
     
+    def get_phase_boundaries(self,comp,element='O'):
+        """
+        Get `PhaseBoundaries` object of a target composition as a function of the chemical 
+        potential of `element`. Only works for 3-component PD. The result is cached.
+
+        Parameters
+        ----------
+        comp : str or Composition
+            Target composition.
+        element : str
+            Element with variable chemical potential.
+
+        Returns
+        -------
+        phase_boundaries : PhaseBoundaries
+            PhaseBoundaries object.
+        """
+        comp = _get_composition_object(comp)
+        key = (comp.reduced_formula,element)
+        if key not in self._stability_regions:
+            self._stability_regions[key] = PhaseBoundaries(self,comp,element)
+        return self._stability_regions[key]
+
+
+    def get_stability_polytope(self,comp,lower_bounds=None):
+        """
+        Get `StabilityPolytope` object of a target composition, works for any number of 
+        components. The result is cached.
+
+        Parameters
+        ----------
+        comp : str or Composition
+            Target composition.
+        lower_bounds : dict
+            Lower limits of chemical potentials (delta mu) for elements that are not in the
+            target composition ({el:value}).
+
+        Returns
+        -------
+        polytope : StabilityPolytope
+            StabilityPolytope object.
+        """
+        from .polytope import StabilityPolytope
+        comp = _get_composition_object(comp)
+        key = (comp.reduced_formula,tuple(sorted(lower_bounds.items())) if lower_bounds else None)
+        if key not in self._stability_regions:
+            self._stability_regions[key] = StabilityPolytope(self.pd,comp,lower_bounds=lower_bounds)
+        return self._stability_regions[key]
+
+
     def get_phase_boundaries_compositions(self,comp,chempot_ref):
         """
         Get compositions of phases in boundary of stability with a target composition given a fixed chemical potential 
@@ -312,6 +378,7 @@ class PDHandler:
         fixed_chempot = chempot_ref.get_absolute(self.mu_refs).to_pmg_elements()
         
         entries = self.pd.all_entries
+        from pymatgen.analysis.phase_diagram import GrandPotentialPhaseDiagram
         gpd = GrandPotentialPhaseDiagram(entries, fixed_chempot)
         stable_entries = gpd.stable_entries
         comp_in_stable_entries = False
@@ -410,6 +477,8 @@ class PDHandler:
         """
         Get plot with Pymatgen
         """
+        import matplotlib.pyplot as plt
+        from pymatgen.analysis.phase_diagram import PDPlotter
         PDPlotter(self.pd,show_unstable=0,backend='matplotlib').get_plot(**kwargs)
         return plt
 
@@ -431,8 +500,10 @@ class PDHandler:
             Matplotlib object.
 
         """
+        import matplotlib.pyplot as plt
         pd = self.pd
         elements = [Element(el) for el in elements]
+        from pymatgen.analysis.phase_diagram import PDPlotter
         PDPlotter(pd).get_chempot_range_map_plot(elements)
         if figsize:
             fig = plt.gcf()
@@ -457,19 +528,122 @@ class PDHandler:
 
         """
         comp = _get_composition_object(comp)
-        target_entry=None
-        pd = self.pd
-        for e in pd.stable_entries:
-            if e.composition.reduced_composition == comp:
-                target_entry = e
-                break
-        if target_entry is not None:
-            return target_entry
+        if comp in self._stable_entries:
+            return self._stable_entries[comp][0]
         else:
             raise ValueError('No stable entry has been found for target composition:%s' %comp.reduced_formula)
             
             
             
+class PhaseBoundaries:
+
+    def __init__(self,pdhandler,comp,element='O'):
+        """
+        Stability region of a target phase in a 3-component phase diagram as a function of the 
+        chemical potential of one element (delta mu). 
+
+        The geometry is computed once: the values of the chemical potential of `element` where 
+        the boundary phases change (breakpoints, from the corners of the stability region) and, 
+        in each interval between breakpoints, the compositions of the two boundary phases and 
+        the chemical potentials at the boundaries, which are linear in the chemical potential of `element`.
+        Boundaries chempots for any number of values are then obtained by array evaluation, 
+        without building a GrandPotentialPhaseDiagram for each value.
+
+        Parameters
+        ----------
+        pdhandler : PDHandler
+            PDHandler object.
+        comp : str or Composition
+            Target composition.
+        element : str
+            Element with variable chemical potential.
+        """
+        comp = _get_composition_object(comp)
+        if len(pdhandler.pd.elements) != 3:
+            raise NotImplementedError('PhaseBoundaries only works for 3-component PD')
+        self.comp = comp
+        self.element = element
+        self.elements = [el for el in pdhandler.mu_refs if el != element]
+        
+        corners = pdhandler.get_all_boundaries_chempots(comp)
+        mu_values = sorted([mu.get_referenced(pdhandler.mu_refs)[element] for mu in corners.values()])
+        breakpoints = [mu_values[0]]
+        for mu in mu_values[1:]:
+            if mu - breakpoints[-1] > 1e-06:
+                breakpoints.append(mu)
+        self.breakpoints = np.array(breakpoints)
+        
+        self.boundary_compositions = []
+        intercepts, slopes = [], []
+        for mu_min,mu_max in zip(breakpoints[:-1],breakpoints[1:]):
+            comp1, comp2 = pdhandler.get_phase_boundaries_compositions(comp,{element:(mu_min+mu_max)/2})
+            self.boundary_compositions.append((comp1,comp2))
+            coeffs = []
+            for c1,c2 in ((comp1,comp),(comp,comp2)):
+                mu0 = pdhandler.solve_phase_boundary_chempots(c1,c2,{element:0})
+                mu1 = pdhandler.solve_phase_boundary_chempots(c1,c2,{element:1})
+                coeffs.append(([mu0[el] for el in self.elements],[mu1[el]-mu0[el] for el in self.elements]))
+            intercepts.append([c[0] for c in coeffs])
+            slopes.append([c[1] for c in coeffs])
+        self.intercepts = np.array(intercepts) # (nintervals, 2 boundaries, nelements)
+        self.slopes = np.array(slopes)
+        
+    
+    def get_interval_indexes(self,mu):
+        """
+        Get index of the interval between breakpoints for each value of the chemical potential.
+        Raises ValueError if the target phase is not stable for any of the values. Above the 
+        elemental reference (delta mu > 0) the boundaries of the last interval are extrapolated.
+        """
+        mu = np.atleast_1d(np.asarray(mu,dtype=float))
+        tol = 1e-06
+        outside = mu < self.breakpoints[0] - tol
+        if abs(self.breakpoints[-1]) > tol:
+            outside = outside | (mu > self.breakpoints[-1] + tol)
+        if outside.any():
+            raise ValueError('Target composition %s is not stable for %s chemical potential: %s (stability range: %s, %s)' 
+                             %(self.comp.reduced_formula,self.element,mu[outside][0],self.breakpoints[0],self.breakpoints[-1]))
+        indexes = np.searchsorted(self.breakpoints,mu,side='right') - 1
+        return np.clip(indexes,0,len(self.breakpoints)-2)
+        
+    
+    def get_boundaries_arrays(self,mu):
+        """
+        Get chemical potentials of `self.elements` at the two phase boundaries.
+
+        Parameters
+        ----------
+        mu : float or array
+            Values of the chemical potential of `self.element` (delta mu).
+
+        Returns
+        -------
+        chempots : np.array
+            Array with shape (len(mu), 2, len(self.elements)).
+        """
+        mu = np.atleast_1d(np.asarray(mu,dtype=float))
+        idx = self.get_interval_indexes(mu)
+        return self.intercepts[idx] + self.slopes[idx] * mu[:,None,None]
+    
+    
+    def get_phase_boundaries_chempots(self,mu):
+        """
+        Same output of `PDHandler.get_phase_boundaries_chempots` for a single value of the 
+        chemical potential of `self.element` (delta mu).
+        """
+        idx = self.get_interval_indexes(mu)[0]
+        comp1, comp2 = self.boundary_compositions[idx]
+        arrays = self.get_boundaries_arrays(mu)[0]
+        chempots = {}
+        for i,boundary in enumerate((comp1.reduced_formula+'-'+self.comp.reduced_formula,
+                                     self.comp.reduced_formula+'-'+comp2.reduced_formula)):
+            mu_boundary = {el:arrays[i][j] for j,el in enumerate(self.elements)}
+            mu_boundary[self.element] = mu
+            chempots[boundary] = Chempots(mu_boundary)
+        return chempots
+    
+
+
 class StabilityDiagram:
     
     def __init__(self,phase_diagram=None,size=1):
@@ -518,9 +692,13 @@ class StabilityDiagram:
             Matplotlib object.
 
         """
-        for p in points:
-            plt.scatter(points[p][0],points[p][1], color=color, edgecolor=edgecolor, linewidths=linewidths, s=450*self.size*size,**kwargs)
-            plt.text(points[p][0]+(0.1/self.size*label_size),points[p][1],p,size=30*self.size*label_size,color=label_color)
+        import matplotlib.pyplot as plt
+        if not points:
+            return plt
+        coords = np.array([points[p] for p in points],dtype=float)
+        plt.scatter(coords[:,0],coords[:,1], color=color, edgecolor=edgecolor, linewidths=linewidths, s=450*self.size*size,**kwargs)
+        for p,(x,y) in zip(points,coords):
+            plt.text(x+(0.1/self.size*label_size),y,p,size=30*self.size*label_size,color=label_color)
         return plt
     
     
@@ -545,6 +723,7 @@ class StabilityDiagram:
             Matplotlib object.
 
         """
+        import matplotlib.pyplot as plt
         comp = _get_composition_object(comp)
         axes = plt.gca()
         xlim , ylim = axes.get_xlim() , axes.get_ylim()
@@ -556,7 +735,7 @@ class StabilityDiagram:
         return plt
     
 
-    def add_heatmap(self,comp,elements,cbar_label='$\Delta\mu_{O}$',cbar_values=True,**kwargs):
+    def add_heatmap(self,comp,elements,cbar_label='$\Delta\mu_{O}$',cbar_values=True,npoints=100,**kwargs):
         """
         Add heatmap that shows the value of the last chemical potential based on the values of the other two "free" 
         chemical potentials and the composition of interest. Currently works only for 3 component PDs.
@@ -572,6 +751,8 @@ class StabilityDiagram:
         cbar_values : tuple or bool
             Show max e min chempot values on colorbar. If tuple the values are used, if not the 
             minimum chempot and 0 are used. The default is True.
+        npoints : int
+            Number of points of the mesh in each direction. The default is 100.
         **kwargs : dict
             kwargs for "pcolormesh" function.
 
@@ -581,20 +762,11 @@ class StabilityDiagram:
             Matplotlib object.
 
         """        
+        import matplotlib.pyplot as plt
         comp = _get_composition_object(comp)
-        el1,el2 = elements  
-        
-        def f(mu1,mu2):            
-            return self.pdh.calculate_single_chempot(comp,{el1:mu1,el2:mu2})
-        
         axes = plt.gca()
         xlim , ylim = axes.get_xlim() , axes.get_ylim()
-        npoints = 100
-        x = np.arange(xlim[0],xlim[1]+0.1,abs(xlim[1]+0.1-xlim[0])/npoints)
-        y = np.arange(ylim[0],ylim[1]+0.1,abs(ylim[1]+0.1-ylim[0])/npoints)   
-        
-        X,Y = np.meshgrid(x,y)
-        Z = f(X,Y)
+        X,Y,Z = self.get_heatmap_arrays(comp,elements,xlim,ylim,npoints)
 
         plt.pcolormesh(X,Y,Z,vmax=0,shading='auto',**kwargs)
 
@@ -647,10 +819,7 @@ class StabilityDiagram:
             Matplotlib object.
 
         """         
-        points = {}
-        for r,mu in reservoirs.items():
-            points[r] = [mu[el] for el in elements]
-        
+        points = dict(zip(reservoirs.keys(),reservoirs.get_array(elements)))
         return self.add_points(points,size,label_size,color,edgecolor,label_color,linewidths,**kwargs)
         
     
@@ -660,24 +829,55 @@ class StabilityDiagram:
 
         Parameters
         ----------
-        mu : float
+        mu : float or np.array
             Indipendent variable of chemical potential.
         comp : str or Composition
             Composition of the phase.
-        variable_element : Pymatgen Element object
+        variable_element : str
             Element chosen as indipendent variable.
         chempots_ref : dict
             Dictionary with fixed chemical potentials (values relative to reference phase). The format is {Element:chempot}.
         
         Returns
         -------
-        chempot : float
+        chempot : float or np.array
             Chemical potential in eV.
 
         """
         comp = _get_composition_object(comp)
-        chempots_ref[variable_element] = mu
-        return self.chempots_analysis.calculate_single_chempot(comp,chempots_ref)
+        chempots_ref = dict(chempots_ref)
+        chempots_ref[variable_element] = np.asarray(mu,dtype=float)
+        return self.pdh.calculate_single_chempot(comp,chempots_ref)
+    
+    
+    def get_heatmap_arrays(self,comp,elements,xlim,ylim,npoints=100):
+        """
+        Get mesh and values of the heatmap of `add_heatmap`. The chemical potential is evaluated 
+        on the whole mesh at once.
+
+        Parameters
+        ----------
+        comp : str or Composition
+            Composition of interest to compute the chemical potential.
+        elements : list
+            List of strings with elements with free chemical potentials.
+        xlim, ylim : tuple
+            Limits of the free chemical potentials.
+        npoints : int
+            Number of points of the mesh in each direction.
+
+        Returns
+        -------
+        X, Y, Z : np.array
+            Mesh of the free chemical potentials and values of the dependent chemical potential.
+        """
+        comp = _get_composition_object(comp)
+        el1,el2 = elements
+        x = np.arange(xlim[0],xlim[1]+0.1,abs(xlim[1]+0.1-xlim[0])/npoints)
+        y = np.arange(ylim[0],ylim[1]+0.1,abs(ylim[1]+0.1-ylim[0])/npoints)   
+        X,Y = np.meshgrid(x,y)
+        Z = self.pdh.calculate_single_chempot(comp,{el1:X,el2:Y})
+        return X,Y,Z
     
     
     def get_plot(self,elements,figsize=None):
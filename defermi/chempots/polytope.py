@@ -0,0 +1,309 @@
+
+import itertools
+import numpy as np
+from pymatgen.core.composition import Composition
+
+from .phase_diagram import PDHandler
+from .reservoirs import Reservoirs
+
+
+class StabilityPolytope:
+
+    def __init__(self,phase_diagram,composition,lower_bounds=None):
+        """
+        Stability region of a target phase in the space of the chemical potentials
+        (delta mu, relative to the elemental references) of all the elements of a phase diagram
+        with any number of components.
+
+        The region is defined by linear constraints:
+
+        - sum_i n_i(target) * mu_i = formation energy of target (per formula unit)
+        - sum_i n_i(P) * mu_i <= formation energy of P for every other stable phase P
+          (elemental phases give mu_i <= 0).
+
+        Vertices, barycenters and samples are computed on slices of the region where
+        the chemical potentials of some elements are fixed (e.g. oxygen). Outputs are arrays
+        with columns ordered as `self.elements`, relative to the elemental references.
+
+        Parameters
+        ----------
+        phase_diagram : PhaseDiagram
+            Pymatgen PhaseDiagram object.
+        composition : str or Composition
+            Composition of the target phase, must be a stable phase of the phase diagram.
+        lower_bounds : dict
+            Lower limits of chemical potentials (delta mu) for elements that are not in the
+            target composition ({el:value}). Needed for such elements because otherwise the
+            region is unbounded.
+        """
+        pdh = PDHandler(phase_diagram)
+        self.pd = phase_diagram
+        self.composition = Composition(composition) if type(composition) == str else composition
+        self.mu_refs = pdh.mu_refs
+        self.elements = list(self.mu_refs.keys())
+        target = self.composition.reduced_composition
+
+        self.A_eq = np.array([target[el] for el in self.elements],dtype=float)
+        self.b_eq = pdh.get_formation_energy_from_stable_comp(target)
+        A_ub, b_ub = [], []
+        for entry in phase_diagram.stable_entries:
+            comp, factor = entry.composition.get_reduced_composition_and_factor()
+            if comp == target:
+                continue
+            A_ub.append([comp[el] for el in self.elements])
+            b_ub.append(phase_diagram.get_form_energy(entry)/factor)
+
+        lower_bounds = lower_bounds or {}
+        for el in self.elements:
+            if el not in target.get_el_amt_dict():
+                if el not in lower_bounds:
+                    raise ValueError(f'Lower bound of chemical potential must be provided for {el}, not present in target composition')
+                row = np.zeros(len(self.elements))
+                row[self.elements.index(el)] = -1
+                A_ub.append(row)
+                b_ub.append(-1*lower_bounds[el])
+        self.A_ub = np.array(A_ub,dtype=float)
+        self.b_ub = np.array(b_ub,dtype=float)
+
+
+    def _get_reduced_system(self,fixed_chempots=None):
+        """
+        Substitute fixed chemical potentials and eliminate one variable with the equality constraint.
+        Returns a function that maps reduced coordinates y to full chemical potentials, the
+        reduced inequalities A y <= b and the indexes of the elements of the reduced coordinates.
+        """
+        fixed_chempots = fixed_chempots or {}
+        for el in fixed_chempots:
+            if el not in self.elements:
+                raise ValueError(f'{el} is not in the phase diagram elements: {self.elements}')
+        fixed = [self.elements.index(el) for el in fixed_chempots]
+        mu_fixed = np.array([fixed_chempots[el] for el in fixed_chempots],dtype=float)
+        free = [i for i in range(len(self.elements)) if i not in fixed]
+        candidates = [i for i in free if self.A_eq[i] != 0]
+        if not candidates:
+            raise ValueError('All elements of the target composition have fixed chemical potentials')
+        pivot = max(candidates, key=lambda i: self.A_eq[i])
+        variables = [i for i in free if i != pivot]
+
+        # mu_pivot = c0 + c @ y
+        c0 = (self.b_eq - self.A_eq[fixed] @ mu_fixed) / self.A_eq[pivot]
+        c = -1*self.A_eq[variables] / self.A_eq[pivot]
+        A = self.A_ub[:,variables] + np.outer(self.A_ub[:,pivot],c)
+        b = self.b_ub - self.A_ub[:,fixed] @ mu_fixed - self.A_ub[:,pivot]*c0
+
+        def to_full(y):
+            y = np.atleast_2d(y)
+            mu = np.zeros((y.shape[0],len(self.elements)))
+            mu[:,fixed] = mu_fixed
+            mu[:,variables] = y
+            mu[:,pivot] = c0 + y @ c
+            return mu
+
+        return to_full, A, b, variables
+
+
+    def get_chebyshev_center(self,fixed_chempots=None):
+        """
+        Get the Chebyshev center (center of the largest inscribed ball) of the stability region.
+
+        Parameters
+        ----------
+        fixed_chempots : dict
+            Fixed chemical potentials (delta mu) in the format {el:value}.
+
+        Returns
+        -------
+        center : np.array
+            Chemical potentials (delta mu), ordered as `self.elements`.
+        radius : float
+            Radius of the inscribed ball in the reduced space.
+        """
+        to_full, A, b, _ = self._get_reduced_system(fixed_chempots)
+        y, radius = self._chebyshev_center(A,b,fixed_chempots)
+        return to_full(y)[0], radius
+
+
+    def _chebyshev_center(self,A,b,fixed_chempots=None):
+        message = f'Target phase {self.composition.reduced_formula} is not stable for chemical potentials: {fixed_chempots}'
+        if A.shape[1] == 0:
+            if np.any(b < -1e-08):
+                raise ValueError(message)
+            return np.zeros(0), 0
+        from scipy.optimize import linprog
+        norms = np.linalg.norm(A,axis=1)
+        objective = np.zeros(A.shape[1]+1)
+        objective[-1] = -1
+        result = linprog(objective,A_ub=np.hstack((A,norms[:,None])),b_ub=b,
+                         bounds=[(None,None)]*A.shape[1] + [(0,None)],method='highs')
+        if not result.success:
+            raise ValueError(message)
+        return result.x[:-1], result.x[-1]
+
+
+    def get_vertices(self,fixed_chempots=None):
+        """
+        Get vertices of the stability region.
+
+        Parameters
+        ----------
+        fixed_chempots : dict
+            Fixed chemical potentials (delta mu) in the format {el:value}.
+
+        Returns
+        -------
+        vertices : np.array
+            Array (nvertices x nelements) of chemical potentials (delta mu), ordered as `self.elements`.
+        """
+        to_full, A, b, _ = self._get_reduced_system(fixed_chempots)
+        dim = A.shape[1]
+        y0, radius = self._chebyshev_center(A,b,fixed_chempots)
+        if dim == 0:
+            return to_full(y0)
+        elif dim == 1:
+            lower = np.max(b[A[:,0] < 0] / A[A[:,0] < 0,0])
+            upper = np.min(b[A[:,0] > 0] / A[A[:,0] > 0,0])
+            vertices = np.array([[lower],[upper]])
+        elif radius < 1e-08: # degenerate region, enumerate intersections of constraints
+            vertices = []
+            for rows in itertools.combinations(range(len(b)),dim):
+                rows = list(rows)
+                if abs(np.linalg.det(A[rows])) < 1e-12:
+                    continue
+                y = np.linalg.solve(A[rows],b[rows])
+                if np.all(A @ y <= b + 1e-06):
+                    vertices.append(y)
+            vertices = np.array(vertices)
+        else:
+            from scipy.spatial import HalfspaceIntersection
+            hs = HalfspaceIntersection(np.hstack((A,-1*b[:,None])),y0)
+            vertices = hs.intersections
+        vertices = np.unique(np.round(vertices,8),axis=0)
+        return to_full(vertices)
+
+
+    def get_barycenter(self,fixed_chempots=None):
+        """
+        Get barycenter of the vertices of the stability region.
+
+        Parameters
+        ----------
+        fixed_chempots : dict
+            Fixed chemical potentials (delta mu) in the format {el:value}.
+
+        Returns
+        -------
+        barycenter : np.array
+            Chemical potentials (delta mu), ordered as `self.elements`.
+        """
+        return self.get_vertices(fixed_chempots).mean(axis=0)
+
+
+    def get_barycenters(self,element,values):
+        """
+        Get barycenters of the slices of the stability region with fixed chemical potential
+        of one element.
+
+        Parameters
+        ----------
+        element : str
+            Element with fixed chemical potential.
+        values : list or np.array
+            Values of the chemical potential (delta mu).
+
+        Returns
+        -------
+        barycenters : np.array
+            Array (nvalues x nelements) of chemical potentials (delta mu).
+        """
+        return np.array([self.get_barycenter({element:mu}) for mu in values])
+
+
+    def sample(self,npoints,fixed_chempots=None,method='random',seed=None,max_iterations=1000):
+        """
+        Sample chemical potentials inside the stability region.
+
+        Parameters
+        ----------
+        npoints : int
+            With method "random" the number of samples, with method "grid" the number of
+            points in each dimension of the grid.
+        fixed_chempots : dict
+            Fixed chemical potentials (delta mu) in the format {el:value}.
+        method : str
+            "random" for uniform random samples (rejection sampling in the bounding box of the
+            vertices), "grid" for points of a regular grid inside the region. If the region has
+            zero volume (e.g. a slice on its boundary) random samples are convex combinations
+            of the vertices.
+        seed : int
+            Seed for the random number generator.
+        max_iterations : int
+            Maximum number of batches of rejection sampling, a ValueError is raised if `npoints`
+            samples are not reached.
+
+        Returns
+        -------
+        samples : np.array
+            Array (nsamples x nelements) of chemical potentials (delta mu).
+        """
+        to_full, A, b, variables = self._get_reduced_system(fixed_chempots)
+        dim = A.shape[1]
+        vertices = self.get_vertices(fixed_chempots)
+        if dim == 0:
+            return vertices
+        lower, upper = vertices[:,variables].min(axis=0), vertices[:,variables].max(axis=0)
+
+        if method == 'grid':
+            axes = [np.linspace(lower[i],upper[i],npoints) for i in range(dim)]
+            y = np.array(np.meshgrid(*axes,indexing='ij')).reshape(dim,-1).T
+            y = y[np.all(y @ A.T <= b + 1e-08,axis=1)]
+        elif method == 'random':
+            rng = np.random.default_rng(seed)
+            y_vertices = vertices[:,variables]
+            if len(y_vertices) == 1:
+                return vertices
+            if np.linalg.matrix_rank(y_vertices - y_vertices.mean(axis=0),tol=1e-08) < dim:
+                # zero volume (e.g. slice on the boundary of the region): convex combinations of the vertices
+                y = rng.dirichlet(np.ones(len(y_vertices)),size=npoints) @ y_vertices
+                return to_full(y)
+            samples = []
+            nsamples = 0
+            for _ in range(max_iterations):
+                y = rng.uniform(lower,upper,size=(max(npoints,100),dim))
+                y = y[np.all(y @ A.T <= b + 1e-08,axis=1)]
+                samples.append(y)
+                nsamples += len(y)
+                if nsamples >= npoints:
+                    break
+            else:
+                raise ValueError(f'Rejection sampling did not reach {npoints} samples in {max_iterations} iterations')
+            y = np.vstack(samples)[:npoints]
+        else:
+            raise ValueError('Sampling method must be "random" or "grid"')
+        return to_full(y)
+
+
+    def to_reservoirs(self,chempots_array,labels=None,absolute=True):
+        """
+        Convert array of chemical potentials (delta mu) to array-backed Reservoirs object.
+
+        Parameters
+        ----------
+        chempots_array : np.array
+            Array (npoints x nelements) of chemical potentials (delta mu), ordered as `self.elements`.
+        labels : list
+            Keys of the Reservoirs. If None integers are used.
+        absolute : bool
+            Convert to absolute chemical potentials.
+
+        Returns
+        -------
+        reservoirs : Reservoirs
+            Reservoirs object.
+        """
+        chempots_array = np.round(np.atleast_2d(chempots_array),6) # as in Chempots
+        labels = labels if labels is not None else list(range(len(chempots_array)))
+        res = Reservoirs.from_array(chempots_array,labels,self.elements,
+                                    phase_diagram=self.pd,mu_refs=self.mu_refs,are_chempots_delta=True)
+        if absolute:
+            res.set_to_absolute()
+        return res
@@ -9,11 +9,10 @@ Created on Mon Jun  2 16:33:50 2025
 import warnings
 import json
 import os.path as op
-from pandas import DataFrame
 from monty.json import MSONable, MontyEncoder
 import copy
+import numpy as np
 
-from pymatgen.analysis.phase_diagram import PhaseDiagram
 
 from .core import Chempots
 from .phase_diagram import PDHandler
@@ -26,6 +25,11 @@ class Reservoirs(MSONable):
         """
         Class to handle dictionaries of chemical potentials. Works almost completely like a python dictionary.
 
+        Reservoirs can also be backed by a matrix of chemical potentials (npoints x nelements), 
+        see `from_array`. In that case conversions between absolute and referenced values, 
+        filtering, DataFrame export and `get_array` are array operations, and the dictionary 
+        of Chempots is only built when single reservoirs are accessed.
+
         Parameters
         ----------
         res_dict : dict
@@ -39,7 +43,8 @@ class Reservoirs(MSONable):
             Set this variable to True if chempots in dictionary are referenced values.
 
         """
-        self.res_dict = res_dict
+        self._res_dict = res_dict
+        self._array = None
         self.pd = phase_diagram 
         if mu_refs:
             self.mu_refs = mu_refs
@@ -62,10 +67,10 @@ class Reservoirs(MSONable):
         return self.get_dataframe()._repr_html_()
 
     def __len__(self):
-        return len(self.res_dict)
+        return len(self.keys())
 
     def __iter__(self):
-        return self.res_dict.keys().__iter__()
+        return self.keys().__iter__()
 
     def __getitem__(self,reskey):
         return self.res_dict[reskey]
@@ -83,6 +88,8 @@ class Reservoirs(MSONable):
             return False
 
     def keys(self):
+        if self._array:
+            return dict.fromkeys(self._array['keys']).keys()
         return self.res_dict.keys()
 
     def values(self):
@@ -92,6 +99,10 @@ class Reservoirs(MSONable):
         return self.res_dict.items()
 
     def copy(self):
+        if self._array:
+            res = Reservoirs({},phase_diagram=self.pd,are_chempots_delta=self.are_chempots_delta,mu_refs=self.mu_refs)
+            res._set_array(self._array['array'].copy(),self._array['keys'],self._array['elements'])
+            return res
         return Reservoirs(copy.deepcopy(self.res_dict),phase_diagram=self.pd,
                           are_chempots_delta=self.are_chempots_delta,mu_refs=self.mu_refs)
     
@@ -108,6 +119,117 @@ class Reservoirs(MSONable):
     def are_chempots_delta(self):
         return self._are_chempots_delta
 
+    @property
+    def res_dict(self):
+        """
+        Dictionary with reservoir names as keys and Chempots as values. 
+        For array-backed Reservoirs the dictionary is built on first access, 
+        after that the dictionary is used as storage.
+        """
+        if self._array:
+            array, keys, elements = self._array['array'], self._array['keys'], self._array['elements']
+            self._res_dict = {
+                r:Chempots({el:mu for el,mu in zip(elements,row.tolist()) if not np.isnan(mu)},ndecimals=None) 
+                for r,row in zip(keys,array)}
+            self._array = None
+        return self._res_dict
+
+    @res_dict.setter
+    def res_dict(self,res_dict):
+        self._res_dict = res_dict
+        self._array = None
+
+    @property
+    def elements(self):
+        """
+        Element symbols of the chemical potentials, in order of appearance.
+        """
+        if self._array:
+            return list(self._array['elements'])
+        elements = []
+        for mu in self.res_dict.values():
+            for el in mu:
+                if el not in elements:
+                    elements.append(el)
+        return elements
+
+    @property
+    def is_array_backed(self):
+        """
+        True if the chemical potentials are stored in a matrix (see `from_array`).
+        """
+        return bool(self._array)
+
+    @classmethod
+    def from_array(cls,chempots_array,keys,elements,ndecimals=6,**kwargs):
+        """
+        Build array-backed Reservoirs from a matrix of chemical potentials.
+
+        Parameters
+        ----------
+        chempots_array : np.array
+            Array (npoints x nelements) of chemical potentials. NaN values are treated as
+            elements missing from the reservoir.
+        keys : list
+            Reservoir names (e.g. partial pressures), one for each row. For repeated keys
+            the last row is kept, as in a dictionary.
+        elements : list
+            Element symbols, one for each column.
+        ndecimals : int
+            Round the chemical potentials to this number of decimals, as in `Chempots`.
+            If None the numbers are left untouched.
+        **kwargs : dict
+            Arguments of the class constructor (e.g. phase_diagram, mu_refs, are_chempots_delta,
+            temperature for PressureReservoirs).
+
+        Returns
+        -------
+        reservoirs : Reservoirs
+            Reservoirs object.
+        """
+        chempots_array = np.array(chempots_array,dtype=float).reshape(len(keys),len(elements))
+        keys = list(keys)
+        if len(set(keys)) < len(keys): # same as dictionary, the last value of repeated keys is kept
+            rows = {k:idx for idx,k in enumerate(keys)}
+            keys = list(rows.keys())
+            chempots_array = chempots_array[list(rows.values())]
+        if ndecimals:
+            chempots_array = np.round(chempots_array,ndecimals)
+        res = cls({},**kwargs)
+        res._set_array(chempots_array,keys,elements)
+        return res
+
+    def _set_array(self,chempots_array,keys,elements):
+        self._res_dict = None
+        self._array = {'array':chempots_array,'keys':list(keys),'elements':list(elements)}
+
+    def get_array(self,elements=None):
+        """
+        Get matrix of chemical potentials (npoints x nelements), rows are ordered as `keys()`.
+
+        Parameters
+        ----------
+        elements : list
+            Element symbols for the columns. If None `self.elements` is used.
+            Elements missing from a reservoir are set to NaN.
+
+        Returns
+        -------
+        chempots_array : np.array
+            Array of chemical potentials.
+        """
+        elements = elements or self.elements
+        if self._array:
+            columns = [self._array['elements'].index(el) if el in self._array['elements'] else None 
+                       for el in elements]
+            array = np.full((len(self._array['keys']),len(elements)),np.nan)
+            for j,idx in enumerate(columns):
+                if idx is not None:
+                    array[:,j] = self._array['array'][:,idx]
+            return array
+        return np.array([[mu[el] if el in mu.keys() else np.nan for el in elements] 
+                         for mu in self.res_dict.values()],dtype=float).reshape(len(self),len(elements))
+
     def as_dict(self):
         """
         Json-serializable dict representation of a Reservoirs object. 
@@ -121,7 +243,7 @@ class Reservoirs(MSONable):
         d = {}
         d['@module'] = self.__class__.__module__
         d['@class'] = self.__class__.__name__
-        d['res_dict'] = {r:mu.as_dict() for r,mu in self.res_dict.items()} 
+        d['res_dict'] = self._get_res_dict_as_dicts()
         d['phase_diagram'] = self.pd.as_dict() if self.pd else None
         d['mu_refs'] = self.mu_refs.as_dict() if self.mu_refs else None
         d['are_chempots_delta'] = self.are_chempots_delta
@@ -173,6 +295,7 @@ class Reservoirs(MSONable):
         res_dict = {}
         for res,chempots in d['res_dict'].items():
             res_dict[res] = Chempots.from_dict(chempots)
+        from pymatgen.analysis.phase_diagram import PhaseDiagram
         phase_diagram = PhaseDiagram.from_dict(d['phase_diagram']) if d['phase_diagram'] else None
         mu_refs = Chempots.from_dict(d['mu_refs']) if d['mu_refs'] else None
         are_chempots_delta = d['are_chempots_delta']
@@ -223,6 +346,20 @@ class Reservoirs(MSONable):
         """
         res = self.copy()
         mu_refs = self.mu_refs.copy()
+        if self._array and elements:
+            if mu_refs:
+                for el in list(mu_refs.keys()):
+                    if el not in elements:
+                        del mu_refs[el]
+            kept = [el for el in self.elements if el in elements]
+            res._set_array(self.get_array(kept),self._array['keys'],kept)
+            if inplace:
+                self._array = res._array
+                self.mu_refs = mu_refs
+                return
+            res.mu_refs = mu_refs
+            return res
+        
         filtered_dict = res.res_dict
         if elements:
             d = filtered_dict.copy()
@@ -246,6 +383,8 @@ class Reservoirs(MSONable):
         Return values of chempots from referenced to absolute 
         """
         if self.are_chempots_delta:
+            if self._array:
+                return self.copy()._get_converted_array(sign=1).res_dict
             return {r:mu.get_absolute(self.mu_refs) for r,mu in self.res_dict.items()}
         else:
             raise ValueError('Chemical potential values are already absolute')
@@ -258,8 +397,19 @@ class Reservoirs(MSONable):
         if self.are_chempots_delta:
             raise ValueError('Chemical potential values are already with respect to reference')
         else:
+            if self._array:
+                return self.copy()._get_converted_array(sign=-1).res_dict
             return {r:mu.get_referenced(self.mu_refs) for r,mu in self.res_dict.items()}
 
+
+    def _get_converted_array(self,sign):
+        """
+        Add (sign=1) or subtract (sign=-1) reference chempots to the matrix of array-backed Reservoirs, in place.
+        """
+        mu_refs = np.array([self.mu_refs[el] for el in self._array['elements']],dtype=float)
+        self._array['array'] = np.round(self._array['array'] + sign*mu_refs[None,:],6) # as in Chempots
+        return self
+
     
     def get_dataframe(self,format_symbols=False,format_compositions=False,all_math=False,ndecimals=None):
         """
@@ -282,9 +432,14 @@ class Reservoirs(MSONable):
             DataFrame object.
 
         """
-        res = self._get_res_dict_with_symbols(format_symbols)
-        df = DataFrame(res)
-        df = df.transpose()
+        from pandas import DataFrame
+        if self._array:
+            labels = [self._get_symbol_label(el) if format_symbols else el for el in self._array['elements']]
+            df = DataFrame(self._array['array'],index=self._array['keys'],columns=labels)
+        else:
+            res = self._get_res_dict_with_symbols(format_symbols)
+            df = DataFrame(res)
+            df = df.transpose()
         if format_compositions:
             new_index = []
             for string in df.index:
@@ -339,8 +494,10 @@ class Reservoirs(MSONable):
         """
         Set reservoir dictionary to absolute values of chempots.
         """
-        new_res_dict = self.get_absolute_res_dict()
-        self.res_dict = new_res_dict
+        if self._array and self.are_chempots_delta:
+            self._get_converted_array(sign=1)
+        else:
+            self.res_dict = self.get_absolute_res_dict()
         self._are_chempots_delta = False
         return
 
@@ -349,8 +506,10 @@ class Reservoirs(MSONable):
         """
         Set reservoir dictionary to referenced values of chempots.
         """
-        new_res_dict = self.get_referenced_res_dict()
-        self.res_dict = new_res_dict
+        if self._array and not self.are_chempots_delta:
+            self._get_converted_array(sign=-1)
+        else:
+            self.res_dict = self.get_referenced_res_dict()
         self._are_chempots_delta = True
         return    
     
@@ -364,16 +523,25 @@ class Reservoirs(MSONable):
             new_dict[res] = {}
             chempots = chempots.mu #keep just dict for DataFrame
             for el in chempots:
-                if format_symbols:
-                    if self.are_chempots_delta:
-                        label = '$\Delta \mu_{\text{%s}}$' %el
-                    else:
-                        label = '$\mu_{\text{%s}}$' %el
-                else:
-                    label = el
+                label = self._get_symbol_label(el) if format_symbols else el
                 new_dict[res][label] = chempots[el]
         return new_dict
 
+
+    def _get_symbol_label(self,el):
+        if self.are_chempots_delta:
+            return '$\Delta \mu_{\text{%s}}$' %el
+        else:
+            return '$\mu_{\text{%s}}$' %el
+
+
+    def _get_res_dict_as_dicts(self):
+        if self._array:
+            elements = self._array['elements']
+            return {r:Chempots({el:mu for el,mu in zip(elements,row.tolist()) if not np.isnan(mu)},ndecimals=None).as_dict()
+                    for r,row in zip(self._array['keys'],self._array['array'])}
+        return {r:mu.as_dict() for r,mu in self.res_dict.items()}
+
     
 class PressureReservoirs(Reservoirs):
     """
@@ -382,7 +550,17 @@ class PressureReservoirs(Reservoirs):
     def __init__(self,res_dict,temperature=None,phase_diagram=None,mu_refs=None,are_chempots_delta=False):
         super().__init__(res_dict,phase_diagram,mu_refs,are_chempots_delta)
         self.temperature = temperature
-        self.pressures = list(self.res_dict.keys())
+        
+    @property
+    def pressures(self):
+        return list(self.keys())
+
+    def copy(self):
+        res = super().copy()
+        pres = PressureReservoirs({},temperature=self.temperature,phase_diagram=self.pd,
+                                  mu_refs=self.mu_refs,are_chempots_delta=self.are_chempots_delta)
+        pres._res_dict, pres._array = res._res_dict, res._array
+        return pres
         
     
     def __eq__(self, other):
@@ -407,7 +585,7 @@ class PressureReservoirs(Reservoirs):
         d = {}
         d['@module'] = self.__class__.__module__
         d['@class'] = self.__class__.__name__
-        d['res_dict'] = {r:mu.as_dict() for r,mu in self.res_dict.items()}
+        d['res_dict'] = self._get_res_dict_as_dicts()
         d['temperature'] = self.temperature
         d['phase_diagram'] = self.pd.as_dict() if self.pd else None
         d['mu_refs'] = self.mu_refs.as_dict() if self.mu_refs else None
@@ -431,6 +609,7 @@ class PressureReservoirs(Reservoirs):
         """
         res_dict = {float(r):Chempots.from_dict(mu) for r,mu in d['res_dict'].items()}
         temperature = d['temperature'] if 'temperature' in d.keys() else None
+        from pymatgen.analysis.phase_diagram import PhaseDiagram
         phase_diagram = PhaseDiagram.from_dict(d['phase_diagram']) if d['phase_diagram'] else None
         mu_refs = Chempots.from_dict(d['mu_refs'])  if d['mu_refs'] else None
         are_chempots_delta = d['are_chempots_delta']
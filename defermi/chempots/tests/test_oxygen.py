@@ -12,9 +12,11 @@ from defermi.chempots.oxygen import (
                                             get_barycenter_chemical_potentials_absolute,
                                             get_barycenter_chemical_potentials_relative,
                                             get_oxygen_chempot_from_pO2,
+                                            get_oxygen_chempot_grid,
                                             get_oxygen_chempot_standard_finite_temperature,
                                             get_oxygen_pressure_reservoirs,
-                                            get_pressure_reservoirs_from_phase_diagram
+                                            get_pressure_reservoirs_from_phase_diagram,
+                                            get_pressure_reservoirs_from_precursors
                                             )
 from defermi.chempots.core import Chempots
 from defermi.testing.chempots import ReservoirsTest
@@ -30,6 +32,21 @@ def test_chempot_from_pO2():
     actual = get_oxygen_chempot_from_pO2(temperature=1300,partial_pressure=0.2,muO_reference=muO_reference)
     desired += muO_reference
     np.testing.assert_allclose(actual, desired, atol=1e-04)
+
+
+def test_oxygen_chempot_grid():
+    temperatures = [800,1000,1300]
+    partial_pressures = np.logspace(-20,10,7)
+    grid = get_oxygen_chempot_grid(temperatures,partial_pressures,muO_reference=-5)
+    assert grid.shape == (3,7)
+    for i,T in enumerate(temperatures):
+        for j,p in enumerate(partial_pressures):
+            np.testing.assert_allclose(grid[i,j],get_oxygen_chempot_from_pO2(T,p,muO_reference=-5),atol=1e-12)
+    np.testing.assert_allclose(get_oxygen_chempot_grid(1300,0.2),[[-1.516694354091398]],atol=1e-04)
+
+    reservoirs = get_oxygen_pressure_reservoirs(oxygen_ref=-5,temperature=temperatures,pressure_range=(1e-20,1e10),npoints=7)
+    assert list(reservoirs.keys()) == temperatures
+    np.testing.assert_allclose([mu['O'] for mu in reservoirs[1000].values()],grid[1],atol=1e-06)
     
     
     
@@ -44,4 +61,71 @@ class TestOxygenReservoirs(TestChempots):
           1e10: Chempots({'O': -7.01})
           }
         ox_res = get_oxygen_pressure_reservoirs(oxygen_ref=self.mu_abs['O'],temperature=1300,npoints=5)
-        ReservoirsTest().assert_Reservoirs_equal( ox_res , PressureReservoirs(ox_res_dict) ,check_reference=False, rtol=1e-02)
\ No newline at end of file
+        ReservoirsTest().assert_Reservoirs_equal( ox_res , PressureReservoirs(ox_res_dict) ,check_reference=False, rtol=1e-02)
+
+
+    def test_pressure_reservoirs_from_phase_diagram(self):
+        from pymatgen.analysis.phase_diagram import PhaseDiagram
+        from defermi.tools.utils import get_object_from_json
+        pd = get_object_from_json(PhaseDiagram,self.get_testfile_path('PD_Na-Nb-O.json'))
+        res_dict = {
+          1e-20: Chempots({'Na': -3.053346, 'Nb': -13.442931, 'O': -8.014896}),
+          1e10: Chempots({'Na': -4.541506, 'Nb': -20.883733, 'O': -5.038575})
+          }
+        res = get_pressure_reservoirs_from_phase_diagram(pd,'NaNbO3',temperature=1000,npoints=50)
+        assert len(res) == 50
+        ReservoirsTest().assert_Reservoirs_equal( 
+            PressureReservoirs({p:res[p] for p in res_dict}) , PressureReservoirs(res_dict) ,check_reference=False, rtol=1e-05)
+        
+        res_temperatures = get_pressure_reservoirs_from_phase_diagram(pd,'NaNbO3',temperature=[600,1000],npoints=50)
+        assert list(res_temperatures.keys()) == [600,1000]
+        assert res_temperatures[600].temperature == 600
+        ReservoirsTest().assert_Reservoirs_equal( res_temperatures[1000] , res ,check_reference=False)
+
+    def test_barycenter_chemical_potentials(self):
+        actual = get_barycenter_chemical_potentials_relative('SrTiO3',formation_energy=-17,oxygen_chempot_relative=-2,
+                                                             min_relative_chempots={'Sr':-8,'Ti':-9})
+        desired = {'Sr':-5,'Ti':-6,'O':-2}
+        assert list(actual.keys()) == ['Sr','Ti','O']
+        for el in desired:
+            np.testing.assert_allclose(actual[el],desired[el],atol=1e-08)
+    
+        # batched oxygen chemical potentials, compared to single evaluations
+        muO_values = np.linspace(-3,-1,5)
+        batch = get_barycenter_chemical_potentials_relative('BaSrTiZrO6',formation_energy=-35,oxygen_chempot_relative=muO_values,
+                                                            min_relative_chempots={'Ba':-7,'Sr':-6,'Ti':-9},
+                                                            max_relative_chempots={'Zr':-1})
+        for idx,muO in enumerate(muO_values):
+            single = get_barycenter_chemical_potentials_relative('BaSrTiZrO6',formation_energy=-35,oxygen_chempot_relative=muO,
+                                                                 min_relative_chempots={'Ba':-7,'Sr':-6,'Ti':-9},
+                                                                 max_relative_chempots={'Zr':-1})
+            for el in single:
+                np.testing.assert_allclose(batch[el][idx],single[el],atol=1e-08)
+            np.testing.assert_allclose(sum(single[el]*n for el,n in {'Ba':1,'Sr':1,'Ti':1,'Zr':1}.items()),-35-6*muO,atol=1e-08)
+
+        mu_refs = {'Sr':-1.5,'Ti':-7.8,'O':-4.95}
+        actual = get_barycenter_chemical_potentials_absolute('SrTiO3',energy=-40,oxygen_chempot_absolute=np.array([-6,-5.5]),mu_refs=mu_refs)
+        np.testing.assert_allclose(actual['Sr'],[-7.85,-8.6],atol=1e-08)
+        np.testing.assert_allclose(actual['Ti'],[-14.15,-14.9],atol=1e-08)
+    
+        with self.assertRaises(ValueError):
+            get_barycenter_chemical_potentials_relative('SrTiO3',formation_energy=-17,oxygen_chempot_relative=[-2,10],
+                                                        min_relative_chempots={'Sr':-8,'Ti':-9})
+
+
+def test_pressure_reservoirs_from_precursors():
+    precursors = {'SrO':-10,'TiO2':-25,'SrTiO3':-36}
+    reservoirs = get_pressure_reservoirs_from_precursors(precursors,oxygen_ref=-4.95,temperature=1000,npoints=5)
+    A = np.array([[1,0],[0,1],[1,1]])
+    for chempots in reservoirs.values():
+        assert list(chempots.keys()) == ['O','Sr','Ti']
+        B = [energy - n_O*chempots['O'] for energy,n_O in zip(precursors.values(),[1,2,3])]
+        desired = np.linalg.lstsq(A,B,rcond=None)[0]
+        np.testing.assert_allclose([chempots['Sr'],chempots['Ti']],desired,atol=1e-08)
+
+    reservoirs_dict = get_pressure_reservoirs_from_precursors(precursors,oxygen_ref=-4.95,temperature=[800,1000],npoints=5)
+    assert list(reservoirs_dict.keys()) == [800,1000]
+    assert reservoirs_dict[800].temperature == 800
+    for p,chempots in reservoirs_dict[1000].items():
+        for el in chempots:
+            np.testing.assert_allclose(chempots[el],reservoirs[p][el],atol=1e-08)
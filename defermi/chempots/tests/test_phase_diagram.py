@@ -6,13 +6,14 @@ Created on Tue Jun  3 10:18:19 2025
 @author: lorenzo
 """
 
+import numpy as np
 from pymatgen.core.composition import Composition
 from pymatgen.analysis.phase_diagram import PhaseDiagram
 
 from defermi.tools.utils import get_object_from_json
 from defermi.chempots.core import Chempots
 from defermi.chempots.reservoirs import Reservoirs
-from defermi.chempots.phase_diagram import PDHandler
+from defermi.chempots.phase_diagram import PDHandler, StabilityDiagram
 
 from defermi.testing.core import DefermiTest
 from defermi.testing.chempots import  ReservoirsTest
@@ -49,6 +50,20 @@ class TestPDHandler(DefermiTest):
         assert pdh.get_entries_from_comp(comp) == target_entries
         assert pdh.get_stable_entry_from_comp(comp) == pd.entries[94]
         self.assert_all_close (pdh.get_formation_energy_from_stable_comp(comp), -14.28 ,atol=1e-02)
+        energies = pdh.get_formation_energies_from_comp(comp)
+        assert list(energies.keys()) == target_entries
+        assert energies[pd.entries[94]] == pdh.get_formation_energy_from_stable_comp(comp)
+        assert pdh.get_energies_from_comp(comp)[pd.entries[94]] == pdh.get_energy_from_stable_comp(comp)
+        with self.assertRaises(ValueError):
+            pdh.get_entries_from_comp('Na5Nb7O2')
+        
+        # lookup tables are rebuilt when the phase diagram changes
+        pdh.get_phase_boundaries(comp)
+        entries = [e for e in pd.all_entries if e not in target_entries]
+        pdh.pd = PhaseDiagram(entries)
+        assert pdh._stability_regions == {}
+        with self.assertRaises(ValueError):
+            pdh.get_stable_entry_from_comp(comp)
         
     def test_get_phase_boundary_chempots(self):
         phase_boundary_chempots = {
@@ -58,4 +73,43 @@ class TestPDHandler(DefermiTest):
         ReservoirsTest().assert_Reservoirs_equal(  
             Reservoirs(self.pdh.get_phase_boundaries_chempots(self.comp,{'O':-1.92}) ) ,
             Reservoirs(phase_boundary_chempots),
-            check_reference=False, rtol=1e-02)
\ No newline at end of file
+            check_reference=False, rtol=1e-02)
+
+    def test_phase_boundaries(self):
+        phase_boundaries = self.pdh.get_phase_boundaries(self.comp,element='O')
+        assert self.pdh.get_phase_boundaries('NaNbO3') is phase_boundaries
+        self.assert_all_close( phase_boundaries.breakpoints , [-4.13,-4.0,-3.19,0] ,atol=1e-02)
+        for muO in (-4.1,-3.5,-1.92,-0.5):
+            ReservoirsTest().assert_Reservoirs_equal(  
+                Reservoirs(phase_boundaries.get_phase_boundaries_chempots(muO)) ,
+                Reservoirs(self.pdh.get_phase_boundaries_chempots(self.comp,{'O':muO})),
+                check_reference=False, rtol=1e-05)
+        
+        arrays = phase_boundaries.get_boundaries_arrays([-4.1,-1.92])
+        assert arrays.shape == (2,2,2)
+        self.assert_all_close( arrays[1][0] , [-2.64,-5.89] ,atol=1e-02)
+        with self.assertRaises(ValueError):
+            phase_boundaries.get_boundaries_arrays(-5)
+
+
+class TestStabilityDiagram(DefermiTest):
+
+    def setUp(self):
+        self.pd = get_object_from_json(PhaseDiagram,self.get_testfile_path('PD_Na-Nb-O.json'))
+        self.sd = StabilityDiagram(self.pd)
+
+    def test_vectorized_chempots(self):
+        pdh = self.sd.pdh
+        X,Y,Z = self.sd.get_heatmap_arrays('NaNbO3',['Na','Nb'],(-8,0),(-12,0),npoints=50)
+        assert X.shape == Y.shape == Z.shape
+        for i,j in ((0,0),(10,25),(-1,-1)):
+            self.assert_all_close( Z[i,j] , pdh.calculate_single_chempot('NaNbO3',{'Na':X[i,j],'Nb':Y[i,j]}) )
+        
+        mu = np.array([-3,-2.26,-1])
+        chempots_ref = {'O':-1.92}
+        line = self.sd.constant_chempot_line(mu,'NaNbO3','Na',chempots_ref)
+        assert chempots_ref == {'O':-1.92}
+        self.assert_all_close( line[1] , -6.26 ,atol=1e-02)
+        self.assert_all_close( line , [pdh.calculate_single_chempot('NaNbO3',{'O':-1.92,'Na':m}) for m in mu] )
+        with self.assertRaises(ValueError):
+            pdh.get_formation_energy_from_stable_comp('Na5Nb7O2')
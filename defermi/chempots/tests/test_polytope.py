@@ -0,0 +1,86 @@
+
+import numpy as np
+from pymatgen.core.composition import Composition
+from pymatgen.analysis.phase_diagram import PhaseDiagram, PDEntry
+
+from defermi.tools.utils import get_object_from_json
+from defermi.chempots.oxygen import get_pressure_reservoirs_from_phase_diagram
+from defermi.chempots.phase_diagram import PDHandler
+from defermi.chempots.polytope import StabilityPolytope
+
+from defermi.testing.core import DefermiTest
+
+
+class TestStabilityPolytope(DefermiTest):
+    
+    def setUp(self):
+        self.pd = get_object_from_json(PhaseDiagram,self.get_testfile_path('PD_Na-Nb-O.json'))
+        self.pdh = PDHandler(self.pd)
+        # quaternary phase diagram with fictitious La phases
+        mu_refs = {el.symbol:self.pd.el_refs[el].energy_per_atom for el in self.pd.el_refs}
+        mu_refs['La'] = -4.9
+        def get_entry(formula,formation_energy):
+            comp = Composition(formula)
+            return PDEntry(comp,formation_energy + sum([n*mu_refs[el.symbol] for el,n in comp.items()]))
+        entries = [get_entry('La',0),get_entry('La2O3',-18.6),get_entry('LaNbO4',-20.5),get_entry('NaLaNb2O7',-39)]
+        self.pd4 = PhaseDiagram(self.pd.all_entries + entries)
+        
+    def test_ternary(self):
+        polytope = self.pdh.get_stability_polytope('NaNbO3')
+        assert polytope.elements == ['Na','Nb','O']
+        corners = [mu.get_referenced(self.pdh.mu_refs) for mu in self.pdh.get_all_boundaries_chempots('NaNbO3').values()]
+        corners = np.array(sorted([[mu[el] for el in polytope.elements] for mu in corners]))
+        vertices = np.array(sorted(polytope.get_vertices().tolist()))
+        self.assert_all_close(vertices,corners,atol=1e-05)
+
+        phase_boundaries = self.pdh.get_phase_boundaries('NaNbO3')
+        muO = np.array([-4,-3,-1.92,-0.5])
+        barycenters = polytope.get_barycenters('O',muO)
+        self.assert_all_close(barycenters[:,:2],phase_boundaries.get_boundaries_arrays(muO).mean(axis=1),atol=1e-06)
+        self.assert_all_close(barycenters[:,2],muO)
+        with self.assertRaises(ValueError):
+            polytope.get_vertices({'O':-5})
+
+    def test_sample_boundary_slice(self):
+        polytope = self.pdh.get_stability_polytope('NaNbO3')
+        iO = polytope.elements.index('O')
+        vertices = polytope.get_vertices()
+        # O-rich and O-poor limits, zero-volume slices
+        for muO in (vertices[:,iO].max(),vertices[:,iO].min()):
+            for method in ('random','grid'):
+                samples = polytope.sample(5,fixed_chempots={'O':muO},method=method,seed=0)
+                assert len(samples) > 0
+                self.assert_all_close(samples[:,iO],muO)
+                assert np.all(samples @ polytope.A_ub.T <= polytope.b_ub + 1e-06)
+        with self.assertRaises(ValueError):
+            polytope.sample(5,fixed_chempots={'O':-2},max_iterations=0)
+
+    def test_quaternary(self):
+        polytope = StabilityPolytope(self.pd4,'NaLaNb2O7')
+        vertices = polytope.get_vertices({'O':-2})
+        assert vertices.shape == (8,4)
+        # all vertices are on the target hyperplane and inside the region
+        self.assert_all_close(vertices @ polytope.A_eq, polytope.b_eq)
+        assert np.all(vertices @ polytope.A_ub.T <= polytope.b_ub + 1e-06)
+        
+        center, radius = polytope.get_chebyshev_center({'O':-2})
+        assert radius > 0
+        for method in ('random','grid'):
+            samples = polytope.sample(10,fixed_chempots={'O':-2},method=method,seed=0)
+            self.assert_all_close(samples[:,polytope.elements.index('O')],-2)
+            assert np.all(samples @ polytope.A_ub.T <= polytope.b_ub + 1e-06)
+        assert len(polytope.sample(10,fixed_chempots={'O':-2},seed=0)) == 10
+
+        reservoirs = polytope.to_reservoirs(polytope.get_barycenters('O',[-3,-2]),labels=['a','b'])
+        self.assert_all_close(reservoirs['b']['O'],-2 + polytope.mu_refs['O'])
+
+        with self.assertRaises(ValueError):
+            StabilityPolytope(self.pd4,'NaNbO3')
+        polytope = StabilityPolytope(self.pd4,'NaNbO3',lower_bounds={'La':-12})
+        self.assert_all_close(polytope.get_vertices()[:,polytope.elements.index('La')].min(),-12)
+
+    def test_pressure_reservoirs(self):
+        reservoirs = get_pressure_reservoirs_from_phase_diagram(self.pd4,'NaLaNb2O7',temperature=1000,npoints=10)
+        assert len(reservoirs) == 10
+        for mu in reservoirs.values():
+            assert list(mu.keys()) == ['Na','La','Nb','O']
@@ -6,6 +6,7 @@ Created on Tue Jun  3 10:08:17 2025
 @author: lorenzo
 """
 import os
+import numpy as np
 
 from pymatgen.analysis.phase_diagram import PhaseDiagram
 
@@ -47,4 +48,32 @@ class TestReservoirs(TestChempots):
         ReservoirsTest().assert_Reservoirs_equal( self.res , Reservoirs({'X':self.mu}), check_reference=False, rtol=1e-03)
         res_filtered = Reservoirs({'X':Chempots({'Na':-2.26,'O':-1.92})})
         ReservoirsTest().assert_Reservoirs_equal( 
-            self.res.filter_reservoirs(elements=['Na','O']), res_filtered , check_reference=False, rtol=1e-03)
\ No newline at end of file
+            self.res.filter_reservoirs(elements=['Na','O']), res_filtered , check_reference=False, rtol=1e-03)
+
+
+    def test_array_backed(self):
+        elements = list(self.mu.keys())
+        array = np.array([[self.mu[el] for el in elements],[self.mu[el] - 1 for el in elements]])
+        res = Reservoirs.from_array(array,['X','Y'],elements,phase_diagram=self.res.pd,are_chempots_delta=True)
+        assert res.is_array_backed
+        assert list(res.keys()) == ['X','Y']
+        assert res.elements == elements
+        np.testing.assert_allclose(res.get_array(),array)
+        np.testing.assert_allclose(res.get_dataframe().values,array)
+        
+        res_abs = res.copy()
+        res_abs.set_to_absolute()
+        assert res_abs.is_array_backed
+        np.testing.assert_allclose(res_abs.get_array()[0],[self.mu_abs[el] for el in elements],rtol=1e-03)
+        res_abs.set_to_referenced()
+        np.testing.assert_allclose(res_abs.get_array(),array,atol=1e-06)
+        
+        res_filtered = res.filter_reservoirs(elements=['Na','O'])
+        assert res_filtered.is_array_backed
+        assert res_filtered.elements == ['Na','O']
+        assert list(res_filtered.mu_refs.keys()) == ['Na','O']
+        
+        # dict is built when single reservoirs are accessed
+        ReservoirsTest().assert_Chempots_equal( res['X'] , self.mu , rtol=1e-07)
+        assert not res.is_array_backed
+        ReservoirsTest().assert_Reservoirs_equal( Reservoirs.from_dict(res_abs.as_dict()) , res_abs, rtol=1e-07)
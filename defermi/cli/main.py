@@ -2,6 +2,7 @@
 import argparse
 
 from .gui import setup_gui
+from .run import setup_run
 
 
 def main():
@@ -17,6 +18,7 @@ def main():
     subparsers = parser.add_subparsers()
     
     setup_gui(subparsers)
+    setup_run(subparsers)
     
     args = parser.parse_args()
     
@@ -0,0 +1,329 @@
+
+import itertools
+import json
+import os
+import os.path as op
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def setup_run(subparsers):
+
+    subparsers_run = subparsers.add_parser('run',help='Run thermodynamic sweeps in batch from a run specification (json)')
+    subparsers_run.add_argument('spec',help='Path to run specification file (json)')
+    subparsers_run.add_argument('-w','--workers',type=int,default=1,help='Number of worker processes (default: 1)')
+    subparsers_run.add_argument('-o','--output-dir',dest='output_dir',default=None,
+                                help='Directory to write ThermoData files to, overrides "output_dir" in the run specification')
+    subparsers_run.add_argument('-r','--resume',action='store_true',help='Skip jobs whose ThermoData file is already present')
+    subparsers_run.add_argument('--dry-run',dest='dry_run',action='store_true',help='Only list the jobs that would be run')
+    subparsers_run.add_argument('--instrument',action='store_true',
+                                help='Store solver statistics and timings in the metadata of the ThermoData files')
+    subparsers_run.set_defaults(func=run_batch)
+
+
+def run_batch(args):
+    """
+    Run all jobs of a run specification. Returns 1 if any job failed, 0 otherwise.
+    """
+    spec = load_run_spec(args.spec)
+    if args.output_dir:
+        spec['output_dir'] = args.output_dir
+    if getattr(args,'instrument',False):
+        spec['instrument'] = True
+    output_dir = spec['output_dir']
+
+    jobs = get_jobs(spec)
+    pending = [job for job in jobs if not (args.resume and is_job_completed(job,output_dir))]
+    print(f'{len(jobs)} jobs in run specification, {len(jobs)-len(pending)} already completed, {len(pending)} to run')
+    if args.dry_run:
+        for job in pending:
+            print(job['name'])
+        return 0
+
+    os.makedirs(output_dir,exist_ok=True)
+    failed = []
+    for name, error in execute_jobs(spec,pending,workers=args.workers):
+        if error:
+            failed.append(name)
+            print(f'FAILED {name}:\n{error}')
+        else:
+            print(f'completed {name}')
+
+    if failed:
+        print(f'{len(failed)} jobs failed: {", ".join(failed)}. Run again with "--resume" to retry them.')
+        return 1
+    return 0
+
+
+def load_run_spec(path_or_dict):
+    """
+    Load run specification and set defaults.
+
+    The run specification is a json file with the following keys:
+
+    - "analysis" : path to DefectsAnalysis file (json, csv or pkl), relative paths refer to the spec file.
+    - "band_gap", "vbm" : band gap and VBM, needed if the analysis is not a json file.
+    - "bulk_dos" : path to Dos json file, or dict (e.g. {"m_eff_e":0.5,"m_eff_h":0.4}).
+    - "output_dir" : directory for the results, default is "thermodata".
+    - "temperatures" : list of temperatures, used for sweeps that do not set "temperature".
+    - "fixed_concentrations", "external_defects", "xtol", "eform_kwargs", "dconc_kwargs" :
+        defaults passed to `DefectThermodynamics`, can be overridden in each sweep.
+    - "instrument" : store solver statistics in ThermoData.metadata['solver_stats'].
+    - "engine" : solver engine, "reference" (default) or "fast", can be overridden in each sweep.
+    - "sweeps" : list of sweep definitions (dict).
+
+    Sweep definitions for "type" = "brouwer" take the arguments of `DefectsAnalysis.plot_brouwer_diagram`:
+    "temperature", "quench_temperature", "quenched_species", "quench_elements",
+    "reservoirs" (path to PressureReservoirs json or dict), "precursors", "oxygen_ref",
+    "pressure_range", "npoints".
+
+    Sweep definitions for "type" = "doping" take the arguments of `DefectsAnalysis.plot_doping_diagram`:
+    "variable_defect_specie", "concentration_range", "chemical_potentials", "temperature",
+    "quench_temperature", "quenched_species", "quench_elements", "npoints".
+
+    "temperature" and "quench_temperature" can be lists, in which case one job is created for
+    each combination.
+
+    Parameters
+    ----------
+    path_or_dict : str or dict
+        Path to json file or dict.
+
+    Returns
+    -------
+    spec : dict
+        Run specification.
+    """
+    if type(path_or_dict) == dict:
+        spec = path_or_dict.copy()
+        basedir = os.getcwd()
+    else:
+        with open(path_or_dict) as file:
+            spec = json.load(file)
+        basedir = op.dirname(op.abspath(path_or_dict))
+
+    for key in ('analysis','bulk_dos','sweeps'):
+        if key not in spec:
+            raise ValueError(f'"{key}" must be present in the run specification')
+
+    spec['analysis'] = op.join(basedir,spec['analysis'])
+    if type(spec['bulk_dos']) == str:
+        spec['bulk_dos'] = op.join(basedir,spec['bulk_dos'])
+    spec['output_dir'] = op.join(basedir,spec.get('output_dir','thermodata'))
+    spec['sweeps'] = [sweep.copy() for sweep in spec['sweeps']] # sweeps of the input are not modified
+    for sweep in spec['sweeps']:
+        if type(sweep.get('reservoirs')) == str:
+            sweep['reservoirs'] = op.join(basedir,sweep['reservoirs'])
+    return spec
+
+
+def get_jobs(spec):
+    """
+    Expand the sweeps of the run specification into single jobs, one for each combination
+    of temperature and quenching temperature.
+    """
+    jobs = []
+    for idx,sweep in enumerate(spec['sweeps']):
+        sweep = sweep.copy()
+        sweep_type = sweep.pop('type','brouwer')
+        if sweep_type not in ('brouwer','doping'):
+            raise ValueError(f'Sweep type "{sweep_type}" not recognized, available types are "brouwer" and "doping"')
+        name = sweep.pop('name',f'{sweep_type}_{idx}')
+
+        temperatures = sweep.pop('temperature',spec.get('temperatures'))
+        if temperatures is None:
+            raise ValueError(f'Temperature must be set in sweep "{name}" or in "temperatures"')
+        quench_temperatures = sweep.pop('quench_temperature',None)
+        temperatures = temperatures if type(temperatures) == list else [temperatures]
+        quench_temperatures = quench_temperatures if type(quench_temperatures) == list else [quench_temperatures]
+
+        for T, Tq in itertools.product(temperatures,quench_temperatures):
+            job_name = name
+            if len(temperatures) > 1:
+                job_name += f'_T{T}'
+            if len(quench_temperatures) > 1:
+                job_name += f'_Tq{Tq}'
+            job = {'name':job_name,'type':sweep_type,'temperature':T,'quench_temperature':Tq}
+            job.update(sweep)
+            jobs.append(job)
+
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError('Job names in run specification are not unique')
+    return jobs
+
+
+def get_job_path(job,output_dir):
+    """
+    Path of the ThermoData file of a job.
+    """
+    return op.join(output_dir,f'{job["name"]}.json')
+
+
+def is_job_completed(job,output_dir):
+    """
+    Check if the ThermoData file of a job is present.
+    """
+    return op.isfile(get_job_path(job,output_dir))
+
+
+def execute_jobs(spec,jobs,workers=1):
+    """
+    Execute jobs and write ThermoData files to spec['output_dir']. With more than one worker
+    the jobs are distributed on a process pool, each worker process loads DefectsAnalysis and DOS once.
+    Solver statistics ("instrument") are collected in the process running each job and stored in its
+    ThermoData, they are not aggregated over the batch.
+
+    Yields
+    ------
+    name : str
+        Job name.
+    error : str or None
+        Traceback if the job failed, None otherwise.
+    """
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(spec,)) as executor:
+            futures = {executor.submit(_run_job_in_worker,job,spec['output_dir']):job['name'] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception: # e.g. BrokenProcessPool if the initialization of the workers fails
+                    yield futures[future], traceback.format_exc()
+    else:
+        try:
+            _init_worker(spec)
+        except Exception:
+            error = traceback.format_exc()
+            for job in jobs:
+                yield job['name'], error
+            return
+        for job in jobs:
+            yield _run_job_in_worker(job,spec['output_dir'])
+
+
+_worker_state = {}
+
+def _init_worker(spec):
+    from ..analysis import DefectsAnalysis
+    from ..tools.utils import decode_object_from_json
+
+    _worker_state['da'] = DefectsAnalysis.from_file(spec['analysis'],band_gap=spec.get('band_gap'),vbm=spec.get('vbm',0))
+    bulk_dos = spec['bulk_dos']
+    _worker_state['bulk_dos'] = decode_object_from_json(bulk_dos) if type(bulk_dos) == str else bulk_dos
+    _worker_state['spec'] = spec
+
+
+def _run_job_in_worker(job,output_dir):
+    try:
+        thermodata = run_job(job,_worker_state['da'],_worker_state['bulk_dos'],_worker_state['spec'])
+        path = get_job_path(job,output_dir)
+        # write to temporary file first so that interrupted runs never leave incomplete results
+        tmp_path = path + '.tmp'
+        thermodata.to_json(tmp_path)
+        os.replace(tmp_path,path)
+        return job['name'], None
+    except Exception:
+        return job['name'], traceback.format_exc()
+
+
+def run_job(job,defects_analysis,bulk_dos,spec=None):
+    """
+    Run a single job with `DefectThermodynamics`.
+
+    Parameters
+    ----------
+    job : dict
+        Job definition (see `get_jobs`).
+    defects_analysis : DefectsAnalysis
+        DefectsAnalysis object.
+    bulk_dos : dict or Dos
+        Density of states.
+    spec : dict
+        Run specification, used for defaults of `DefectThermodynamics` arguments.
+        If None no defaults are used.
+
+    Returns
+    -------
+    thermodata : ThermoData
+        ThermoData object.
+    """
+    from ..instrumentation import collect_solver_stats
+
+    spec = spec or {}
+    def get(key,default=None):
+        return job.get(key,spec.get(key,default))
+
+    if not get('instrument',False):
+        return _run_job(job,defects_analysis,bulk_dos,get)
+    with collect_solver_stats() as stats:
+        t0 = time.perf_counter()
+        thermodata = _run_job(job,defects_analysis,bulk_dos,get)
+        stats.add_timing('total',time.perf_counter() - t0)
+    thermodata.metadata['solver_stats'] = stats.as_dict()
+    return thermodata
+
+
+def _run_job(job,defects_analysis,bulk_dos,get):
+    from ..chempots.reservoirs import PressureReservoirs
+    from ..thermodynamics import DefectThermodynamics
+
+    da = defects_analysis
+
+    dt = DefectThermodynamics(
+                            defects_analysis=da,
+                            bulk_dos=bulk_dos,
+                            fixed_concentrations=get('fixed_concentrations'),
+                            external_defects=get('external_defects',[]),
+                            xtol=get('xtol',1e-05),
+                            eform_kwargs=get('eform_kwargs',{}),
+                            dconc_kwargs=get('dconc_kwargs',{}),
+                            engine=get('engine'))
+
+    T, Tq = job['temperature'], job['quench_temperature']
+    npoints = job.get('npoints',50)
+    if job['type'] == 'brouwer':
+        reservoirs = job.get('reservoirs')
+        if type(reservoirs) == str:
+            reservoirs = PressureReservoirs.from_json(reservoirs)
+        elif type(reservoirs) == dict:
+            reservoirs = PressureReservoirs({float(p):mu for p,mu in reservoirs.items()},temperature=T)
+        else:
+            reservoirs = da._generate_pressure_reservoirs(
+                                                    temperature=T,
+                                                    precursors=job.get('precursors'),
+                                                    oxygen_ref=job.get('oxygen_ref'),
+                                                    pressure_range=job.get('pressure_range',(1e-20,1e10)),
+                                                    npoints=npoints)
+        if Tq:
+            thermodata = dt.get_pO2_quenched_thermodata(
+                                                    reservoirs=reservoirs,
+                                                    initial_temperature=T,
+                                                    final_temperature=Tq,
+                                                    quenched_species=job.get('quenched_species'),
+                                                    quench_elements=job.get('quench_elements',False),
+                                                    name=job['name'])
+        else:
+            thermodata = dt.get_pO2_thermodata(reservoirs=reservoirs,temperature=T,name=job['name'])
+
+    elif job['type'] == 'doping':
+        chemical_potentials = job['chemical_potentials']
+        if type(chemical_potentials) in (str,list):
+            chemical_potentials = da._generate_chemical_potentials(target=chemical_potentials)
+        kwargs = {
+            'variable_defect_specie':job['variable_defect_specie'],
+            'concentration_range':job.get('concentration_range',(1,1e20)),
+            'chemical_potentials':chemical_potentials,
+            'npoints':npoints,
+            'name':job['name']}
+        if Tq:
+            thermodata = dt.get_variable_species_quenched_thermodata(
+                                                    initial_temperature=T,
+                                                    final_temperature=Tq,
+                                                    quenched_species=job.get('quenched_species'),
+                                                    quench_elements=job.get('quench_elements',False),
+                                                    **kwargs)
+        else:
+            thermodata = dt.get_variable_species_thermodata(temperature=T,**kwargs)
+
+    return thermodata
@@ -2,7 +2,6 @@
 import warnings
 import os.path as op
 import importlib
-import matplotlib.pyplot as plt
 import math
 
 
@@ -73,6 +72,7 @@ def get_kumagai_correction(
                                             title=defect_structure.composition,
                                             efnv_correction=correction.metadata['efnv_corr']
                                             ).construct_plot()
+        import matplotlib.pyplot as plt
         ax = plt.gca()
         return corr, ax
     else:
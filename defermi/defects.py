@@ -13,7 +13,6 @@ import importlib
 
 from pymatgen.core.composition import Composition
 from pymatgen.core.sites import PeriodicSite
-from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
 from .tools.structure import is_site_in_structure, is_site_in_structure_coords
 
@@ -363,6 +362,7 @@ class Vacancy(Defect):
         **kwargs : dict
             Kwargs to pass to `SpacegroupAnalyzer` ("symprec", "angle_tolerance")
         """
+        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
         sga = SpacegroupAnalyzer(self.bulk_structure,**kwargs)
         symmetrized_structure = sga.get_symmetrized_structure()
         equivalent_sites = symmetrized_structure.find_equivalent_sites(self.site)
@@ -490,6 +490,7 @@ class Substitution(Defect):
         **kwargs : dict
             Kwargs to pass to `SpacegroupAnalyzer` ("symprec", "angle_tolerance")
         """
+        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
         sga = SpacegroupAnalyzer(self.bulk_structure,**kwargs)
         symmetrized_structure = sga.get_symmetrized_structure()
         equivalent_sites = symmetrized_structure.find_equivalent_sites(self.site_in_bulk)
@@ -679,6 +680,7 @@ class Polaron(Defect):
         **kwargs : dict
             Kwargs to pass to `SpacegroupAnalyzer` ("symprec", "angle_tolerance")
         """
+        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
         sga = SpacegroupAnalyzer(self.bulk_structure,**kwargs)
         symmetrized_structure = sga.get_symmetrized_structure()
         equivalent_sites = symmetrized_structure.find_equivalent_sites(self.site)
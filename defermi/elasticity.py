@@ -7,8 +7,6 @@ Created on Tue Nov 16 14:35:23 2021
 """
 
 import numpy as np
-import pandas as pd
-import matplotlib
 
 
 
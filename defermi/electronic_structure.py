@@ -9,6 +9,7 @@ from pymatgen.electronic_structure.dos import Dos, FermiDos, CompleteDos
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.core.units import kb
 
+from defermi.instrumentation import record_count
 from defermi.tools.utils import decode_object_from_json
 
 
@@ -59,6 +60,7 @@ def get_carrier_concentrations(dos, fermi_level, temperature, band_gap=None):
         n : float
             Absolute value of electron concentration in 1/cm^3.
     """   
+    record_count('dos_integrations')
     if type(dos) == dict:
         if 'energies' in dos and 'densities' in dos:
             E = dos['energies']
@@ -88,6 +90,21 @@ def get_carrier_concentrations(dos, fermi_level, temperature, band_gap=None):
     else:
         raise ValueError('DOS must a dictionary (read function docs) or pymatgen Dos object')
     
+    return get_carrier_concentrations_from_fermidos(fdos,fermi_level,temperature)
+
+
+def get_carrier_concentrations_from_fermidos(fdos, fermi_level, temperature):
+    """
+    Get carrier concentrations by integrating a `FermiDos` object.
+    The Fermi level is relative to the VBM of `fdos`.
+
+    Returns:
+    --------
+        h : float
+            Absolute value of hole concentration in 1/cm^3.
+        n : float
+            Absolute value of electron concentration in 1/cm^3.
+    """
     _,fdos_vbm = fdos.get_cbm_vbm()
     fermi_level = fdos_vbm + fermi_level
 
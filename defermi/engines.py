@@ -0,0 +1,430 @@
+
+import numpy as np
+
+from .instrumentation import record_count
+
+ENGINES = ('reference','fast')
+
+
+def check_engine(engine):
+    """
+    Check that `engine` is a valid solver engine and return it.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'Engine "{engine}" not recognized, available engines are {", ".join(ENGINES)}')
+    return engine
+
+
+class DefectsKernel:
+    """
+    Array representation of the defect entries of a DefectsAnalysis, used by the "fast" engine
+    to compute formation energies and concentrations of all entries at once.
+
+    Formation energies are split in a constant term (energy difference + corrections + q*VBM),
+    a charge term (q*fermi_level) and a chemical potential term (delta_atoms @ chempots).
+    Frozen defect corrections (see `DefectsAnalysis.defect_concentrations`) are computed from
+    the same species totals as the reference engine, stored as masks over the entries.
+    """
+    def __init__(self,defects_analysis):
+        """
+        Parameters
+        ----------
+        defects_analysis : DefectsAnalysis
+            DefectsAnalysis object. Entries with custom formation energy or defect
+            concentration functions are not supported (see `is_supported`).
+        """
+        da = defects_analysis
+        self.entries = da.entries
+        self.names = [e.name for e in da.entries]
+        self.elements = da.elements
+        self.charges = np.array([e.charge for e in da.entries],dtype=float)
+        self.energies = np.array([
+                        e.energy_diff + sum(e.corrections.values()) + e.charge*da.vbm
+                        for e in da.entries],dtype=float)
+        self.delta_atoms = np.array([
+                        [e.delta_atoms.get(el,0) for el in self.elements]
+                        for e in da.entries],dtype=float).reshape(len(da.entries),len(self.elements))
+        self.site_concentrations = np.array([e.defect.site_concentration_in_cm3 for e in da.entries],dtype=float)
+        self.multiplicities = np.array([e.multiplicity for e in da.entries],dtype=float)
+        self._frozen_terms = {}
+
+    @staticmethod
+    def is_supported(defects_analysis):
+        """
+        True if the "fast" engine can reproduce the reference calculation (no custom functions).
+        """
+        for e in defects_analysis.entries:
+            if e.formation_energy_function or e.defect_concentration_function:
+                return False
+        return True
+
+    def get_chempots_vector(self,chemical_potentials):
+        """
+        Chemical potentials as np.array ordered as `self.elements`. Arrays are returned unchanged,
+        so that rows of a chempot matrix (see `Reservoirs.get_array`) can be passed directly.
+        """
+        if isinstance(chemical_potentials,np.ndarray):
+            return chemical_potentials
+        if not chemical_potentials:
+            return None
+        return np.array([chemical_potentials[el] for el in self.elements],dtype=float)
+
+    def formation_energies(self,chemical_potentials,fermi_level=0.):
+        """
+        Formation energies of all entries (np.array).
+        """
+        eforms = self.energies + self.charges*fermi_level
+        mu = self.get_chempots_vector(chemical_potentials)
+        if mu is not None and len(self.elements):
+            eforms = eforms - self.delta_atoms @ mu
+        return eforms
+
+    def concentrations(self,chemical_potentials,temperature,fermi_level=0.,
+                       fixed_concentrations=None,per_unit_volume=True):
+        """
+        Concentrations of all entries (np.array), in cm^-3 or per unit cell.
+        """
+        from scipy.special import expit
+        from pymatgen.core.units import kb
+
+        n = self.site_concentrations if per_unit_volume else self.multiplicities
+        eforms = self.formation_energies(chemical_potentials,fermi_level)
+        concs = n * expit(-eforms/(kb*temperature))
+        if fixed_concentrations:
+            concs = concs * self.frozen_corrections(fixed_concentrations,concs)
+        return concs
+
+    def total_charge(self,chemical_potentials,temperature,fermi_level=0.,fixed_concentrations=None):
+        """
+        Total charge of defect entries in cm^-3.
+        """
+        concs = self.concentrations(chemical_potentials,temperature,fermi_level,fixed_concentrations)
+        return np.dot(self.charges,concs)
+
+    def frozen_corrections(self,fixed_concentrations,concentrations):
+        """
+        Correction factors for fixed concentrations, given the unconstrained concentrations.
+        """
+        lower_limit = 1e-250
+        keys, masks, counts = self._get_frozen_terms(tuple(fixed_concentrations.keys()))
+        if not keys:
+            return np.ones(len(concentrations))
+        totals = masks @ concentrations
+        totals = np.where(totals > lower_limit,totals,lower_limit) # prevent division by zero
+        ratios = np.array([fixed_concentrations[k] for k in keys],dtype=float) / totals
+        return np.prod(ratios[None,:]**counts,axis=1)
+
+    def _get_frozen_terms(self,frozen_keys):
+        """
+        Terms of the frozen correction for a set of fixed species, cached.
+
+        Returns
+        -------
+        keys : list
+            Fixed species of each term.
+        masks : np.array
+            (nterms, nentries) weights of the entries in the total of each term.
+        counts : np.array
+            (nentries, nterms) number of times each term enters the correction of each entry.
+        """
+        if frozen_keys in self._frozen_terms:
+            return self._frozen_terms[frozen_keys]
+
+        from .analysis import DefectConcentrations, SingleDefConc
+        from .defects import Defect
+
+        def get_element_mask(specie,vacancy):
+            return [DefectConcentrations([SingleDefConc(name=name,charge=0,conc=1)]).get_element_total(specie,vacancy=vacancy)
+                    for name in self.names]
+
+        terms = []
+        entry_terms = []
+        for e in self.entries:
+            eterms = []
+            for defect in Defect.from_string(e.name):
+                typ, specie, name = defect.type, defect.specie, defect.name
+                if typ == 'Vacancy':
+                    if name in frozen_keys:
+                        eterms.append((name,'vacancy',specie))
+                elif name in frozen_keys:
+                    eterms.append((name,'name',name))
+                elif specie in frozen_keys:
+                    eterms.append((specie,'element',specie))
+            for term in eterms:
+                if term not in terms:
+                    terms.append(term)
+            entry_terms.append(eterms)
+
+        masks = []
+        for key, kind, target in terms:
+            if kind == 'vacancy':
+                masks.append(get_element_mask(target,vacancy=True))
+            elif kind == 'element':
+                masks.append(get_element_mask(target,vacancy=False))
+            else:
+                masks.append([1 if target in name else 0 for name in self.names])
+        masks = np.array(masks,dtype=float).reshape(len(terms),len(self.names))
+        counts = np.array([[eterms.count(term) for term in terms] for eterms in entry_terms],
+                          dtype=float).reshape(len(self.names),len(terms))
+        self._frozen_terms[frozen_keys] = ([t[0] for t in terms], masks, counts)
+        return self._frozen_terms[frozen_keys]
+
+
+class CarriersKernel:
+    """
+    Carrier concentrations for a fixed DOS, used by the "fast" engine.
+    The `FermiDos` object is built only once (for explicit DOS dicts, once for every interval
+    of the energy grid the Fermi level falls in, as the VBM and CBM detection depends on it)
+    instead of at every evaluation.
+    """
+    def __init__(self,dos,band_gap=None):
+        """
+        Parameters
+        ----------
+        dos : dict or Dos
+            Density of states, same formats as `electronic_structure.get_carrier_concentrations`.
+        band_gap : float
+            Band gap in eV.
+        """
+        from pymatgen.electronic_structure.dos import Dos, FermiDos, CompleteDos
+
+        self.dos = dos
+        self.band_gap = band_gap
+        self._fermidos = {}
+        if type(dos) == dict:
+            if 'energies' in dos and 'densities' in dos:
+                self.mode = 'data'
+                self._energies = np.array(dos['energies'])
+            elif 'm_eff_e' in dos and 'm_eff_h' in dos:
+                if not band_gap:
+                    raise ValueError('Band gap must be provided when computing DOS with effective masses')
+                self.mode = 'effective_mass'
+            else:
+                raise ValueError('DOS must a dictionary (read function docs) or pymatgen Dos object')
+        elif type(dos) in (Dos,FermiDos,CompleteDos):
+            self.mode = 'dos'
+        else:
+            raise ValueError('DOS must a dictionary (read function docs) or pymatgen Dos object')
+
+    def __call__(self,fermi_level,temperature):
+        """
+        Hole and electron concentrations in cm^-3 (absolute values).
+        """
+        from scipy.constants import m_e
+        from .electronic_structure import get_dos_from_effective_mass, maxwell_boltzmann, f0
+
+        record_count('dos_integrations')
+        if self.mode == 'effective_mass':
+            h = get_dos_from_effective_mass(self.dos['m_eff_h']*m_e,T=temperature) * maxwell_boltzmann(E=fermi_level,T=temperature)
+            n = get_dos_from_effective_mass(self.dos['m_eff_e']*m_e,T=temperature) * maxwell_boltzmann(E=self.band_gap-fermi_level,T=temperature)
+            return abs(h), abs(n)
+
+        fdos = self._get_fermidos(fermi_level)
+        fermi_level = fdos['vbm'] + fermi_level
+        cb_integral = np.sum(fdos['cb_dos'] * f0(fdos['cb_energies'],fermi_level,temperature))
+        vb_integral = np.sum(fdos['vb_dos'] * f0(-fdos['vb_energies'],-fermi_level,temperature))
+        h = vb_integral / fdos['volume']
+        n = -1*cb_integral / fdos['volume']
+        return abs(h), abs(n)
+
+    def _get_fermidos(self,fermi_level):
+        from pymatgen.electronic_structure.dos import FermiDos
+        from .electronic_structure import _get_fermidos_from_data
+
+        if self.mode == 'data':
+            # band edges are searched below and above the Fermi level of the DOS
+            key = (int(np.sum(self._energies < fermi_level)),int(np.sum(self._energies > fermi_level)))
+        else:
+            key = None
+        if key not in self._fermidos:
+            if self.mode == 'data':
+                fdos = _get_fermidos_from_data(efermi=fermi_level,E=self.dos['energies'],D=self.dos['densities'],
+                                               structure=self.dos['structure'],bandgap=self.band_gap)
+            else:
+                fdos = FermiDos(dos=self.dos,bandgap=self.band_gap)
+            cbm,vbm = fdos.get_cbm_vbm()
+            cb = slice(max(fdos.idx_mid_gap, fdos.idx_vbm + 1),None)
+            vb = slice(None,min(fdos.idx_mid_gap, fdos.idx_cbm - 1) + 1)
+            self._fermidos[key] = {
+                'vbm':vbm,
+                'cb_dos':fdos.tdos[cb] * fdos.de[cb],
+                'cb_energies':fdos.energies[cb],
+                'vb_dos':fdos.tdos[vb] * fdos.de[vb],
+                'vb_energies':fdos.energies[vb],
+                'volume':fdos.volume * fdos.A_to_cm ** 3
+                }
+            if self.mode == 'data' and cbm == vbm: # no gap found, band edges set to the Fermi level
+                return self._fermidos.pop(key)
+        return self._fermidos[key]
+
+
+class BrouwerApproximation:
+    """
+    Brouwer approximation of the defect equilibrium as a function of the oxygen partial pressure.
+    Concentrations are taken in the Boltzmann limit, so that the logarithm of every concentration
+    is linear in log(pO2) and in the Fermi level, and charge neutrality is restricted to the 
+    dominant positive and negative species (defect entries, external defects or carriers). 
+    For each pair of species the Fermi level is a linear function of log(pO2) and the concentrations
+    are power laws of pO2. The dominant pair, and the boundaries between regimes, are found in 
+    closed form, therefore the diagram is obtained at negligible cost on any pressure range.
+    Useful as a preview of the regimes of a Brouwer diagram, or as starting guess for the 
+    charge neutrality solver (`fermi_level_guess` in `DefectsAnalysis.solve_fermi_level`).
+    Fixed concentrations and custom formation energy or concentration functions are not supported.
+    """
+    def __init__(self,defects_analysis,bulk_dos,temperature,reservoirs,external_defects=[]):
+        """
+        Parameters
+        ----------
+        defects_analysis : DefectsAnalysis
+            DefectsAnalysis object.
+        bulk_dos : dict or Dos
+            Density of states (see `DefectsAnalysis.solve_fermi_level`). Band edge effective densities
+            of states are computed from the carrier concentrations at midgap.
+        temperature : float
+            Temperature in K.
+        reservoirs : dict, Reservoirs or PressureReservoirs
+            Object with at least two partial pressures as keys and chempots dictionary as values. 
+            The chemical potentials are fitted as linear functions of log(pO2), which is exact for
+            reservoirs generated from precursors.
+        external_defects : list
+            List of external defect concentrations (not present in defect entries), dictionaries with
+            {'name': str, 'charge': float, 'conc': float} or SingleDefConc objects.
+        """
+        from pymatgen.core.units import kb
+        
+        da = defects_analysis
+        if not DefectsKernel.is_supported(da):
+            raise ValueError('Brouwer approximation is not supported for entries with custom functions')
+        if len(reservoirs) < 2:
+            raise ValueError('At least two partial pressures are needed in reservoirs')
+        kernel = DefectsKernel(da)
+        self.temperature = temperature
+        self.band_gap = da.band_gap
+        self.external_defects = external_defects
+        kT = kb*temperature
+        
+        # chemical potentials linear in log10(pO2)
+        log_pressures = np.log10(np.array(list(reservoirs.keys()),dtype=float))
+        chempots = np.array([kernel.get_chempots_vector(mu) for mu in reservoirs.values()],dtype=float)
+        chempots = chempots.reshape(len(log_pressures),len(kernel.elements))
+        chempots_slope, chempots_intercept = np.polyfit(log_pressures,chempots,1) if len(kernel.elements) else (np.zeros(0),np.zeros(0))
+
+        # effective densities of states of the band edges
+        midgap = da.band_gap / 2
+        h, n = CarriersKernel(bulk_dos,band_gap=da.band_gap)(midgap,temperature)
+        
+        # ln(c) = intercept + slope*log10(pO2) + fermi_coefficient*fermi_level
+        self.names = list(kernel.names) + [d['name'] for d in external_defects] + ['holes','electrons']
+        self.charges = np.concatenate((kernel.charges,[d['charge'] for d in external_defects],[1.,-1.]))
+        self.intercepts = np.concatenate((
+            np.log(kernel.site_concentrations) - (kernel.energies - kernel.delta_atoms @ chempots_intercept)/kT,
+            np.log([d['conc'] for d in external_defects]),
+            [np.log(h) + midgap/kT, np.log(n) - midgap/kT]))
+        self.slopes = np.concatenate((kernel.delta_atoms @ chempots_slope / kT, np.zeros(len(external_defects)+2)))
+        self.fermi_coefficients = np.concatenate((-kernel.charges/kT,np.zeros(len(external_defects)),[-1/kT,1/kT]))
+        self._nentries = len(kernel.names)
+
+        # Fermi level of each pair of positive and negative species (fermi_level = alpha + beta*log10(pO2))
+        self.positive = np.flatnonzero(self.charges > 0)
+        self.negative = np.flatnonzero(self.charges < 0)
+        p, m = np.meshgrid(self.positive,self.negative,indexing='ij')
+        log_charge_ratio = np.log(self.charges[p]/np.abs(self.charges[m]))
+        denominator = self.fermi_coefficients[m] - self.fermi_coefficients[p]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            self._alpha = (log_charge_ratio + self.intercepts[p] - self.intercepts[m]) / denominator
+            self._beta = (self.slopes[p] - self.slopes[m]) / denominator
+        # pairs with concentrations independent from the Fermi level never balance
+        self._constant_pairs = denominator == 0
+        self._constant_sign = np.sign(log_charge_ratio + self.intercepts[p] - self.intercepts[m])
+
+    def _get_pair_fermi_levels(self,log_pressures):
+        x = np.asarray(log_pressures,dtype=float)[:,None,None]
+        with np.errstate(invalid='ignore'):
+            fermi_levels = self._alpha[None] + self._beta[None]*x
+        return np.where(self._constant_pairs[None],self._constant_sign[None]*np.inf,fermi_levels)
+
+    def get_fermi_levels(self,partial_pressures):
+        """
+        Fermi levels in eV and indexes of the dominant positive and negative species (in `self.names`).
+        The root of max_p(q_p*c_p) = max_n(|q_n|*c_n) is max_p(min_n(fermi_level_pn)).
+        """
+        pair_fermi_levels = self._get_pair_fermi_levels(np.log10(partial_pressures))
+        min_negative = np.min(pair_fermi_levels,axis=2)
+        ip = np.argmax(min_negative,axis=1)
+        fermi_levels = min_negative[np.arange(len(ip)),ip]
+        im = np.argmin(pair_fermi_levels[np.arange(len(ip)),ip],axis=1)
+        return fermi_levels, self.positive[ip], self.negative[im]
+
+    def get_concentrations(self,partial_pressures,fermi_levels):
+        """
+        Concentrations of all species (`self.names`) in cm^-3, shape (number of pressures, number of species).
+        """
+        x = np.log10(partial_pressures)
+        log_concentrations = self.intercepts[None] + self.slopes[None]*x[:,None] + self.fermi_coefficients[None]*np.asarray(fermi_levels)[:,None]
+        return np.exp(log_concentrations)
+
+    def get_regimes(self,pressure_range=(1e-20,1e10),resolution=1000):
+        """
+        Regimes of the Brouwer diagram. Dominant species are identified on a grid with `resolution` 
+        points, the boundaries between regimes are the exact intersections of the Fermi level lines
+        of consecutive dominant pairs.
+
+        Returns
+        -------
+        regimes : list
+            List of dictionaries with "pressure_range", "positive" and "negative" (names of dominant
+            species), "fermi_level_slope" (dE_F/dlog10(pO2)) and "exponents" (dlog10(c)/dlog10(pO2)
+            of all species in `self.names`).
+        """
+        x = np.linspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=resolution)
+        _, positive, negative = self.get_fermi_levels(10**x)
+        changes = np.flatnonzero((positive[1:] != positive[:-1]) | (negative[1:] != negative[:-1]))
+        
+        def get_line(i):
+            ip, im = np.flatnonzero(self.positive == positive[i])[0], np.flatnonzero(self.negative == negative[i])[0]
+            return self._alpha[ip,im], self._beta[ip,im]
+
+        boundaries = [x[0]]
+        for i in changes:
+            (a1,b1), (a2,b2) = get_line(i), get_line(i+1)
+            xb = (a2 - a1)/(b1 - b2) if b1 != b2 else (x[i] + x[i+1])/2
+            boundaries.append(float(np.clip(xb,x[i],x[i+1])))
+        boundaries.append(x[-1])
+
+        regimes = []
+        for k,i in enumerate([0] + list(changes + 1)):
+            _, beta = get_line(i)
+            exponents = (self.slopes + self.fermi_coefficients*beta) / np.log(10)
+            regimes.append({
+                'pressure_range':(10**boundaries[k],10**boundaries[k+1]),
+                'positive':self.names[positive[i]],
+                'negative':self.names[negative[i]],
+                'fermi_level_slope':float(beta),
+                'exponents':list(exponents)})
+        return regimes
+
+    def get_thermodata(self,pressure_range=(1e-20,1e10),npoints=50,name=None):
+        """
+        ThermoData of the Brouwer approximation, same format of `DefectThermodynamics.get_pO2_thermodata`.
+        The regimes (see `get_regimes`) are stored in `ThermoData.metadata['regimes']`.
+        """
+        from .analysis import DefectConcentrations, SingleDefConc
+        from .thermodynamics import ThermoData
+
+        partial_pressures = np.logspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints)
+        fermi_levels, _, _ = self.get_fermi_levels(partial_pressures)
+        concentrations = self.get_concentrations(partial_pressures,fermi_levels)
+        nentries = self._nentries
+        defect_concentrations = []
+        for concs in concentrations:
+            dc = [SingleDefConc(name=self.names[i],charge=self.charges[i],conc=concs[i]) for i in range(nentries)]
+            dc += [SingleDefConc(name=d['name'],charge=d['charge'],conc=d['conc']) for d in self.external_defects]
+            defect_concentrations.append(DefectConcentrations(dc))
+        
+        thermodata = {}
+        thermodata['partial_pressures'] = list(partial_pressures)
+        thermodata['defect_concentrations'] = defect_concentrations
+        thermodata['carrier_concentrations'] = [(c[-2],c[-1]) for c in concentrations]
+        thermodata['fermi_levels'] = list(fermi_levels)
+        metadata = {'regimes':self.get_regimes(pressure_range)}
+        return ThermoData(thermodata,temperature=self.temperature,name=name,metadata=metadata)
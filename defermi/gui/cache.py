@@ -0,0 +1,314 @@
+
+import hashlib
+import json
+import threading
+import warnings
+from collections import OrderedDict
+
+from monty.json import MontyDecoder, MontyEncoder, MSONable
+
+
+def get_fingerprint(*args,**kwargs):
+    """
+    Content hash (sha256 hex digest) of the arguments. MSONable objects (e.g. DefectsAnalysis,
+    Dos) and numpy arrays are serialized with `MontyEncoder`, so that equal inputs give the same
+    fingerprint regardless of object identity. Custom functions of defect entries, which are not
+    serialized, are identified by name, object and bytecode. Objects that cannot be serialized 
+    raise a TypeError.
+    """
+    with warnings.catch_warnings(): # warnings of as_dict methods are not relevant for hashing
+        warnings.simplefilter('ignore')
+        data = json.dumps({'args':args,'kwargs':kwargs},cls=_FingerprintEncoder,sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class _FingerprintEncoder(MontyEncoder):
+
+    def default(self,o):
+        if callable(o) and not isinstance(o,type) and not hasattr(o,'as_dict'):
+            return _get_function_marker(o)
+        d = super().default(o) # TypeError for objects that cannot be serialized
+        entries = [o] if hasattr(o,'formation_energy_function') else getattr(o,'entries',None)
+        if isinstance(d,dict) and isinstance(entries,list):
+            markers = []
+            for i,entry in enumerate(entries):
+                for attr in ('formation_energy_function','defect_concentration_function'):
+                    function = getattr(entry,attr,None)
+                    if function:
+                        markers.append([i,attr,_get_function_marker(function)])
+            if markers:
+                d['@custom_functions'] = markers
+        return d
+
+
+_fingerprint_memo = OrderedDict()
+_fingerprint_memo_lock = threading.Lock()
+
+def get_input_fingerprint(obj,maxsize=8):
+    """
+    Fingerprint of DefectsAnalysis and Dos objects, computed once per object and reused while
+    its state is unchanged, so that Streamlit reruns do not serialize the whole analysis again. 
+    For DefectsAnalysis the state is checked on band gap, VBM, engine and on identity, name, 
+    charge, energy, multiplicity, corrections and custom functions of the entries. Other inputs 
+    are returned unchanged.
+    """
+    signature = _get_state_signature(obj)
+    if signature is None:
+        return obj
+    with _fingerprint_memo_lock:
+        item = _fingerprint_memo.get(id(obj))
+        if item is not None and item[0] is obj and item[1] == signature:
+            _fingerprint_memo.move_to_end(id(obj))
+            return item[2]
+    fingerprint = {'@fingerprint':get_fingerprint(obj)}
+    with _fingerprint_memo_lock:
+        _fingerprint_memo[id(obj)] = (obj,signature,fingerprint) # reference to obj keeps its id unique
+        while len(_fingerprint_memo) > maxsize:
+            _fingerprint_memo.popitem(last=False)
+    return fingerprint
+
+
+def _get_state_signature(obj):
+    """
+    Cheap signature of the mutable state of DefectsAnalysis (tuple) and Dos (empty tuple) objects,
+    None for other objects.
+    """
+    from pymatgen.electronic_structure.dos import Dos
+    from defermi.analysis import DefectsAnalysis
+    if isinstance(obj,DefectsAnalysis):
+        entries = tuple(
+            (id(e),e.name,e.charge,e.energy_diff,e.multiplicity,tuple(sorted(e.corrections.items())),
+             id(e.formation_energy_function),id(e.defect_concentration_function))
+            for e in obj.entries)
+        return (obj.band_gap,obj.vbm,obj.engine,entries)
+    if isinstance(obj,Dos):
+        return ()
+    return None
+
+
+def _get_function_marker(function):
+    """
+    Marker of a function that is not serialized: name, object identity and hash of the bytecode.
+    """
+    code = getattr(function,'__code__',None)
+    return {
+        '@function':f'{getattr(function,"__module__",None)}.{getattr(function,"__qualname__",type(function).__name__)}',
+        'id':id(function),
+        'code':hashlib.sha256(code.co_code).hexdigest() if code else None}
+
+
+class ComputationCache(MSONable):
+
+    def __init__(self,maxsize=16):
+        """
+        In-memory cache of GUI computations keyed on the content hash of their inputs,
+        with least recently used eviction.
+
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of stored results.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __contains__(self,key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self,key,default=None):
+        """
+        Get result and mark it as most recently used. If not present `default` is returned.
+        """
+        if key not in self._results:
+            return default
+        self._results.move_to_end(key)
+        return self._results[key]
+
+    def set(self,key,value):
+        """
+        Store result and evict least recently used results above `maxsize`.
+        """
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+    def as_dict(self):
+        """
+        Json-serializable dict representation of ComputationCache, results are stored from
+        the least to the most recently used.
+        """
+        return {
+            "@module": self.__class__.__module__,
+            "@class": self.__class__.__name__,
+            "maxsize": self.maxsize,
+            "results": [[key,value] for key,value in self._results.items()]
+            }
+
+    @classmethod
+    def from_dict(cls,d):
+        """
+        Reconstitute a ComputationCache object from a dict representation created using
+        as_dict().
+        """
+        cache = cls(maxsize=d['maxsize'])
+        decoder = MontyDecoder()
+        for key, value in d['results']:
+            cache.set(key,decoder.process_decoded(value))
+        return cache
+
+    @staticmethod
+    def get_key(function,*args,**kwargs):
+        """
+        Cache key of `function(*args,**kwargs)`, fingerprint of function name and inputs.
+        Fingerprints of DefectsAnalysis and Dos inputs are memoized (see `get_input_fingerprint`).
+        """
+        args = [get_input_fingerprint(arg) for arg in args]
+        kwargs = {k:get_input_fingerprint(v) for k,v in kwargs.items()}
+        return get_fingerprint(function.__name__,*args,**kwargs)
+
+    def get_or_compute(self,function,*args,**kwargs):
+        """
+        Return the cached result of `function(*args,**kwargs)`, computing it only if the
+        inputs (and function name) have not been seen before.
+        """
+        key = self.get_key(function,*args,**kwargs)
+        if key in self._results:
+            self.hits += 1
+            return self.get(key)
+        self.misses += 1
+        result = function(*args,**kwargs)
+        self.set(key,result)
+        return result
+
+
+def get_computation_cache(maxsize=16):
+    """
+    Get the `ComputationCache` of the Streamlit session, created if not present.
+    """
+    import streamlit as st
+    if 'computation_cache' not in st.session_state:
+        st.session_state['computation_cache'] = ComputationCache(maxsize=maxsize)
+    return st.session_state['computation_cache']
+
+
+def compute_brouwer_thermodata(defects_analysis,
+                               bulk_dos,
+                               temperature,
+                               precursors,
+                               oxygen_ref=None,
+                               quench_temperature=None,
+                               quenched_species=None,
+                               quench_elements=False,
+                               external_defects=[],
+                               pressure_range=(1e-20,1e10),
+                               npoints=50,
+                               xtol=1e-20,
+                               cache=None):
+    """
+    Compute ThermoData of the Brouwer diagram, reusing the result if the inputs are unchanged.
+    Arguments are the same of `DefectsAnalysis.plot_brouwer_diagram`. If `cache` is None the
+    cache of the Streamlit session is used.
+    """
+    cache = cache if cache is not None else get_computation_cache()
+    job = get_brouwer_job(temperature,precursors,oxygen_ref,quench_temperature,quenched_species,
+                          quench_elements,external_defects,pressure_range,npoints,xtol)
+    return cache.get_or_compute(run_gui_job,job,defects_analysis,bulk_dos)
+
+
+def compute_doping_thermodata(defects_analysis,
+                              variable_defect_specie,
+                              concentration_range,
+                              chemical_potentials,
+                              bulk_dos,
+                              temperature,
+                              quench_temperature=None,
+                              quenched_species=None,
+                              quench_elements=False,
+                              external_defects=[],
+                              npoints=50,
+                              xtol=1e-20,
+                              cache=None):
+    """
+    Compute ThermoData of the doping diagram, reusing the result if the inputs are unchanged.
+    Arguments are the same of `DefectsAnalysis.plot_doping_diagram`. If `cache` is None the
+    cache of the Streamlit session is used.
+    """
+    cache = cache if cache is not None else get_computation_cache()
+    job = get_doping_job(variable_defect_specie,concentration_range,chemical_potentials,temperature,
+                         quench_temperature,quenched_species,quench_elements,external_defects,npoints,xtol)
+    return cache.get_or_compute(run_gui_job,job,defects_analysis,bulk_dos)
+
+
+def get_brouwer_job(temperature,
+                    precursors,
+                    oxygen_ref=None,
+                    quench_temperature=None,
+                    quenched_species=None,
+                    quench_elements=False,
+                    external_defects=[],
+                    pressure_range=(1e-20,1e10),
+                    npoints=50,
+                    xtol=1e-20):
+    """
+    Job definition of the Brouwer diagram (see `defermi.cli.run.get_jobs`). The default
+    `xtol` is the one of `DefectsAnalysis.plot_brouwer_diagram`.
+    """
+    return {
+        'name':'BrouwerDiagram',
+        'type':'brouwer',
+        'temperature':temperature,
+        'quench_temperature':quench_temperature,
+        'quenched_species':quenched_species,
+        'quench_elements':quench_elements,
+        'precursors':precursors,
+        'oxygen_ref':oxygen_ref,
+        'external_defects':external_defects,
+        'pressure_range':pressure_range,
+        'npoints':npoints,
+        'xtol':xtol}
+
+
+def get_doping_job(variable_defect_specie,
+                   concentration_range,
+                   chemical_potentials,
+                   temperature,
+                   quench_temperature=None,
+                   quenched_species=None,
+                   quench_elements=False,
+                   external_defects=[],
+                   npoints=50,
+                   xtol=1e-20):
+    """
+    Job definition of the doping diagram (see `defermi.cli.run.get_jobs`). The default
+    `xtol` is the one of `DefectsAnalysis.plot_doping_diagram`.
+    """
+    return {
+        'name':'DopingDiagram',
+        'type':'doping',
+        'variable_defect_specie':variable_defect_specie,
+        'concentration_range':concentration_range,
+        'chemical_potentials':chemical_potentials,
+        'temperature':temperature,
+        'quench_temperature':quench_temperature,
+        'quenched_species':quenched_species,
+        'quench_elements':quench_elements,
+        'external_defects':external_defects,
+        'npoints':npoints,
+        'xtol':xtol}
+
+
+def run_gui_job(job,defects_analysis,bulk_dos):
+    """
+    Run job with `defermi.cli.run.run_job`, returns ThermoData.
+    """
+    from defermi.cli.run import run_job
+    return run_job(job,defects_analysis,bulk_dos)
@@ -0,0 +1,261 @@
+
+import copy
+import threading
+import traceback
+
+import numpy as np
+
+from defermi.gui.cache import ComputationCache, run_gui_job
+
+
+class ExploreSurface:
+
+    def __init__(self,job,defects_analysis,bulk_dos,temperatures,oxygen_refs=None,key=None):
+        """
+        Coarse grid of sweeps (job definition as in `defermi.gui.cache.get_brouwer_job` and
+        `get_doping_job`) over temperature and, for Brouwer diagrams, oxygen reference chemical
+        potential. Once computed, sweeps at any temperature and oxygen reference inside the grid
+        are approximated by linear interpolation of log-concentrations and Fermi levels, which
+        is fast enough to follow slider moves. The variable of the sweep (partial pressure or
+        dopant concentration) is the same on all nodes of the grid.
+
+        Parameters
+        ----------
+        job : dict
+            Job definition, "temperature" and "oxygen_ref" are replaced by the grid values.
+        defects_analysis : DefectsAnalysis
+            DefectsAnalysis object.
+        bulk_dos : dict or Dos
+            Density of states.
+        temperatures : list
+            Temperatures of the grid in K.
+        oxygen_refs : list
+            Oxygen reference chemical potentials of the grid in eV, only used for Brouwer diagrams.
+        key : str
+            Cache key of the grid, computed if None.
+        """
+        self.job, self.temperatures, self.oxygen_refs = self._get_grid(job,temperatures,oxygen_refs)
+        self.defects_analysis = copy.deepcopy(defects_analysis) # isolated from changes in the GUI thread
+        self.bulk_dos = bulk_dos
+        self.key = key or self.get_key(job,defects_analysis,bulk_dos,temperatures,oxygen_refs)
+        self.error = None
+        self.future = None
+        self.arrays = None
+        self._ncomputed = 0
+        self._cancel_event = threading.Event()
+
+    @staticmethod
+    def _get_grid(job,temperatures,oxygen_refs=None):
+        grid_job = {k:v for k,v in job.items() if k not in ('temperature','oxygen_ref')}
+        temperatures = np.array(sorted(temperatures),dtype=float)
+        if job['type'] == 'brouwer':
+            oxygen_refs = oxygen_refs if oxygen_refs is not None else [job.get('oxygen_ref')]
+            oxygen_refs = np.array(sorted(oxygen_refs),dtype=float)
+        else:
+            oxygen_refs = np.array([np.nan])
+        return grid_job, temperatures, oxygen_refs
+
+    @staticmethod
+    def get_key(job,defects_analysis,bulk_dos,temperatures,oxygen_refs=None):
+        """
+        Cache key of the `ExploreSurface` with these inputs, without building it.
+        """
+        grid_job, temperatures, oxygen_refs = ExploreSurface._get_grid(job,temperatures,oxygen_refs)
+        return ComputationCache.get_key(ExploreSurface,grid_job,defects_analysis,bulk_dos,temperatures,oxygen_refs)
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        """
+        True if the grid is computed or the calculation failed.
+        """
+        return self.arrays is not None or self.error is not None
+
+    @property
+    def progress(self):
+        """
+        Fraction of computed grid nodes.
+        """
+        return self._ncomputed / (len(self.temperatures)*len(self.oxygen_refs))
+
+    @property
+    def result(self):
+        """
+        Arrays of the computed grid (None if not completed).
+        """
+        return self.arrays
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future:
+            self.future.cancel()
+
+    def set_result(self,arrays):
+        """
+        Set arrays of a computed grid (e.g. from `ComputationCache`).
+        """
+        self.arrays = arrays
+        self._ncomputed = len(self.temperatures)*len(self.oxygen_refs)
+
+    def run(self):
+        """
+        Compute the sweeps on all nodes of the grid, executed in a worker thread by `JobRunner`.
+        """
+        try:
+            nodes = {}
+            for i,T in enumerate(self.temperatures):
+                for j,oxygen_ref in enumerate(self.oxygen_refs):
+                    if self.cancelled:
+                        return
+                    job = dict(self.job,temperature=float(T))
+                    if self.job['type'] == 'brouwer':
+                        job['oxygen_ref'] = float(oxygen_ref)
+                    nodes[(i,j)] = run_gui_job(job,self.defects_analysis,self.bulk_dos)
+                    self._ncomputed += 1
+            self.arrays = self._get_arrays(nodes)
+        except Exception:
+            self.error = traceback.format_exc()
+
+    def _get_arrays(self,nodes):
+        sample = nodes[(0,0)]
+        labels = [(c.name,c.charge) for c in sample['defect_concentrations'][0]]
+        shape = (len(self.temperatures),len(self.oxygen_refs),len(sample['fermi_levels']))
+        log_concentrations = np.zeros(shape + (len(labels),))
+        log_carriers = np.zeros(shape + (2,))
+        fermi_levels = np.zeros(shape)
+        for (i,j),thermodata in nodes.items():
+            concs = [[c.conc for c in dc] for dc in thermodata['defect_concentrations']]
+            log_concentrations[i,j] = np.log10(np.maximum(np.array(concs,dtype=float),1e-300))
+            log_carriers[i,j] = np.log10(np.maximum(np.array(thermodata['carrier_concentrations'],dtype=float),1e-300))
+            fermi_levels[i,j] = thermodata['fermi_levels']
+        xkey = 'partial_pressures' if 'partial_pressures' in sample.keys() else 'variable_concentrations'
+        arrays = {
+            'xkey':xkey,
+            'x':np.array(sample[xkey],dtype=float),
+            'labels':labels,
+            'log_concentrations':log_concentrations,
+            'log_carriers':log_carriers,
+            'fermi_levels':fermi_levels}
+        if xkey == 'variable_concentrations':
+            arrays['variable_defect_specie'] = sample['variable_defect_specie']
+        return arrays
+
+    def contains(self,temperature,oxygen_ref=None):
+        """
+        True if temperature and oxygen reference are inside the grid.
+        """
+        inside = self.temperatures[0] <= temperature <= self.temperatures[-1]
+        if self.job['type'] == 'brouwer':
+            inside = inside and self.oxygen_refs[0] <= oxygen_ref <= self.oxygen_refs[-1]
+        return bool(inside)
+
+    def interpolate(self,temperature,oxygen_ref=None):
+        """
+        Approximate ThermoData at given temperature and oxygen reference by linear interpolation
+        on the grid. The ThermoData metadata contains {"interpolated":True}.
+        """
+        from defermi.analysis import DefectConcentrations, SingleDefConc
+        from defermi.thermodynamics import ThermoData
+
+        if not self.done or self.error:
+            raise ValueError('Grid is not computed')
+        if not self.contains(temperature,oxygen_ref):
+            raise ValueError(f'Temperature {temperature} and oxygen reference {oxygen_ref} are outside of the grid')
+        arrays = self.arrays
+        weights = _get_weights(self.temperatures,temperature)
+        if self.job['type'] == 'brouwer':
+            weights = [(i,j,wi*wj) for i,wi in weights for j,wj in _get_weights(self.oxygen_refs,oxygen_ref)]
+        else:
+            weights = [(i,0,wi) for i,wi in weights]
+
+        def interpolate_array(array):
+            return sum(w*array[i,j] for i,j,w in weights)
+
+        concentrations = 10**interpolate_array(arrays['log_concentrations'])
+        carriers = 10**interpolate_array(arrays['log_carriers'])
+        fermi_levels = interpolate_array(arrays['fermi_levels'])
+
+        data = {}
+        if arrays['xkey'] == 'partial_pressures':
+            data['partial_pressures'] = list(arrays['x'])
+        else:
+            data['variable_defect_specie'] = arrays['variable_defect_specie']
+            data['variable_concentrations'] = arrays['x'].copy()
+        data['defect_concentrations'] = [
+            DefectConcentrations([SingleDefConc(name=name,charge=charge,conc=c) for (name,charge),c in zip(arrays['labels'],concs)])
+            for concs in concentrations]
+        data['carrier_concentrations'] = [tuple(c) for c in carriers]
+        data['fermi_levels'] = list(fermi_levels)
+        quench_temperature = self.job.get('quench_temperature')
+        T = (temperature,quench_temperature) if quench_temperature else temperature
+        return ThermoData(data,temperature=T,name=self.job.get('name'),metadata={'interpolated':True})
+
+
+def _get_weights(grid,value):
+    """
+    Indexes and weights of the grid points for linear interpolation.
+    """
+    if len(grid) == 1:
+        return [(0,1.)]
+    i = int(np.clip(np.searchsorted(grid,value,side='right') - 1,0,len(grid)-2))
+    t = (value - grid[i]) / (grid[i+1] - grid[i])
+    return [(i,1-t),(i+1,t)]
+
+
+def get_explore_surface(slot,job,defects_analysis,bulk_dos,temperatures,oxygen_refs=None,runner=None,cache=None):
+    """
+    Submit the computation of an `ExploreSurface` to a `JobRunner` (the one of the Streamlit
+    session if None) and return it. The grid is recomputed only if the inputs change.
+    """
+    from defermi.gui.jobs import get_job_runner
+    runner = runner or get_job_runner()
+    key = ExploreSurface.get_key(job,defects_analysis,bulk_dos,temperatures,oxygen_refs)
+    current = runner.get_current(slot,key,cache=cache)
+    if current:
+        return current
+    surface = ExploreSurface(job,defects_analysis,bulk_dos,temperatures,oxygen_refs,key=key)
+    return runner.submit_task(slot,surface,cache=cache)
+
+
+def explore_thermodata(slot,job,defects_analysis,bulk_dos,temperatures,oxygen_refs=None):
+    """
+    Streamlit elements of the explore mode. The grid of the `ExploreSurface` is computed in the
+    background and the ThermoData at the current temperature and oxygen reference is interpolated
+    on it. The exact sweep is computed only when requested with the "Exact solve" button (or
+    while the grid is not available), and is shown instead of the interpolation once computed.
+    Returns ThermoData (None if not available).
+    """
+    import streamlit as st
+    from defermi.gui.cache import get_computation_cache
+    from defermi.gui.jobs import get_job_runner, show_sweep_status
+
+    runner = get_job_runner()
+    cache = get_computation_cache()
+    exact_key = ComputationCache.get_key(run_gui_job,job,defects_analysis,bulk_dos)
+    if exact_key in cache:
+        return cache.get(exact_key)
+    current = runner.jobs.get(slot)
+    exact_requested = current is not None and current.key == exact_key and not current.cancelled
+    
+    surface = get_explore_surface(f'{slot}_explore',job,defects_analysis,bulk_dos,temperatures,oxygen_refs,
+                                  runner=runner,cache=cache)
+    if surface.error:
+        st.error(f'Explore grid calculation failed:\n{surface.error}')
+    elif not surface.done:
+        st.progress(surface.progress,text=f'Computing explore grid... {int(100*surface.progress)}%')
+    elif not surface.contains(job['temperature'],job.get('oxygen_ref')):
+        st.info('Parameters outside of the explore grid, solving exactly')
+    
+    interpolation_available = surface.done and not surface.error and surface.contains(job['temperature'],job.get('oxygen_ref'))
+    if not interpolation_available:
+        exact_requested = True
+    elif not exact_requested:
+        exact_requested = st.button('Exact solve',key=f'widget_exact_solve_{slot}')
+    
+    if exact_requested:
+        return show_sweep_status(runner.submit(slot,job,defects_analysis,bulk_dos,cache=cache,key=exact_key))
+    st.caption('Interpolated preview')
+    return surface.interpolate(job['temperature'],job.get('oxygen_ref'))
@@ -2,14 +2,12 @@
 import tempfile
 import os
 import time
-import json
 
 import matplotlib
 import streamlit as st
 
-from monty.json import jsanitize, MontyEncoder, MontyDecoder
-
 from defermi import DefectsAnalysis 
+from defermi.gui.session import get_session_data, encode_session, decode_session
 from defermi.gui.utils import init_state_variable, widget_with_updating_state, dynamic_input_data_editor
 
 
@@ -155,32 +153,22 @@ def filter_entries():
             
 
 
-def _delete_dict_key(d,key):
-    if key in d:
-        del d[key]
-    return
-
-
-def save_session(filename):
-    """Save Streamlit session state to a JSON file."""
+def save_session(filename,include_cache=True):
+    """
+    Save Streamlit session state to a .defermi file in compressed binary format 
+    (see `defermi.gui.session.encode_session`). If `include_cache` is True the computed 
+    diagrams are stored as well and are not recomputed when the session is reopened.
+    """
     try:
-        data = {k:v for k,v in st.session_state.items() if 'widget' not in k}
-        _delete_dict_key(data,'session_loaded')
-        _delete_dict_key(data,'session_name')
-        _delete_dict_key(data,'precursors')
-        _delete_dict_key(data,'external_defects')
-
-        d = MontyEncoder().encode(data)
-
-        # convert to pretty JSON string
-        json_str = json.dumps(d, indent=2)
+        data = get_session_data(st.session_state,include_cache=include_cache)
+        content = encode_session(data)
 
         # create a downloadable button
         st.download_button(
             label="💾 Save Session",
-            data=json_str,
+            data=content,
             file_name=filename,
-            mime="application/json"
+            mime="application/octet-stream"
         )
 
     except Exception as e:
@@ -189,12 +177,11 @@ def save_session(filename):
 
 
 def load_session(file_path):
-    """Load Streamlit session state from JSON file."""
+    """Load Streamlit session state from a .defermi file (binary or JSON format)."""
     try:
         if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                d = json.load(f)
-            d = MontyDecoder().decode(d)
+            with open(file_path, "rb") as f:
+                d = decode_session(f.read())
             st.session_state.update(d)
         else:
             st.warning(f"File not found: {file_path}")
@@ -0,0 +1,281 @@
+
+import copy
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from defermi.gui.cache import ComputationCache, run_gui_job
+
+
+class SweepJob:
+
+    def __init__(self,job,defects_analysis,bulk_dos,chunk_size=5,key=None):
+        """
+        Brouwer or doping sweep (job definition as in `defermi.gui.cache.get_brouwer_job` and
+        `get_doping_job`) computed in chunks of points, so that partial results can be displayed
+        while the sweep is running. The first chunks span the whole range with a coarse spacing,
+        the following ones fill in the points in between.
+
+        Parameters
+        ----------
+        job : dict
+            Job definition.
+        defects_analysis : DefectsAnalysis
+            DefectsAnalysis object.
+        bulk_dos : dict or Dos
+            Density of states.
+        chunk_size : int
+            Number of points computed before partial results are updated.
+        key : str
+            Cache key of the sweep, computed if None.
+        """
+        self.job = job
+        self.defects_analysis = copy.deepcopy(defects_analysis) # isolated from changes in the GUI thread
+        self.bulk_dos = bulk_dos
+        self.chunk_size = chunk_size
+        self.key = key or ComputationCache.get_key(run_gui_job,job,defects_analysis,bulk_dos)
+        self.error = None
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._results = {}
+        self._npoints = job.get('npoints',50)
+        self._thermodata = None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def done(self):
+        """
+        True if the sweep is completed or failed.
+        """
+        return self._thermodata is not None or self.error is not None
+
+    @property
+    def progress(self):
+        """
+        Fraction of computed points.
+        """
+        with self._lock:
+            return len(self._results) / self._npoints
+
+    @property
+    def result(self):
+        """
+        ThermoData of the completed sweep (None if not completed).
+        """
+        return self._thermodata
+
+    @property
+    def thermodata(self):
+        """
+        ThermoData with the points computed so far (None if no point is available).
+        """
+        if self._thermodata is not None:
+            return self._thermodata
+        with self._lock:
+            results = dict(self._results)
+        return self._merge_results(results) if results else None
+
+    def cancel(self):
+        """
+        Stop the sweep after the chunk that is currently computed.
+        """
+        self._cancel_event.set()
+        if self.future:
+            self.future.cancel()
+
+    def set_result(self,thermodata):
+        """
+        Set result of a completed sweep (e.g. from `ComputationCache`).
+        """
+        self._npoints = max(len(thermodata['fermi_levels']),1)
+        self._thermodata = thermodata
+
+    def run(self):
+        """
+        Compute the sweep, executed in a worker thread by `JobRunner`.
+        """
+        try:
+            for index, subjob in self._get_subjobs():
+                if self.cancelled:
+                    return
+                thermodata = run_gui_job(subjob,self.defects_analysis,self.bulk_dos)
+                xkey = 'partial_pressures' if 'partial_pressures' in thermodata.keys() else 'variable_concentrations'
+                with self._lock:
+                    for j,idx in enumerate(index):
+                        self._results[idx] = {
+                            'x':thermodata[xkey][j],
+                            'defect_concentrations':thermodata['defect_concentrations'][j],
+                            'carrier_concentrations':thermodata['carrier_concentrations'][j],
+                            'fermi_levels':thermodata['fermi_levels'][j],
+                            'thermodata':thermodata}
+            self._thermodata = self._merge_results(self._results)
+        except Exception:
+            self.error = traceback.format_exc()
+
+    def _get_subjobs(self):
+        """
+        Yields indexes of the points and job definition of each chunk.
+        """
+        job = self.job
+        if job['type'] == 'brouwer':
+            reservoirs = job.get('reservoirs')
+            if reservoirs is None:
+                reservoirs = self.defects_analysis._generate_pressure_reservoirs(
+                                                        temperature=job['temperature'],
+                                                        precursors=job.get('precursors'),
+                                                        oxygen_ref=job.get('oxygen_ref'),
+                                                        pressure_range=job.get('pressure_range',(1e-20,1e10)),
+                                                        npoints=self._npoints)
+            pressures = list(reservoirs.keys())
+            self._npoints = len(pressures)
+            for index in get_coarse_to_fine_chunks(len(pressures),self.chunk_size):
+                subjob = dict(job,reservoirs={pressures[i]:reservoirs[pressures[i]] for i in index})
+                yield index, subjob
+        else:
+            concentration_range = job.get('concentration_range',(1,1e20))
+            concentrations = np.logspace(np.log10(concentration_range[0]),np.log10(concentration_range[1]),num=self._npoints)
+            for index in get_coarse_to_fine_chunks(self._npoints,self.chunk_size):
+                for i in index:
+                    subjob = dict(job,concentration_range=(concentrations[i],concentrations[i]),npoints=1)
+                    yield [i], subjob
+
+    def _merge_results(self,results):
+        indexes = sorted(results)
+        sample = results[indexes[0]]['thermodata']
+        if 'partial_pressures' in sample.keys():
+            data = {'partial_pressures':[results[i]['x'] for i in indexes]}
+        else:
+            data = {
+                'variable_defect_specie':sample['variable_defect_specie'],
+                'variable_concentrations':np.array([results[i]['x'] for i in indexes])}
+        for k in ('defect_concentrations','carrier_concentrations','fermi_levels'):
+            data[k] = [results[i][k] for i in indexes]
+        return type(sample)(data,temperature=sample.temperature,name=self.job.get('name'))
+
+
+def get_coarse_to_fine_chunks(npoints,chunk_size):
+    """
+    Split indexes of `npoints` points in chunks of `chunk_size` such that the first chunk spans
+    the whole range and the following ones progressively fill in the gaps.
+    """
+    stride = max(int(np.ceil(npoints/chunk_size)),1)
+    order = [i for offset in range(stride) for i in range(offset,npoints,stride)]
+    return [order[i:i+chunk_size] for i in range(0,npoints,chunk_size)]
+
+
+class JobRunner:
+
+    def __init__(self,max_workers=2):
+        """
+        Run sweeps in background threads. Every sweep is assigned to a slot (e.g. "brouwer",
+        "doping"): submitting a sweep with different inputs to an occupied slot cancels the
+        superseded one.
+
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of sweeps computed at the same time.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = {}
+
+    @property
+    def is_running(self):
+        """
+        True if any sweep is still running.
+        """
+        return any(not job.done and not job.cancelled for job in self.jobs.values())
+
+    def submit(self,slot,job,defects_analysis,bulk_dos,cache=None,chunk_size=5,key=None):
+        """
+        Submit sweep to slot and return the `SweepJob`. If the inputs are the same of the current
+        sweep of the slot, the current sweep is returned. Completed sweeps are stored in `cache`
+        (ComputationCache) and reused without recomputation. The `SweepJob` is created only if
+        the slot does not already run the same sweep.
+        """
+        key = key or ComputationCache.get_key(run_gui_job,job,defects_analysis,bulk_dos)
+        current = self.get_current(slot,key,cache=cache)
+        if current:
+            return current
+        sweep = SweepJob(job,defects_analysis,bulk_dos,chunk_size=chunk_size,key=key)
+        return self.submit_task(slot,sweep,cache=cache)
+
+    def get_current(self,slot,key,cache=None):
+        """
+        Current task of the slot if its key is `key` and it is not cancelled, otherwise None.
+        Completed results are stored in `cache`.
+        """
+        current = self.jobs.get(slot)
+        if current and current.key == key and not current.cancelled:
+            if current.done and current.error is None and cache is not None and current.key not in cache:
+                cache.set(current.key,current.result)
+            return current
+        return None
+
+    def submit_task(self,slot,task,cache=None):
+        """
+        Submit task to slot, same as `submit` for any object with the interface of `SweepJob`
+        ("key", "run", "cancel", "cancelled", "done", "error", "result" and "set_result").
+        """
+        current = self.get_current(slot,task.key,cache=cache)
+        if current:
+            return current
+        current = self.jobs.get(slot)
+        if current:
+            current.cancel()
+        if cache is not None and task.key in cache:
+            task.set_result(cache.get(task.key))
+        else:
+            task.future = self.executor.submit(task.run)
+        self.jobs[slot] = task
+        return task
+
+    def cancel(self,slot=None):
+        """
+        Cancel sweep of a slot, or all sweeps if `slot` is None.
+        """
+        for s,job in self.jobs.items():
+            if slot is None or s == slot:
+                job.cancel()
+
+
+def get_job_runner(max_workers=2):
+    """
+    Get the `JobRunner` of the Streamlit session, created if not present.
+    """
+    import streamlit as st
+    if 'job_runner' not in st.session_state:
+        st.session_state['job_runner'] = JobRunner(max_workers=max_workers)
+    return st.session_state['job_runner']
+
+
+def rerun_while_running(interval=0.5):
+    """
+    Rerun the Streamlit script after `interval` seconds while background sweeps are running,
+    so that partial results are displayed as they are computed.
+    """
+    import time
+    import streamlit as st
+    if 'job_runner' in st.session_state and st.session_state['job_runner'].is_running:
+        time.sleep(interval)
+        st.rerun()
+
+
+def show_sweep_status(sweep):
+    """
+    Show progress bar of a running sweep or the error of a failed one.
+    Returns the ThermoData computed so far (None if not available).
+    """
+    import streamlit as st
+    if sweep.error:
+        st.error(f'Calculation failed:\n{sweep.error}')
+        return None
+    if not sweep.done:
+        st.progress(sweep.progress,text=f'Computing... {int(100*sweep.progress)}%')
+    return sweep.thermodata
@@ -7,6 +7,9 @@ import seaborn as sns
 import streamlit as st
 
 from defermi.plotter import plot_pO2_vs_fermi_level, plot_variable_species_vs_fermi_level, plot_pO2_vs_concentrations, plot_variable_species_vs_concentrations
+from defermi.gui.cache import get_computation_cache, get_brouwer_job, get_doping_job
+from defermi.gui.explore import explore_thermodata
+from defermi.gui.jobs import get_job_runner, rerun_while_running, show_sweep_status
 from defermi.gui.utils import init_state_variable, widget_with_updating_state
 
 def plotter():
@@ -75,6 +78,8 @@ def plotter():
                     if show_mue_diagram:
                         fermi_level()
 
+        rerun_while_running()
+
 
 def formation_energies():
 
@@ -292,21 +297,23 @@ def brouwer_diagram():
 
             if brouwer_da:
 
-                @st.cache_data
                 def compute_brouwer_diagram():
-                    brouwer_da.plot_brouwer_diagram(
-                                            bulk_dos=st.session_state.dos,
-                                            temperature=st.session_state.temperature,
-                                            quench_temperature=st.session_state.quench_temperature,
-                                            quenched_species=st.session_state.quenched_species,
-                                            quench_elements = st.session_state.quench_elements,
-                                            precursors=st.session_state.precursors,
-                                            oxygen_ref=st.session_state.oxygen_ref,
-                                            pressure_range=pressure_range,
-                                            external_defects=st.session_state.external_defects,
-                                            npoints=npoints
-                                        )
-                    return brouwer_da.thermodata
+                    job = get_brouwer_job(
+                                        temperature=st.session_state.temperature,
+                                        quench_temperature=st.session_state.quench_temperature,
+                                        quenched_species=st.session_state.quenched_species,
+                                        quench_elements = st.session_state.quench_elements,
+                                        precursors=st.session_state.precursors,
+                                        oxygen_ref=st.session_state.oxygen_ref,
+                                        pressure_range=pressure_range,
+                                        external_defects=st.session_state.external_defects,
+                                        npoints=npoints
+                                    )
+                    if st.session_state.get('explore_mode'):
+                        return explore_thermodata('brouwer',job,brouwer_da,st.session_state.dos,
+                                                  temperatures=st.session_state['explore_temperatures'],
+                                                  oxygen_refs=st.session_state['explore_oxygen_refs'])
+                    return show_sweep_status(get_job_runner().submit('brouwer',job,brouwer_da,st.session_state.dos,cache=get_computation_cache()))
 
                 cols = st.columns([0.05,0.22,0.73])
                 with cols[0]:
@@ -314,9 +321,6 @@ def brouwer_diagram():
                     st.session_state['show_brouwer_diagram'] = show_brouwer_diagram
                 with cols[1]:
                     st.markdown("<h3 style='font-size:24px;'>Brouwer diagram</h3>", unsafe_allow_html=True)
-                with cols[2]:
-                    if st.button('Compute',key='widget_clear_cache_brouwer'):
-                        compute_brouwer_diagram.clear()
 
                 if show_brouwer_diagram:
                     cols = st.columns([0.7,0.3])
@@ -339,31 +343,32 @@ def brouwer_diagram():
                         ylim = ylim if set_ylim else None   
 
                         brouwer_thermodata = compute_brouwer_diagram()
-                        dc = brouwer_thermodata.defect_concentrations[0]
-                        output, names, charges, colors = _filter_concentrations(dc,key='brouwer')
-
-                    with cols[0]:  
-                        #brouwer_thermodata = compute_brouwer_diagram()
-                        fig2 = plot_pO2_vs_concentrations(
-                                                    thermodata=brouwer_thermodata,
-                                                    output=output,
-                                                    figsize=figsize,
-                                                    fontsize=fontsize,
-                                                    xlim=xlim,
-                                                    ylim=ylim,
-                                                    colors=colors,
-                                                    names=names,
-                                                    charges=charges)                                           
-
-                        fig2.grid()
-                        fig2.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
-                        fig2.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
-                        st.session_state['brouwer_thermodata'] = brouwer_thermodata
-                        st.pyplot(fig2, clear_figure=False, width="content")
-
-                    with cols[1]:
-                        st.write('')
-                        download_plot(fig=fig2,filename='brouwer_diagram.pdf')
+                        if brouwer_thermodata:
+                            dc = brouwer_thermodata.defect_concentrations[0]
+                            output, names, charges, colors = _filter_concentrations(dc,key='brouwer')
+
+                    if brouwer_thermodata:
+                        with cols[0]:  
+                            fig2 = plot_pO2_vs_concentrations(
+                                                        thermodata=brouwer_thermodata,
+                                                        output=output,
+                                                        figsize=figsize,
+                                                        fontsize=fontsize,
+                                                        xlim=xlim,
+                                                        ylim=ylim,
+                                                        colors=colors,
+                                                        names=names,
+                                                        charges=charges)                                           
+
+                            fig2.grid()
+                            fig2.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
+                            fig2.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
+                            st.session_state['brouwer_thermodata'] = brouwer_thermodata
+                            st.pyplot(fig2, clear_figure=False, width="content")
+
+                        with cols[1]:
+                            st.write('')
+                            download_plot(fig=fig2,filename='brouwer_diagram.pdf')
 
 
 
@@ -380,20 +385,21 @@ def doping_diagram():
             da = st.session_state.da
             conc_range = st.session_state.conc_range
 
-            @st.cache_data
             def compute_doping_diagram():
-                da.plot_doping_diagram(
+                job = get_doping_job(
                         variable_defect_specie=st.session_state.dopant,
                         concentration_range=st.session_state.conc_range,
                         chemical_potentials=st.session_state.chempots,
-                        bulk_dos=st.session_state.dos,
                         temperature=st.session_state.temperature,
                         quench_temperature=st.session_state.quench_temperature,
                         quenched_species=st.session_state.quenched_species,
                         external_defects=st.session_state.external_defects,
                         npoints=npoints,
                         )
-                return da.thermodata
+                if st.session_state.get('explore_mode'):
+                    return explore_thermodata('doping',job,da,st.session_state.dos,
+                                              temperatures=st.session_state['explore_temperatures'])
+                return show_sweep_status(get_job_runner().submit('doping',job,da,st.session_state.dos,cache=get_computation_cache()))
             
             cols = st.columns([0.05,0.22,0.73])
             with cols[0]:
@@ -401,9 +407,6 @@ def doping_diagram():
                 st.session_state['show_doping_diagram'] = show_doping_diagram
             with cols[1]:
                 st.markdown("<h3 style='font-size:24px;'>Doping diagram</h3>", unsafe_allow_html=True)
-            with cols[2]:
-                if st.button('Compute',key='widget_clear_cache_doping'):
-                    compute_doping_diagram.clear()
 
             if show_doping_diagram:
                 cols = st.columns([0.7,0.3])
@@ -427,30 +430,32 @@ def doping_diagram():
                     ylim = ylim if set_ylim else None   
 
                     doping_thermodata = compute_doping_diagram()
-                    dc = doping_thermodata.defect_concentrations[0]
-                    output, names, charges, colors = _filter_concentrations(dc,key='doping')
+                    if doping_thermodata:
+                        dc = doping_thermodata.defect_concentrations[0]
+                        output, names, charges, colors = _filter_concentrations(dc,key='doping')
 
-                with cols[0]:
-                    fig3 = plot_variable_species_vs_concentrations(
-                                                    doping_thermodata,
-                                                    output=output,
-                                                    figsize=figsize,
-                                                    fontsize=fontsize,
-                                                    colors=colors,
-                                                    xlim=xlim,
-                                                    ylim=ylim,
-                                                    names=names,
-                                                    charges=charges
-                                                    )
-                    fig3.grid()
-                    fig3.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
-                    fig3.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
-                    st.session_state['doping_thermodata'] = doping_thermodata
-                    st.pyplot(fig3, clear_figure=False, width="content")
+                if doping_thermodata:
+                    with cols[0]:
+                        fig3 = plot_variable_species_vs_concentrations(
+                                                        doping_thermodata,
+                                                        output=output,
+                                                        figsize=figsize,
+                                                        fontsize=fontsize,
+                                                        colors=colors,
+                                                        xlim=xlim,
+                                                        ylim=ylim,
+                                                        names=names,
+                                                        charges=charges
+                                                        )
+                        fig3.grid()
+                        fig3.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
+                        fig3.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
+                        st.session_state['doping_thermodata'] = doping_thermodata
+                        st.pyplot(fig3, clear_figure=False, width="content")
 
-                with cols[1]:
-                    st.write('')
-                    download_plot(fig=fig3,filename='doping_diagram.pdf')
+                    with cols[1]:
+                        st.write('')
+                        download_plot(fig=fig3,filename='doping_diagram.pdf')
 
 
 def fermi_level():
@@ -0,0 +1,192 @@
+
+import io
+import json
+import zipfile
+
+import numpy as np
+from monty.json import MontyDecoder, MontyEncoder
+
+SESSION_FORMAT_VERSION = 1
+
+# session state variables that are not saved
+TRANSIENT_KEYS = ('session_loaded','session_name','precursors','external_defects','job_runner')
+
+
+def get_session_data(session_state,include_cache=True):
+    """
+    Get data of the session state to be saved. Widget states and transient variables
+    (e.g. the background job runner) are excluded.
+
+    Parameters
+    ----------
+    session_state : dict
+        Streamlit session state.
+    include_cache : bool
+        Include the cached results of the computations (`ComputationCache`), so that
+        diagrams of the reopened session are displayed without recomputation.
+
+    Returns
+    -------
+    data : dict
+        Session data.
+    """
+    data = {k:v for k,v in session_state.items() if 'widget' not in k and k not in TRANSIENT_KEYS}
+    if not include_cache and 'computation_cache' in data:
+        del data['computation_cache']
+    return data
+
+
+def encode_session(data,binary=True):
+    """
+    Encode session data. In the binary format the Monty-encoded data is stored in a compressed
+    zip archive: lists of dicts with the same keys are stored by columns, numeric lists as numpy
+    arrays (.npy) and identical structures only once.
+
+    Parameters
+    ----------
+    data : dict
+        Session data.
+    binary : bool
+        Use the binary format, otherwise the legacy JSON format is returned.
+
+    Returns
+    -------
+    content : bytes or str
+        Encoded session.
+    """
+    encoded = MontyEncoder().encode(data)
+    if not binary:
+        return json.dumps(encoded,indent=2)
+
+    d = json.loads(encoded)
+    encoder = _SessionEncoder()
+    d = encoder.encode(d)
+    structures = [{k:encoder.encode(v) for k,v in s.items()} for s in encoder.structures]
+    header = {'version':SESSION_FORMAT_VERSION,'data':d,'structures':structures}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer,'w',compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('session.json',json.dumps(header))
+        for name, array in encoder.arrays.items():
+            with archive.open(f'arrays/{name}.npy','w') as file:
+                np.save(file,array,allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_session(content):
+    """
+    Decode session data from content of a .defermi file, in binary or legacy JSON format.
+
+    Parameters
+    ----------
+    content : bytes or str
+        Content of the session file.
+
+    Returns
+    -------
+    data : dict
+        Session data.
+    """
+    if isinstance(content,bytes) and content[:2] == b'PK':
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            header = json.loads(archive.read('session.json'))
+            if header['version'] > SESSION_FORMAT_VERSION:
+                raise ValueError(f'Session format version {header["version"]} is not supported, update defermi')
+            arrays = {}
+            for name in archive.namelist():
+                if name.startswith('arrays/'):
+                    with archive.open(name) as file:
+                        arrays[name[len('arrays/'):-len('.npy')]] = np.load(io.BytesIO(file.read()),allow_pickle=False)
+        decoder = _SessionDecoder(arrays)
+        decoder.structures = [decoder.decode(s) for s in header['structures']]
+        d = decoder.decode(header['data'])
+    else:
+        if isinstance(content,bytes):
+            content = content.decode()
+        d = json.loads(content)
+        if isinstance(d,str): # legacy format stores the Monty-encoded string
+            d = json.loads(d)
+    return MontyDecoder().process_decoded(d)
+
+
+class _SessionEncoder:
+    # minimum size of lists converted to arrays or columns
+    min_length = 8
+
+    def __init__(self):
+        self.arrays = {}
+        self.structures = []
+        self._structure_indexes = {}
+
+    def encode(self,obj):
+        if isinstance(obj,dict):
+            if obj.get('@class') in ('Structure','Molecule'):
+                key = json.dumps(obj,sort_keys=True)
+                if key not in self._structure_indexes:
+                    self._structure_indexes[key] = len(self.structures)
+                    self.structures.append(obj)
+                return {'@structure':self._structure_indexes[key]}
+            return {k:self.encode(v) for k,v in obj.items()}
+        if isinstance(obj,list):
+            if len(obj) >= self.min_length:
+                array = _get_numeric_array(obj)
+                if array is not None:
+                    name = str(len(self.arrays))
+                    self.arrays[name] = array
+                    return {'@array':name}
+                if _is_table(obj):
+                    columns = {k:self.encode([item[k] for item in obj]) for k in obj[0]}
+                    return {'@columns':columns,'@length':len(obj)}
+            return [self.encode(v) for v in obj]
+        return obj
+
+
+class _SessionDecoder:
+
+    def __init__(self,arrays):
+        self.arrays = arrays
+        self.structures = []
+
+    def decode(self,obj):
+        if isinstance(obj,dict):
+            if '@array' in obj and len(obj) == 1:
+                return self.arrays[obj['@array']].tolist()
+            if '@structure' in obj and len(obj) == 1:
+                return self.structures[obj['@structure']]
+            if '@columns' in obj and len(obj) == 2:
+                columns = {k:self.decode(v) for k,v in obj['@columns'].items()}
+                return [{k:columns[k][i] for k in columns} for i in range(obj['@length'])]
+            return {k:self.decode(v) for k,v in obj.items()}
+        if isinstance(obj,list):
+            return [self.decode(v) for v in obj]
+        return obj
+
+
+def _get_numeric_array(items):
+    """
+    Convert list to numpy array if all elements are numbers of the same type
+    (or lists of them with the same length), otherwise return None.
+    """
+    leaf_type = None
+    stack = [items]
+    while stack:
+        value = stack.pop()
+        if isinstance(value,list):
+            stack.extend(value)
+        elif type(value) in (int,float) and leaf_type in (None,type(value)):
+            leaf_type = type(value)
+        else:
+            return None
+    if leaf_type is None:
+        return None
+    try:
+        array = np.array(items,dtype=leaf_type)
+    except (ValueError,OverflowError): # ragged lists or integers out of range
+        return None
+    return array
+
+
+def _is_table(items):
+    if not all(isinstance(item,dict) for item in items):
+        return False
+    keys = list(items[0].keys())
+    return all(list(item.keys()) == keys for item in items)
@@ -0,0 +1,88 @@
+
+import copy
+import os.path as op
+from unittest import mock
+
+from defermi import DefectsAnalysis
+from defermi.gui.cache import ComputationCache, get_fingerprint, get_input_fingerprint, compute_brouwer_thermodata, compute_doping_thermodata
+from defermi.thermodynamics import DefectThermodynamics
+
+from defermi.testing.core import DefermiTest
+
+
+class TestComputationCache(DefermiTest):
+
+    def setUp(self):
+        path = op.join(op.dirname(__file__),'test_files','DA_SiO2.csv')
+        self.da = DefectsAnalysis.from_file(path,band_gap=5.9685,vbm=1.0394)
+        self.dos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        self.chempots = {'Si':-5.42,'P':-5.41,'O':-6}
+
+    def test_fingerprint(self):
+        assert get_fingerprint(self.da,temperature=1000) == get_fingerprint(self.da.copy(),temperature=1000)
+        assert get_fingerprint(self.da,temperature=1000) != get_fingerprint(self.da,temperature=1100)
+        da = self.da.copy()
+        da.band_gap = 5
+        assert get_fingerprint(self.da) != get_fingerprint(da)
+
+    def test_fingerprint_custom_functions(self):
+        def formation_energy_1(entry,vbm,chemical_potentials,fermi_level,temperature,**kwargs):
+            return 1
+        def formation_energy_2(entry,vbm,chemical_potentials,fermi_level,temperature,**kwargs):
+            return 2
+        da1, da2 = copy.deepcopy(self.da), copy.deepcopy(self.da)
+        da1.entries[0].set_formation_energy_function(formation_energy_1)
+        assert get_fingerprint(da1) != get_fingerprint(self.da)
+        da2.entries[0].set_formation_energy_function(formation_energy_2)
+        assert get_fingerprint(da1) != get_fingerprint(da2)
+        da2.entries[0].set_formation_energy_function(formation_energy_1)
+        assert get_fingerprint(da1) == get_fingerprint(da2)
+
+        # objects that cannot be serialized are not hashed
+        with self.assertRaises(TypeError):
+            get_fingerprint(self.da,object())
+
+    def test_input_fingerprint(self):
+        da = self.da.copy()
+        fingerprint = get_input_fingerprint(da)
+        with mock.patch('defermi.gui.cache.get_fingerprint',side_effect=get_fingerprint) as patched:
+            assert get_input_fingerprint(da) is fingerprint
+            key = ComputationCache.get_key(sum,da,self.dos)
+            assert ComputationCache.get_key(sum,da,self.dos) == key
+            assert not any(call.args[0] is da for call in patched.call_args_list)
+        # changes made in place are detected
+        da.band_gap = 6
+        assert get_input_fingerprint(da) != fingerprint
+        assert ComputationCache.get_key(sum,da,self.dos) != key
+        assert get_input_fingerprint(self.dos) is self.dos
+
+    def test_lru(self):
+        cache = ComputationCache(maxsize=2)
+        cache.set('a',1)
+        cache.set('b',2)
+        assert cache.get('a') == 1
+        cache.set('c',3)
+        assert 'b' not in cache
+        assert len(cache) == 2 and 'a' in cache and 'c' in cache
+
+    def test_compute_thermodata(self):
+        cache = ComputationCache(maxsize=2)
+        kwargs = {'defects_analysis':self.da,'variable_defect_specie':'P','concentration_range':(1,1e20),
+                  'chemical_potentials':self.chempots,'bulk_dos':self.dos,'temperature':1000,'npoints':10,'cache':cache}
+        thermodata = compute_doping_thermodata(**kwargs)
+        assert compute_doping_thermodata(**kwargs) is thermodata
+        assert cache.misses == 1 and cache.hits == 1
+        
+        kwargs['temperature'] = 1100
+        assert compute_doping_thermodata(**kwargs) is not thermodata
+        assert cache.misses == 2
+        
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        brouwer_thermodata = compute_brouwer_thermodata(da,self.dos,1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,
+                                                        npoints=10,cache=cache)
+        assert len(brouwer_thermodata.partial_pressures) == 10
+        assert len(cache) == 2
+
+        # same solver tolerance of DefectsAnalysis.plot_doping_diagram
+        reference = DefectThermodynamics(self.da,self.dos,xtol=1e-20).get_variable_species_thermodata('P',(1,1e20),self.chempots,1000,npoints=10)
+        self.assert_all_close(thermodata.fermi_levels,reference.fermi_levels)
@@ -0,0 +1,66 @@
+
+import os.path as op
+
+from defermi import DefectsAnalysis
+from defermi.gui.cache import ComputationCache, get_brouwer_job, get_doping_job, run_gui_job
+from defermi.gui.explore import ExploreSurface, get_explore_surface
+from defermi.gui.jobs import JobRunner
+
+from defermi.testing.core import DefermiTest
+
+
+class TestExplore(DefermiTest):
+
+    def setUp(self):
+        path = op.join(op.dirname(__file__),'test_files','DA_SiO2.csv')
+        self.da = DefectsAnalysis.from_file(path,band_gap=5.9685,vbm=1.0394)
+        self.dos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        self.chempots = {'Si':-5.42,'P':-5.41,'O':-6}
+
+    def test_brouwer_surface(self):
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        job = get_brouwer_job(1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,npoints=10)
+        surface = ExploreSurface(job,da,self.dos,temperatures=[800,1200],oxygen_refs=[-5.45,-4.95])
+        with self.assertRaises(ValueError):
+            surface.interpolate(1000,-4.95)
+        surface.run()
+        assert surface.done and surface.error is None and surface.progress == 1
+        assert surface.contains(1000,-5)
+        assert not surface.contains(1500,-5)
+        assert not surface.contains(1000,-4)
+        with self.assertRaises(ValueError):
+            surface.interpolate(1500,-5)
+
+        # exact on grid nodes
+        job_node = dict(job,temperature=1200)
+        reference = run_gui_job(job_node,da,self.dos)
+        thermodata = surface.interpolate(1200,-4.95)
+        assert thermodata.metadata['interpolated']
+        self.assert_all_close(thermodata.fermi_levels,reference.fermi_levels)
+        self.assert_all_close(thermodata.partial_pressures,reference.partial_pressures)
+
+        reference = run_gui_job(dict(job,temperature=1000,oxygen_ref=-5.2),da,self.dos)
+        thermodata = surface.interpolate(1000,-5.2)
+        self.assert_all_close(thermodata.fermi_levels,reference.fermi_levels,atol=0.1)
+
+    def test_doping_surface(self):
+        job = get_doping_job('P',(1,1e20),self.chempots,1000,npoints=6)
+        surface = ExploreSurface(job,self.da,self.dos,temperatures=[800,1200])
+        surface.run()
+        assert surface.contains(1000)
+        reference = run_gui_job(dict(job,temperature=800),self.da,self.dos)
+        thermodata = surface.interpolate(800)
+        self.assert_all_close(thermodata.fermi_levels,reference.fermi_levels)
+        self.assert_all_close(thermodata.variable_concentrations,reference.variable_concentrations)
+
+    def test_get_explore_surface(self):
+        runner = JobRunner(max_workers=1)
+        cache = ComputationCache()
+        job = get_doping_job('P',(1,1e20),self.chempots,1000,npoints=4)
+        surface = get_explore_surface('doping',job,self.da,self.dos,temperatures=[800,1200],runner=runner,cache=cache)
+        surface.future.result()
+        assert surface.done
+        # temperature inside the grid does not trigger a new computation
+        job = get_doping_job('P',(1,1e20),self.chempots,900,npoints=4)
+        assert get_explore_surface('doping',job,self.da,self.dos,temperatures=[800,1200],runner=runner,cache=cache) is surface
+        assert surface.key in cache
@@ -0,0 +1,71 @@
+
+import os.path as op
+import time
+from unittest import mock
+
+from defermi import DefectsAnalysis
+from defermi.gui.cache import ComputationCache, get_brouwer_job, get_doping_job, run_gui_job
+from defermi.gui.jobs import SweepJob, JobRunner, get_coarse_to_fine_chunks
+
+from defermi.testing.core import DefermiTest
+
+
+class TestJobs(DefermiTest):
+
+    def setUp(self):
+        path = op.join(op.dirname(__file__),'test_files','DA_SiO2.csv')
+        self.da = DefectsAnalysis.from_file(path,band_gap=5.9685,vbm=1.0394)
+        self.dos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        self.chempots = {'Si':-5.42,'P':-5.41,'O':-6}
+
+    def test_chunks(self):
+        chunks = get_coarse_to_fine_chunks(10,3)
+        assert chunks[0] == [0,4,8]
+        assert sorted(i for chunk in chunks for i in chunk) == list(range(10))
+        assert all(len(chunk) <= 3 for chunk in chunks)
+
+    def test_sweep_job(self):
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        job = get_brouwer_job(1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,npoints=12)
+        sweep = SweepJob(job,da,self.dos,chunk_size=5)
+        assert sweep.thermodata is None
+        sweep.run()
+        assert sweep.done and sweep.progress == 1
+        reference = run_gui_job(job,da,self.dos)
+        assert sweep.thermodata.partial_pressures == reference.partial_pressures
+        self.assert_all_close(sweep.thermodata.fermi_levels,reference.fermi_levels)
+
+        job = get_doping_job('P',(1,1e20),self.chempots,1000,npoints=6)
+        sweep = SweepJob(job,self.da,self.dos,chunk_size=4)
+        sweep.run()
+        reference = run_gui_job(job,self.da,self.dos)
+        assert sweep.thermodata.variable_defect_specie == reference.variable_defect_specie
+        self.assert_all_close(sweep.thermodata.variable_concentrations,reference.variable_concentrations)
+        self.assert_all_close(sweep.thermodata.fermi_levels,reference.fermi_levels)
+
+    def test_job_runner(self):
+        runner = JobRunner(max_workers=2)
+        cache = ComputationCache()
+        job = get_doping_job('P',(1,1e20),self.chempots,1000,npoints=40)
+        sweep = runner.submit('doping',job,self.da,self.dos,cache=cache)
+        with mock.patch('defermi.gui.jobs.SweepJob') as patched:
+            assert runner.submit('doping',job,self.da,self.dos,cache=cache) is sweep
+            assert not patched.called
+        assert all(e is not original for e,original in zip(sweep.defects_analysis.entries,self.da.entries))
+        
+        new_job = get_doping_job('P',(1,1e20),self.chempots,1100,npoints=5)
+        new_sweep = runner.submit('doping',new_job,self.da,self.dos,cache=cache)
+        assert sweep.cancelled and new_sweep is not sweep
+        while runner.is_running:
+            time.sleep(0.05)
+        assert new_sweep.error is None
+        assert len(new_sweep.thermodata.fermi_levels) == 5
+        
+        # completed sweeps are stored in the cache and reused
+        runner.submit('doping',new_job,self.da,self.dos,cache=cache)
+        assert new_sweep.key in cache
+        runner.jobs = {}
+        cached_sweep = runner.submit('doping',new_job,self.da,self.dos,cache=cache)
+        assert cached_sweep.done and cached_sweep.future is None
+        assert cached_sweep.thermodata is new_sweep.thermodata
+        runner.executor.shutdown()
@@ -0,0 +1,76 @@
+
+import io
+import json
+import os.path as op
+import zipfile
+
+import numpy as np
+from monty.json import MontyEncoder
+from pymatgen.core.structure import Structure
+
+from defermi import DefectsAnalysis
+from defermi.gui.cache import ComputationCache, get_brouwer_job, run_gui_job
+from defermi.gui.jobs import JobRunner
+from defermi.gui.session import get_session_data, encode_session, decode_session
+
+from defermi.testing.core import DefermiTest
+
+
+class TestSession(DefermiTest):
+
+    def setUp(self):
+        path = op.join(op.dirname(__file__),'test_files','DA_SiO2.csv')
+        self.da = DefectsAnalysis.from_file(path,band_gap=5.9685,vbm=1.0394)
+        self.dos = {'m_eff_e':0.5,'m_eff_h':0.4}
+
+    def assert_same_data(self,data1,data2):
+        assert MontyEncoder().encode(data1) == MontyEncoder().encode(data2)
+
+    def test_encode_decode(self):
+        structure_path = op.join(op.dirname(op.dirname(op.dirname(__file__))),'tests','test_files','structure_bulk.json')
+        structure = Structure.from_file(structure_path)
+        data = {
+            'da':self.da,
+            'structures':[structure,structure.copy(),structure],
+            'pressures':list(np.logspace(-20,10,20)),
+            'carriers':[(1e10,2e3)]*10,
+            'mixed':[1,2.5,'a',None,True,1,2,3],
+            'charges':list(range(-3,7)),
+            'temperature':1000,
+            }
+        content = encode_session(data)
+        assert type(content) == bytes
+        self.assert_same_data(decode_session(content),data)
+        legacy_content = encode_session(data,binary=False)
+        self.assert_same_data(decode_session(legacy_content),data)
+        self.assert_same_data(decode_session(legacy_content.encode()),data)
+        assert len(content) < len(legacy_content) / 3
+
+        # structures are stored once
+        header = json.loads(zipfile.ZipFile(io.BytesIO(content)).read('session.json'))
+        assert len(header['structures']) == 1
+
+    def test_legacy_file(self):
+        path = op.join(op.dirname(__file__),'test_files','DA_textbook_complete.defermi')
+        with open(path,'rb') as file:
+            data = decode_session(file.read())
+        assert type(data['da']) == DefectsAnalysis
+        self.assert_same_data(decode_session(encode_session(data)),data)
+
+    def test_session_data_with_cache(self):
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        job = get_brouwer_job(1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,npoints=10)
+        cache = ComputationCache()
+        key = ComputationCache.get_key(run_gui_job,job,da,self.dos)
+        cache.set(key,run_gui_job(job,da,self.dos))
+        session_state = {'da':da,'widget_temperature':1000,'job_runner':JobRunner(),'computation_cache':cache}
+
+        data = get_session_data(session_state)
+        assert list(data.keys()) == ['da','computation_cache']
+        loaded_cache = decode_session(encode_session(data))['computation_cache']
+        assert type(loaded_cache) == ComputationCache
+        assert key in loaded_cache
+        self.assert_all_close(loaded_cache.get(key).fermi_levels,cache.get(key).fermi_levels)
+
+        data = get_session_data(session_state,include_cache=False)
+        assert list(data.keys()) == ['da']
@@ -26,6 +26,7 @@ def thermodynamics():
         with cols[1]:
             oxygen_ref = st.number_input("μO (0K, p0) [eV]", value=st.session_state['oxygen_ref'], step=0.5, key='widget_oxygen_ref')
             st.session_state['oxygen_ref'] = oxygen_ref
+        explore_mode()
         
         precursors()
         filter_entries_with_missing_elements()
@@ -34,6 +35,23 @@ def thermodynamics():
         dopants()
 
 
+def explore_mode():
+    """
+    GUI elements to enable the explore mode: diagrams are interpolated on a coarse grid of 
+    temperatures and oxygen reference chempots computed in the background (see `defermi.gui.explore`).
+    """
+    init_state_variable('explore_mode',value=False)
+    init_state_variable('explore_temperatures',value=list(range(250,1501,250)))
+    init_state_variable('explore_oxygen_refs',value=None)
+    explore_mode = st.checkbox("Explore mode", value=st.session_state['explore_mode'], key="widget_explore_mode",
+                               help='Precompute diagrams on a coarse grid of temperature and μO and interpolate them while moving the sliders')
+    st.session_state['explore_mode'] = explore_mode
+    if explore_mode and st.session_state['explore_oxygen_refs'] is None:
+        # grid centered on the current value of the oxygen reference
+        st.session_state['explore_oxygen_refs'] = list(st.session_state['oxygen_ref'] + np.arange(-1,1.01,0.5))
+    elif not explore_mode:
+        st.session_state['explore_oxygen_refs'] = None
+
     
 def precursors():
     
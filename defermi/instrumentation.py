@@ -0,0 +1,149 @@
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# active collectors of the current thread (threads start with no active collectors)
+_active_stats = ContextVar('active_solver_stats',default=())
+
+
+class SolverStats:
+    """
+    Counters and timings of charge-neutrality solves.
+    SolverStats objects are filled by the solver while active (see `collect_solver_stats`).
+    """
+    def __init__(self):
+        self.counters = {
+            'solves': 0,
+            'bisect_iterations': 0,
+            'charge_evaluations': 0,
+            'dos_integrations': 0
+            }
+        self.timings = {}
+        self.solves = []
+
+    def __repr__(self):
+        return 'SolverStats(%s, timings=%s)' %(self.counters, {k:round(v,4) for k,v in self.timings.items()})
+
+    @property
+    def max_residual(self):
+        """
+        Max absolute value of the residual charge (cm^-3) over all solves.
+        """
+        return max([abs(s['residual']) for s in self.solves]) if self.solves else None
+
+    def add_solve(self,iterations,function_calls,residual,fermi_level,temperature=None):
+        """
+        Record the outcome of a single Fermi level solve.
+        """
+        self.counters['solves'] += 1
+        self.counters['bisect_iterations'] += iterations
+        self.counters['charge_evaluations'] += function_calls
+        self.solves.append({
+            'iterations':iterations,
+            'function_calls':function_calls,
+            'residual':residual,
+            'fermi_level':fermi_level,
+            'temperature':temperature
+            })
+
+    def add_timing(self,stage,seconds):
+        """
+        Add time in seconds to a stage.
+        """
+        self.timings[stage] = self.timings.get(stage,0) + seconds
+
+    def merge(self,stats):
+        """
+        Add counters, timings and solves of another SolverStats (or of its dict representation).
+        """
+        d = stats.as_dict() if isinstance(stats,SolverStats) else stats
+        for k,v in d['counters'].items():
+            self.counters[k] = self.counters.get(k,0) + v
+        for k,v in d['timings'].items():
+            self.add_timing(k,v)
+        self.solves.extend(s.copy() for s in d['solves'])
+
+    def as_dict(self):
+        """
+        Json-serializable dict representation of SolverStats.
+        """
+        return {
+            'counters':self.counters.copy(),
+            'timings':self.timings.copy(),
+            'max_residual':self.max_residual,
+            'solves':[s.copy() for s in self.solves]
+            }
+
+
+@contextmanager
+def collect_solver_stats():
+    """
+    Context manager to collect solver statistics of all calls within the block.
+    Collectors can be nested, each of them receives all records.
+    Only calls in the current thread are collected. Calls in worker processes are not
+    collected, unless their statistics are returned and added with `record_stats` 
+    (as in `DefectThermodynamics.get_pO2_multi_quenched_thermodata`).
+
+    Examples
+    --------
+    >>> with collect_solver_stats() as stats:
+    ...     da.solve_fermi_level(chempots, bulk_dos, temperature=1000)
+    >>> stats.counters['bisect_iterations']
+    """
+    stats = SolverStats()
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+def is_collecting():
+    """
+    True if any SolverStats collector is active.
+    """
+    return bool(_active_stats.get())
+
+
+def record_solve(**kwargs):
+    """
+    Record a Fermi level solve in all active collectors (see `SolverStats.add_solve`).
+    """
+    for stats in _active_stats.get():
+        stats.add_solve(**kwargs)
+
+
+def record_stats(stats):
+    """
+    Merge SolverStats (or its dict representation), e.g. collected in a worker process, 
+    in all active collectors.
+    """
+    for active in _active_stats.get():
+        active.merge(stats)
+
+
+def record_count(counter,n=1):
+    """
+    Increase a counter in all active collectors.
+    """
+    for stats in _active_stats.get():
+        stats.counters[counter] = stats.counters.get(counter,0) + n
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time the code block and add it to `stage` in all active collectors.
+    """
+    active_stats = _active_stats.get()
+    if not active_stats:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        for stats in active_stats:
+            stats.add_timing(stage,dt)
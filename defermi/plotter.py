@@ -8,8 +8,11 @@ Created on Wed Feb 17 15:24:29 2021
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
 import pandas as pd
 
+from .analysis import get_concentrations_array
 from .defects import Defect, format_legend_with_charge_number, get_defect_from_string
 
 
@@ -865,14 +868,14 @@ def plot_x_vs_conductivity(
     matplotlib.rcParams.update({'font.size': fontsize})
     if new_figure:
         plt.figure(figsize=figsize)
+    plt.xscale('log')
+    plt.yscale('log')
     if isinstance(conductivities,dict):
-        for name,sigma in conductivities.items():
-            plt.plot(x,sigma,linewidth=4,marker='s',label=name)
+        sigmas = np.array(list(conductivities.values()),dtype=float).T
+        _plot_lines(x,sigmas,labels=list(conductivities.keys()),linewidth=4,marker='s')
     else:
         sigma = conductivities
         plt.plot(x,sigma,linewidth=4,marker='s',label=label)
-    plt.xscale('log')
-    plt.yscale('log')
     plt.xlim(xlim)
     if ylim:
         plt.ylim(ylim)
@@ -934,15 +937,14 @@ def plot_x_vs_fermi_level(
     matplotlib.rcParams.update({'font.size': fontsize})
     if new_figure:
         plt.figure(figsize=figsize)
+    plt.xscale('log')
     if isinstance(fermi_levels,dict):
-        for name,mue in fermi_levels.items():
-            clr = colors[list(fermi_levels.keys()).index(name)] if colors else None
-            plt.plot(x,mue,linewidth=4,label=name,color=clr)
+        mues = np.array(list(fermi_levels.values()),dtype=float).T
+        _plot_lines(x,mues,labels=list(fermi_levels.keys()),colors=colors,linewidth=4)
     else:
         mue = fermi_levels
         clr = colors[0] if colors else None
         plt.plot(x,mue,linewidth=4,label=label,color=clr)
-    plt.xscale('log')
     plt.xlim(xlim)
     if ylim:
         plt.ylim(ylim)
@@ -982,32 +984,24 @@ def _plot_conc(
             **kwargs):
     
     plt.figure(figsize=figsize)
-    dc = defect_concentrations if output != 'stable' else [c.stable for c in defect_concentrations] 
-    if kwargs:
-        dc = [c.filter_concentrations(**kwargs) for c in dc] #filter concentrations based on kwargs
-    h = [cr[0] for cr in carrier_concentrations] 
-    n = [cr[1] for cr in carrier_concentrations]
-    previous_charge = None
-    for i in range(0,len(dc[0])):
-            conc = [c[i].conc for c in dc]
-            charges = [c[i].charge for c in dc]
-            try:
-                label_txt = get_defect_from_string(dc[0][i].name).symbol
-            except:
-                label_txt = dc[0][i].name
-            if output == 'all':
-                label_txt = format_legend_with_charge_number(label_txt,dc[0][i].charge)
-            elif output == 'stable':
-                for q in charges:
-                    if q != previous_charge:
-                        previous_charge = q
-                        label_charge = '+' + str(int(q)) if q > 0 else str(int(q))
-                        index = charges.index(q)
-                        plt.text(x[index],conc[index],label_charge,clip_on=True)
-            color = colors[i] if colors else None
-            plt.plot(x,conc,label=label_txt,linewidth=4,color=color)
-    plt.plot(x,h,label='$n_{h}$',linestyle='--',color='r',linewidth=4)
-    plt.plot(x,n,label='$n_{e}$',linestyle='--',color='b',linewidth=4)
+    plt.xscale('log')
+    plt.yscale('log')
+    names, charges, concentrations = get_concentrations_array(defect_concentrations,output=output,**kwargs)
+    x = np.asarray(x,dtype=float)
+    symbols = _get_symbols(names)
+    if output == 'all':
+        labels = [format_legend_with_charge_number(symbol,q) for symbol,q in zip(symbols,charges)]
+    else:
+        labels = symbols
+        # label charge where the stable charge changes along x
+        for i in range(concentrations.shape[1]):
+            changes = np.flatnonzero(np.diff(charges[:,i],prepend=np.nan))
+            for index in changes:
+                q = charges[index,i]
+                label_charge = '+' + str(int(q)) if q > 0 else str(int(q))
+                plt.text(x[index],concentrations[index,i],label_charge,clip_on=True)
+    _plot_lines(x,concentrations,labels=labels,colors=colors,linewidth=4)
+    _plot_carriers(x,carrier_concentrations)
     return plt
 
 
@@ -1019,23 +1013,57 @@ def _plot_conc_total(
                     colors,
                     **kwargs):
     
-    dc = defect_concentrations
-    if kwargs:
-        dc = [c.filter_concentrations(**kwargs) for c in dc]
     plt.figure(figsize=figsize)
-    h = [cr[0] for cr in carrier_concentrations] 
-    n = [cr[1] for cr in carrier_concentrations]
-    for name in dc[0].names:
-        conc = [c.total[name] for c in dc]
+    plt.xscale('log')
+    plt.yscale('log')
+    names, _, concentrations = get_concentrations_array(defect_concentrations,output='total',**kwargs)
+    _plot_lines(x,concentrations,labels=_get_symbols(names),colors=colors,linewidth=4)
+    _plot_carriers(x,carrier_concentrations)
+    return plt
+
+
+def _get_symbols(names):
+    symbols = []
+    for name in names:
         try:
-            label_txt = get_defect_from_string(name).symbol
+            symbols.append(get_defect_from_string(name).symbol)
         except:
-            label_txt = name
-        color = colors[dc[0].names.index(name)] if colors else None
-        plt.plot(x,conc,label=label_txt,linewidth=4,color=color)
-    plt.plot(x,h,label='$n_{h}$',linestyle='--',color='r',linewidth=4)
-    plt.plot(x,n,label='$n_{e}$',linestyle='--',color='b',linewidth=4)
-    return plt
+            symbols.append(name)
+    return symbols
+
+
+def _plot_carriers(x,carrier_concentrations):
+    carriers = np.array(carrier_concentrations,dtype=float).reshape(-1,2)
+    plt.plot(x,carriers[:,0],label='$n_{h}$',linestyle='--',color='r',linewidth=4)
+    plt.plot(x,carriers[:,1],label='$n_{e}$',linestyle='--',color='b',linewidth=4)
+    return
+
+
+def _plot_lines(x,y,labels,colors=None,marker=None,**kwargs):
+    """
+    Plot all columns of `y` (shape: number of points, number of series) against `x`
+    as a single LineCollection. Legend entries are added with empty lines.
+    """
+    ax = plt.gca()
+    x = np.asarray(x,dtype=float)
+    y = np.asarray(y,dtype=float).reshape(len(x),-1)
+    # colors are cycled if fewer than the series
+    colors = list(colors) if colors else matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [colors[i % len(colors)] for i in range(y.shape[1])]
+    # values not shown on log scale are masked
+    if ax.get_xscale() == 'log':
+        x = np.where(x > 0,x,np.nan)
+    if ax.get_yscale() == 'log':
+        y = np.where(y > 0,y,np.nan)
+    segments = np.stack([np.broadcast_to(x[:,None],y.shape),y],axis=-1).transpose(1,0,2)
+    ax.add_collection(LineCollection(segments,colors=colors,**kwargs))
+    if marker:
+        ax.scatter(np.broadcast_to(x[:,None],y.shape).T.ravel(),y.T.ravel(),
+                   c=np.repeat(np.array([to_rgba(c) for c in colors]),len(x),axis=0),marker=marker,zorder=3)
+    for label,color in zip(labels,colors):
+        ax.plot([],[],label=label,color=color,marker=marker,**kwargs)
+    ax.autoscale_view()
+    return
 
 
 def _get_unstable_bool(defect_concentrations):
@@ -13,7 +13,6 @@ import os
 
 from pymatgen.core.sites import PeriodicSite
 from pymatgen.core.periodic_table import Element
-from pymatgen.core.trajectory import Trajectory
 
 from .tools.structure import is_site_in_structure_coords, sort_sites_to_ref_coords, write_extxyz_file
 from .defects import Vacancy,Substitution,Interstitial,DefectComplex
@@ -333,6 +332,7 @@ def get_trajectory_for_visualization(structure_defect,structure_bulk,defects=Non
     """
     sb = structure_bulk
     dummy = create_def_structure_for_visualization(structure_defect, structure_bulk,defects,sort_to_bulk=True,tol=tol)
+    from pymatgen.core.trajectory import Trajectory
     traj = Trajectory.from_structures([dummy,sb],constant_lattice=True)     
     if file:
         if not op.exists(op.dirname(file)):
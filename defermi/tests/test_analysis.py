@@ -18,7 +18,7 @@ from defermi.tools.utils import get_object_from_json
 from defermi.chempots.core import Chempots
 from defermi.defects import Vacancy
 from defermi.entries import DefectEntry
-from defermi.analysis import DefectsAnalysis, SingleDefConc, DefectConcentrations
+from defermi.analysis import DefectsAnalysis, SingleDefConc, DefectConcentrations, get_concentrations_array
 
 from defermi.testing.core import DefermiTest
 from defermi.testing.defects import DefectEntryTest
@@ -447,4 +447,63 @@ def TestDefectConcentrations(DefermiTest):
 
 
     
-    
\ No newline at end of file
+    
+
+class TestConcentrationsArray(DefermiTest):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        names_charges = [('Int_O',-2),('Int_O',-1),('Int_O',0),('Vac_O',0),('Vac_O',1),('Vac_O',2),('Vac_Si',-4)]
+        self.defect_concentrations = [
+            DefectConcentrations([SingleDefConc(name=n,charge=q,conc=float(10**rng.uniform(-5,20))) for n,q in names_charges])
+            for _ in range(20)]
+        
+    def test_concentrations_array(self):
+        dcs = self.defect_concentrations
+
+        names, charges, concs = get_concentrations_array(dcs,output='all')
+        assert concs.shape == (20,7)
+        self.assert_all_close(concs[:,4],[dc[4].conc for dc in dcs])
+        assert list(charges) == [c.charge for c in dcs[0]]
+
+        names, charges, concs = get_concentrations_array(dcs,output='total')
+        assert names == dcs[0].names
+        self.assert_all_close(concs[:,1],[dc.total['Vac_O'] for dc in dcs])
+
+        names, charges, concs = get_concentrations_array(dcs,output='stable')
+        assert names == [c.name for c in dcs[0].stable]
+        self.assert_all_close(concs,[[c.conc for c in dc.stable] for dc in dcs])
+        self.assert_all_close(charges,[[c.charge for c in dc.stable] for dc in dcs])
+
+        names, charges, concs = get_concentrations_array(dcs,output='all',names=['Vac_O'],charges=[1,2])
+        assert names == ['Vac_O','Vac_O']
+        self.assert_all_close(concs[:,1],[dc[5].conc for dc in dcs])
+        with self.assertRaises(ValueError):
+            get_concentrations_array(dcs,output='elemental')
+
+    def test_plot_concentrations(self):
+        from matplotlib.collections import LineCollection
+        from defermi.plotter import plot_x_vs_concentrations
+        dcs = self.defect_concentrations
+        x = np.logspace(-20,10,20)
+        for output in ('all','stable','total'):
+            plt = plot_x_vs_concentrations(x,'x',dcs,[(1e10,1e12)]*20,output=output)
+            ax = plt.gca()
+            collections = [c for c in ax.collections if isinstance(c,LineCollection)]
+            assert len(collections) == 1
+            _, _, concs = get_concentrations_array(dcs,output=output)
+            self.assert_all_close(collections[0].get_segments()[0][:,1],concs[:,0])
+            nseries = concs.shape[1]
+            assert len(ax.get_legend().get_texts()) == nseries + 2
+            plt.close('all')
+
+        # colors are cycled if fewer than the series
+        from matplotlib.colors import to_rgba
+        from defermi.plotter import _plot_lines
+        plt.figure()
+        _plot_lines(x,np.ones((20,5)),labels=list('abcde'),colors=['r','b'])
+        ax = plt.gca()
+        self.assert_all_close(ax.collections[0].get_colors(),[to_rgba(c) for c in 'rbrbr'])
+        assert [line.get_label() for line in ax.lines] == list('abcde')
+        assert [line.get_color() for line in ax.lines] == list('rbrbr')
+        plt.close('all')
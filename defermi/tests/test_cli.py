@@ -0,0 +1,81 @@
+
+import argparse
+import json
+import os
+import os.path as op
+import tempfile
+
+from defermi.cli.run import execute_jobs, get_jobs, load_run_spec, run_batch
+from defermi.thermodynamics import ThermoData
+
+from defermi.testing.core import DefermiTest
+from defermi.tests.test_analysis import get_textbook_case_with_ctl
+
+
+class TestCLIRun(DefermiTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        da, chempots, bulk_dos = get_textbook_case_with_ctl()
+        da.to_json(op.join(self.tmpdir.name,'analysis.json'))
+        self.spec = {
+            'analysis':'analysis.json',
+            'bulk_dos':bulk_dos,
+            'output_dir':'results',
+            'temperatures':[800,1000],
+            'xtol':1e-10,
+            'sweeps':[
+                {'name':'brouwer','type':'brouwer','precursors':{'SrO':-10},'oxygen_ref':-4.95,'npoints':5},
+                {'name':'brouwer_quenched','type':'brouwer','temperature':1000,'quench_temperature':300,
+                 'precursors':{'SrO':-10},'oxygen_ref':-4.95,'npoints':5},
+                {'name':'doping','type':'doping','temperature':1000,'variable_defect_specie':{'name':'D','charge':1},
+                 'chemical_potentials':chempots,'concentration_range':[1e10,1e20],'npoints':5}
+                ]
+            }
+        self.spec_path = op.join(self.tmpdir.name,'spec.json')
+        with open(self.spec_path,'w') as file:
+            json.dump(self.spec,file)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get_args(self,**kwargs):
+        args = {'spec':self.spec_path,'workers':1,'output_dir':None,'resume':False,'dry_run':False}
+        args.update(kwargs)
+        return argparse.Namespace(**args)
+
+    def test_get_jobs(self):
+        jobs = get_jobs(load_run_spec(self.spec_path))
+        names = [job['name'] for job in jobs]
+        assert names == ['brouwer_T800','brouwer_T1000','brouwer_quenched','doping']
+
+        # the input specification is not modified
+        spec = {'analysis':'analysis.json','bulk_dos':{},'sweeps':[{'type':'brouwer','reservoirs':'reservoirs.json'}]}
+        load_run_spec(spec)
+        assert spec['sweeps'][0]['reservoirs'] == 'reservoirs.json'
+
+    def test_failed_worker_initialization(self):
+        spec = load_run_spec(self.spec_path)
+        spec['analysis'] = op.join(self.tmpdir.name,'missing.json')
+        jobs = get_jobs(spec)
+        for workers in (1,2):
+            results = dict(execute_jobs(spec,jobs,workers=workers))
+            # every job is reported as failed, so that it can be retried with "--resume"
+            assert sorted(results) == sorted(job['name'] for job in jobs)
+            assert all(error for error in results.values())
+
+    def test_run_and_resume(self):
+        output_dir = op.join(self.tmpdir.name,'results')
+        assert run_batch(self.get_args(workers=2)) == 0
+        thermodata = ThermoData.from_json(op.join(output_dir,'brouwer_T1000.json'))
+        assert len(thermodata.fermi_levels) == 5
+        assert thermodata.name == 'brouwer_T1000'
+        thermodata = ThermoData.from_json(op.join(output_dir,'doping.json'))
+        self.assert_all_close(thermodata.variable_concentrations[-1],1e20)
+
+        # completed jobs are not run again
+        os.remove(op.join(output_dir,'doping.json'))
+        mtime = op.getmtime(op.join(output_dir,'brouwer_T800.json'))
+        assert run_batch(self.get_args(resume=True)) == 0
+        assert op.getmtime(op.join(output_dir,'brouwer_T800.json')) == mtime
+        assert op.isfile(op.join(output_dir,'doping.json'))
@@ -0,0 +1,26 @@
+
+import json
+import subprocess
+import sys
+
+
+def test_lazy_imports():
+    heavy = [
+        'matplotlib.pyplot',
+        'pandas',
+        'mp_api',
+        'pymatgen.analysis.defects',
+        'pymatgen.analysis.phase_diagram',
+        'pymatgen.io.vasp',
+        'defermi.plotter',
+        'defermi.corrections.kumagai',
+        'defermi.corrections.freysoldt',
+        'defermi.chempots.generator',
+        ]
+    code = (
+        'import sys, json; import defermi; from defermi.thermodynamics import DefectThermodynamics; '
+        f'print(json.dumps([m for m in {heavy!r} if m in sys.modules]))'
+        )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    loaded = json.loads(out.stdout.strip().splitlines()[-1])
+    assert loaded == []
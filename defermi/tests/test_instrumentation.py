@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from defermi.instrumentation import collect_solver_stats
+from defermi.thermodynamics import DefectThermodynamics, ThermoData
+
+from defermi.testing.core import DefermiTest
+from defermi.tests.test_analysis import get_textbook_case_with_ctl
+
+
+class TestInstrumentation(DefermiTest):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.da, cls.chempots, cls.bulk_dos = get_textbook_case_with_ctl()
+
+    def test_collect_solver_stats(self):
+        da = self.da
+        with collect_solver_stats() as stats:
+            fermi_level = da.solve_fermi_level(self.chempots,self.bulk_dos,temperature=1000,xtol=1e-10)
+        assert stats.counters['solves'] == 1
+        assert stats.counters['bisect_iterations'] > 10
+        assert stats.counters['charge_evaluations'] == stats.counters['dos_integrations']
+        self.assert_all_close(stats.solves[0]['fermi_level'],fermi_level)
+        assert abs(stats.max_residual) < 1e10
+
+        # nothing is recorded outside the context manager
+        da.solve_fermi_level(self.chempots,self.bulk_dos,temperature=1000,xtol=1e-10)
+        assert stats.counters['solves'] == 1
+
+    def test_thermodata_metadata(self):
+        da = self.da
+        reservoirs = da._generate_pressure_reservoirs(temperature=1000,precursors={'SrO':-10},oxygen_ref=-4.95,npoints=5)
+        dt = DefectThermodynamics(da,self.bulk_dos,instrument=True)
+        thermodata = dt.get_pO2_quenched_thermodata(reservoirs,initial_temperature=1000,final_temperature=300)
+        stats = thermodata.metadata['solver_stats']
+        assert stats['counters']['solves'] == 10
+        assert len(stats['solves']) == 10
+        for stage in ('solve','concentrations','total'):
+            assert stats['timings'][stage] > 0
+        assert stats['timings']['total'] >= stats['timings']['solve']
+
+        thermodata = ThermoData.from_dict(thermodata.as_dict())
+        assert thermodata.metadata['solver_stats']['counters']['solves'] == 10
+
+        thermodata = DefectThermodynamics(da,self.bulk_dos).get_pO2_thermodata(reservoirs,temperature=1000)
+        assert thermodata.metadata == {}
+
+    def test_threads_and_processes(self):
+        da = self.da
+        # solves in other threads are not recorded in the collectors of this thread
+        with collect_solver_stats() as stats:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(da.solve_fermi_level,self.chempots,self.bulk_dos,1000,xtol=1e-10).result()
+        assert stats.counters['solves'] == 0
+
+        # statistics of worker processes are merged
+        reservoirs = da._generate_pressure_reservoirs(temperature=1000,precursors={'SrO':-10},oxygen_ref=-4.95,npoints=3)
+        dt = DefectThermodynamics(da,self.bulk_dos)
+        with collect_solver_stats() as stats:
+            dt.get_pO2_multi_quenched_thermodata(reservoirs,1000,[300,500],workers=2)
+        assert stats.counters['solves'] == 9
+        assert len(stats.solves) == 9
@@ -15,6 +15,7 @@ from pymatgen.core.units import kb
 
 from defermi.analysis import DefectsAnalysis
 from defermi.chempots.core import Chempots
+from defermi.chempots.reservoirs import PressureReservoirs
 from defermi.defects import Vacancy
 from defermi.entries import DefectEntry
 from defermi.thermodynamics import DefectThermodynamics
@@ -212,10 +213,214 @@ class TestDefectThermodynamics(DefermiTest):
         desired = 28853383959330.863
         self.assert_all_close(actual, desired)
 
+        # custom functions are always computed with the reference engine
+        da.engine = 'fast'
+        da.plot_brouwer_diagram(mdos,1000,precursors={'SrO':-10},oxygen_ref=-4.95,xtol=1e-100)
+        conc = da.thermodata.defect_concentrations[35]
+        actual = conc.select_concentrations(name='Vac_O')[0]['conc']
+        self.assert_all_close(actual, desired=537497932157133.1)
+
+
+    def test_engines(self):
+        da = self.da
+        fixed = {'P':1e17,'Vac_Si':1e12}
+        for fixed_concentrations in (None,fixed):
+            reference = da.defect_concentrations(self.chempots,1000,fermi_level=3,fixed_concentrations=fixed_concentrations)
+            fast = da.defect_concentrations(self.chempots,1000,fermi_level=3,fixed_concentrations=fixed_concentrations,engine='fast')
+            self.assert_all_close([c.conc for c in fast],[c.conc for c in reference])
+            
+            reference = da.solve_fermi_level(self.chempots,self.dos,1000,fixed_concentrations=fixed_concentrations,xtol=1e-10)
+            fast = da.solve_fermi_level(self.chempots,self.dos,1000,fixed_concentrations=fixed_concentrations,xtol=1e-10,engine='fast')
+            self.assert_all_close(fast,reference)
+
+        reservoirs = {p:self.chempots.copy() for p in (1e-10,1,1e10)}
+        dt = DefectThermodynamics(da,self.dos,engine='fast')
+        deviations = dt.cross_check_engines(reservoirs,temperature=1000,npoints=2)
+        assert [p['key'] for p in deviations['points']] == [1e-10,1e10]
+        assert deviations['max_fermi_level_deviation'] < 1e-08
+        assert deviations['max_log_concentration_deviation'] < 1e-08
+
+        deviations = dt.cross_check_engines(reservoirs,temperature=1000,final_temperature=300,quench_elements=True)
+        assert len(deviations['points']) == 3
+        assert deviations['max_log_concentration_deviation'] < 1e-06
+
+        with self.assertRaises(ValueError):
+            DefectsAnalysis(da.entries,band_gap=da.band_gap,engine='numba')
+
+        # array-backed reservoirs are passed to the fast solver as matrix rows
+        elements = list(self.chempots.keys())
+        array = np.array([[self.chempots[el] + shift for el in elements] for shift in (-0.5,0,0.5)])
+        res_array = PressureReservoirs.from_array(array,[1e-10,1,1e10],elements,temperature=1000,mu_refs=self.chempots)
+        res_dict = PressureReservoirs({p:Chempots(dict(zip(elements,row))) for p,row in zip([1e-10,1,1e10],array)},
+                                      temperature=1000,mu_refs=self.chempots)
+        reference = DefectThermodynamics(da,self.dos).get_pO2_thermodata(res_dict)
+        fast = dt.get_pO2_thermodata(res_array)
+        assert res_array.is_array_backed
+        self.assert_all_close(fast['fermi_levels'],reference['fermi_levels'])
+        self.assert_all_close([c.total['Vac_Si'] for c in fast['defect_concentrations']],
+                              [c.total['Vac_Si'] for c in reference['defect_concentrations']])
+
 
 ### more complex functions with quenched species and external defects to be implemented
 
 
         
         
-        
\ No newline at end of file
+        
+
+    def test_adaptive_brouwer_diagram(self):
+        from defermi.chempots.oxygen import get_pressure_reservoirs_from_precursors
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        mdos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        da.plot_brouwer_diagram(mdos,1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,npoints=200)
+        reference = da.thermodata
+
+        da.plot_brouwer_diagram(mdos,1000,precursors={'SiO2':-23.69},oxygen_ref=-4.95,npoints=9,
+                                adaptive=True,adaptive_kwargs={'max_npoints':60})
+        data = da.thermodata
+        assert 9 < len(data.partial_pressures) <= 60
+        assert data.metadata['npoints'] == len(data.partial_pressures)
+        assert data.partial_pressures == sorted(data.partial_pressures)
+        assert list(da.chempots.keys()) == data.partial_pressures
+        fermi_levels = np.interp(np.log10(reference.partial_pressures),np.log10(data.partial_pressures),data.fermi_levels)
+        self.assert_all_close(fermi_levels,reference.fermi_levels,atol=0.01)
+
+        # quenched
+        dt = DefectThermodynamics(da,mdos)
+        def get_reservoirs(partial_pressures):
+            return get_pressure_reservoirs_from_precursors({'SiO2':-23.69},-4.95,1000,partial_pressures=partial_pressures)
+        data = dt.get_pO2_adaptive_thermodata(get_reservoirs,temperature=1000,quench_temperature=300,max_npoints=30)
+        assert data.temperature == (1000,300)
+        assert len(data.partial_pressures) <= 30
+        reference = dt.get_pO2_quenched_thermodata(get_reservoirs(data.partial_pressures),1000,300)
+        self.assert_all_close(data.fermi_levels,reference.fermi_levels,atol=1e-4) # pressure keys are rounded
+        with self.assertRaises(ValueError):
+            da.plot_brouwer_diagram(mdos,1000,reservoirs=get_reservoirs([1e-10,1]),adaptive=True)
+
+
+    def test_solve_targets(self):
+        from defermi.chempots.oxygen import get_pressure_reservoirs_from_precursors
+        from defermi.thermodynamics import Conductivity
+        mdos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        dt = DefectThermodynamics(self.da,mdos,xtol=1e-10)
+        concentration, data = dt.solve_doping_target('fermi_level',4,'P',(1,1e20),self.chempots,1000)
+        self.assert_all_close(data.fermi_levels,4,atol=1e-4)
+        assert data.metadata['nsolves'] < 15
+        sweep = dt.get_variable_species_thermodata('P',(concentration,concentration),self.chempots,1000,npoints=1)
+        self.assert_all_close(sweep.fermi_levels[0],data.fermi_levels)
+
+        concentration, data = dt.solve_doping_target('electrons',1e8,'P',(1,1e20),self.chempots,1000)
+        self.assert_all_close(data.carrier_concentrations[1],1e8,rtol=1e-3)
+        conductivity = Conductivity({'electrons':100,'holes':50})
+        concentration, data = dt.solve_doping_target('conductivity',1e-9,'P',(1,1e20),self.chempots,1000,conductivity=conductivity)
+        self.assert_all_close(conductivity.get_conductivity(data.carrier_concentrations,data.defect_concentrations),1e-9,rtol=1e-3)
+        with self.assertRaises(ValueError):
+            dt.solve_doping_target('fermi_level',10,'P',(1,1e20),self.chempots,1000)
+        with self.assertRaises(ValueError):
+            dt.solve_doping_target('conductivity',1e-11,'P',(1,1e20),self.chempots,1000)
+
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        dt = DefectThermodynamics(da,mdos,xtol=1e-10)
+        def get_reservoirs(partial_pressures):
+            return get_pressure_reservoirs_from_precursors({'SiO2':-23.69},-4.95,1000,partial_pressures=partial_pressures)
+        pressure, data = dt.solve_pO2_target('Vac_O',1e10,get_reservoirs)
+        self.assert_all_close(data.defect_concentrations.total['Vac_O'],1e10,rtol=1e-3)
+        assert list(data.metadata['chemical_potentials'].keys()) == ['O','Si']
+
+    def test_brouwer_approximation(self):
+        from defermi.chempots.oxygen import get_pressure_reservoirs_from_precursors
+        from defermi.engines import BrouwerApproximation
+        mdos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        reservoirs = get_pressure_reservoirs_from_precursors({'SiO2':-23.69},-4.95,1000,npoints=31)
+        approximation = BrouwerApproximation(da,mdos,1000,reservoirs)
+        data = approximation.get_thermodata(npoints=31)
+        reference = DefectThermodynamics(da,mdos,xtol=1e-10).get_pO2_thermodata(reservoirs)
+        self.assert_all_close(data.partial_pressures,reference.partial_pressures,rtol=1e-3)
+        self.assert_all_close(data.fermi_levels,reference.fermi_levels,atol=0.03)
+
+        regimes = data.metadata['regimes']
+        assert [(r['positive'],r['negative']) for r in regimes] == [('holes','electrons'),('holes','Int_O')]
+        self.assert_all_close(regimes[0]['pressure_range'][1],regimes[1]['pressure_range'][0])
+        self.assert_all_close(regimes[0]['fermi_level_slope'],0)
+        # holes balance Int_O(-2): [h] ~ pO2^(1/6)
+        self.assert_all_close(regimes[1]['exponents'][approximation.names.index('holes')],1/6,rtol=1e-3)
+
+        # starting guess for the charge neutrality solver
+        pressure = list(reservoirs.keys())[-10]
+        fermi_levels, _, _ = approximation.get_fermi_levels([pressure])
+        mu = reservoirs[pressure]
+        self.assert_all_close(da.solve_fermi_level(mu,mdos,1000,xtol=1e-10,fermi_level_guess=fermi_levels[0]),
+                              da.solve_fermi_level(mu,mdos,1000,xtol=1e-10))
+
+        with self.assertRaises(ValueError):
+            BrouwerApproximation(da,mdos,1000,{1:reservoirs[1e10]})
+
+    def test_multi_quenched_thermodata(self):
+        from defermi.chempots.oxygen import get_pressure_reservoirs_from_precursors
+        mdos = {'m_eff_e':0.5,'m_eff_h':0.4}
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        dt = DefectThermodynamics(da,mdos,xtol=1e-10)
+        reservoirs = get_pressure_reservoirs_from_precursors({'SiO2':-23.69},-4.95,1000,npoints=5)
+        conditions = [300,{'final_temperature':500,'quenched_species':['Vac_O'],'name':'Vac_O quenched'},
+                      {'final_temperature':300,'quench_elements':True}]
+        initial = dt.get_pO2_thermodata(reservoirs,temperature=1000)
+        for workers in (1,2):
+            results = dt.get_pO2_multi_quenched_thermodata(reservoirs,1000,conditions,initial_thermodata=initial,workers=workers)
+            assert [data.temperature for data in results] == [(1000,300),(1000,500),(1000,300)]
+            assert results[1].name == 'Vac_O quenched'
+            for data,kwargs in zip(results,([300],[500,['Vac_O']],[300,None,True])):
+                reference = dt.get_pO2_quenched_thermodata(reservoirs,1000,*kwargs)
+                self.assert_all_close(data.fermi_levels,reference.fermi_levels)
+                self.assert_all_close(data.carrier_concentrations,reference.carrier_concentrations)
+
+        single = dt.get_single_point_thermodata(reservoirs[1e10],1000)
+        quenched = dt.get_single_point_quenched_thermodata(reservoirs[1e10],1000,300,initial_thermodata=single)
+        self.assert_all_close(quenched.fermi_levels,results[0].fermi_levels[-1])
+        
+        with self.assertRaises(ValueError):
+            dt.get_pO2_multi_quenched_thermodata(reservoirs,1000,[{'quenched_species':['Vac_O']}])
+        with self.assertRaises(ValueError):
+            dt.get_pO2_multi_quenched_thermodata(reservoirs,1000,[300],initial_thermodata=initial.get_specific_pressures([1]))
+
+    def test_conductivity(self):
+        from defermi.thermodynamics import Conductivity
+        mobilities = {'electrons':100,'holes':50,'Vac_O':1e-3,'Int_O':1e-4}
+        conductivity = Conductivity(mobilities)
+        reservoirs = {p:self.chempots.copy() for p in (1e-10,1,1e10)}
+        dt = DefectThermodynamics(self.da,self.dos,engine='fast')
+        data = dt.get_pO2_thermodata(reservoirs,temperature=1000)
+        
+        sigma_el, sigma_ionic = conductivity.get_conductivity_contributions(data)
+        e = 1.60217662e-19
+        for i,(h,n) in enumerate(data.carrier_concentrations):
+            self.assert_all_close(sigma_el[i],e*(50*h + 100*n)*1e02)
+            ionic = sum(mobilities[d.name]*abs(d.charge)*d.conc for d in data.defect_concentrations[i] if d.name in mobilities)
+            self.assert_all_close(sigma_ionic[i],e*ionic*1e02)
+        self.assert_all_close(conductivity.get_conductivities_from_thermodata(data),sigma_el + sigma_ionic)
+        self.assert_all_close(conductivity.get_conductivity(data.carrier_concentrations[1],data.defect_concentrations[1]),
+                              sigma_el[1] + sigma_ionic[1])
+
+        # units: 1e16 cm^-3 electrons with 100 cm^2/(V*s) and 1e16 cm^-3 Vac_O(+2) with 1e-3 cm^2/(V*s)
+        sigma_el, sigma_ionic = conductivity.get_conductivity_arrays([0,1e16],[1e16],['Vac_O'],[2])
+        self.assert_all_close(sigma_el,16.0217662) # S/m
+        self.assert_all_close(sigma_ionic,2*16.0217662*1e-5) # S/m
+
+        # changes of the mobilities are applied to the compiled ionic weights
+        conductivity.mobilities = {'electrons':100,'holes':50}
+        self.assert_all_close(conductivity.get_conductivity_arrays([0,1e16],[1e16],['Vac_O'],[2])[1],0)
+        conductivity.mobilities = mobilities.copy()
+        conductivity.mobilities['Vac_O'] = 2e-3
+        self.assert_all_close(conductivity.get_conductivity_arrays([0,1e16],[1e16],['Vac_O'],[2])[1],4*16.0217662*1e-5)
+        conductivity.mobilities = mobilities
+
+        # map over temperature x partial pressure
+        data_300 = dt.get_pO2_thermodata(reservoirs,temperature=300)
+        sigma_el, sigma_ionic = conductivity.get_conductivity_contributions([data,data_300])
+        assert sigma_el.shape == sigma_ionic.shape == (2,3)
+        self.assert_all_close(sigma_ionic[1],conductivity.get_conductivity_contributions(data_300)[1])
+
+        da = self.da.filter_entries(elements=['P'],exclude=True)
+        data_no_P = DefectThermodynamics(da,self.dos,engine='fast').get_pO2_thermodata(reservoirs,temperature=1000)
+        with self.assertRaises(ValueError):
+            conductivity.get_conductivity_contributions([data,data_no_P])
@@ -10,12 +10,17 @@ from monty.json import MSONable
 from monty.json import jsanitize
 import numpy as np
 
-from .analysis import DefectConcentrations, SingleDefConc
+from .analysis import DefectConcentrations, SingleDefConc, get_concentrations_array
+from .chempots.reservoirs import Reservoirs
 from .defects import get_defect_from_string
+from .engines import check_engine
+from .instrumentation import collect_solver_stats, record_stats, stage_timer
 import copy
+import functools
 import os.path as op
 import json
 import os
+import time
 
 
 class Conductivity:
@@ -31,8 +36,67 @@ class Conductivity:
             Keys must contain "electrons", "holes" and the defect species names.
         """
         self.mobilities = mobilities
+        self._weights = {}
         
-        
+
+    def get_ionic_weights(self,names,charges):
+        """
+        Vector of mobility * |charge| of defect entries in cm^2/(V*s), zero for the species
+        not present in the mobility dict. Vectors are compiled once for each set of entries
+        and mobility values.
+
+        Parameters
+        ----------
+        names : list
+            Names of defect entries.
+        charges : list
+            Charges of defect entries.
+
+        Returns
+        -------
+        weights : numpy.ndarray
+            Array with shape (number of entries,).
+        """
+        mob = self.mobilities
+        key = (tuple(names),tuple(np.abs(charges)),tuple(mob.get(name,0) for name in names))
+        if key not in self._weights:
+            self._weights[key] = np.array(key[1],dtype=float) * np.array(key[2],dtype=float)
+        return self._weights[key]
+
+
+    def get_conductivity_arrays(self,carrier_concentrations,concentrations,names,charges):
+        """
+        Calculate electronic and ionic conductivities from arrays of concentrations, for a
+        single point, a sweep or a map (e.g. temperature x partial pressure).
+
+        Parameters
+        ----------
+        carrier_concentrations : array_like
+            Array with carrier concentrations (holes,electrons) in cm^-3 with shape (..., 2).
+        concentrations : array_like
+            Array with concentrations of defect entries in cm^-3 with shape (..., number of entries).
+        names : list
+            Names of defect entries.
+        charges : list
+            Charges of defect entries.
+
+        Returns
+        -------
+        sigma_electronic : numpy.ndarray
+            Electronic conductivity in S/m with shape (...).
+        sigma_ionic : numpy.ndarray
+            Ionic conductivity in S/m with shape (...).
+        """
+        e = 1.60217662e-19
+        mob = self.mobilities
+        cc = np.asarray(carrier_concentrations,dtype=float)
+        # conversion from S/cm to S/m
+        sigma_el = e * (mob['holes']*cc[...,0] + mob['electrons']*cc[...,1]) * 1e02
+        weights = self.get_ionic_weights(names,charges)
+        sigma_ionic = e * (np.asarray(concentrations,dtype=float) @ weights) * 1e02
+        return sigma_el, sigma_ionic
+
+
     def get_conductivity(self,carrier_concentrations,defect_concentrations):
         """
         Calculate conductivity from the concentrations of electrons, holes and defects and their mobilities.
@@ -50,19 +114,50 @@ class Conductivity:
             Conductivity in S/m.
 
         """
-        e = 1.60217662e-19
-        mob = self.mobilities
-        cc = carrier_concentrations
-        sigma_el = e * (mob['holes']*cc[0]+ mob['electrons']*cc[1])
         dc = defect_concentrations
-        sigma_ionic = 0
-        for d in dc:
-            dname = d['name']
-            if dname in mob.keys():
-                sigma_ionic += mob[dname] * d['conc'] * abs(d['charge']) * e
-        sigma = sigma_el + sigma_ionic * 1e02 # conversion from S/cm to S/m
+        sigma_el, sigma_ionic = self.get_conductivity_arrays(
+                                                carrier_concentrations=carrier_concentrations,
+                                                concentrations=[d['conc'] for d in dc],
+                                                names=[d['name'] for d in dc],
+                                                charges=[d['charge'] for d in dc])
+        sigma = sigma_el + sigma_ionic
         
-        return sigma
+        return float(sigma)
+
+
+    def get_conductivity_contributions(self,thermodata):
+        """
+        Calculate electronic and ionic conductivities from defect and carrier concentrations
+        in thermodynamic data. Only the defect species which are present in the mobility dict
+        contribute to the ionic conductivity.
+
+        Parameters
+        ----------
+        thermodata: ThermoData or list
+            ThermoData object of a sweep, or list of ThermoData objects computed with the same
+            defect entries and number of points (e.g. sweeps at different temperatures),
+            otherwise a ValueError is raised.
+
+        Returns
+        -------
+        sigma_electronic : numpy.ndarray
+            Electronic conductivity in S/m with shape (number of points,), or 
+            (number of ThermoData, number of points) for a list of ThermoData.
+        sigma_ionic : numpy.ndarray
+            Ionic conductivity in S/m, same shape of `sigma_electronic`.
+        """
+        if isinstance(thermodata,(list,tuple)):
+            arrays = [td.get_concentrations_array(output='all') for td in thermodata]
+            names, charges = arrays[0][0], arrays[0][1]
+            for a in arrays[1:]:
+                if a[0] != names or not np.array_equal(a[1],charges):
+                    raise ValueError('All ThermoData must contain the same defect entries in the same order')
+            concentrations = np.stack([a[2] for a in arrays])
+            carrier_concentrations = np.array([td.carrier_concentrations for td in thermodata],dtype=float)
+        else:
+            names, charges, concentrations = thermodata.get_concentrations_array(output='all')
+            carrier_concentrations = np.array(thermodata.carrier_concentrations,dtype=float)
+        return self.get_conductivity_arrays(carrier_concentrations,concentrations,names,charges)
 
 
     def get_conductivities_from_thermodata(self,thermodata):
@@ -70,6 +165,8 @@ class Conductivity:
         Calculate conductivities from defect and carrier concentrations in
         thermodynamic data. Only the defect species which are present in the
         mobility dict are considered for the calculation of the conductivity.
+        Use `get_conductivity_contributions` for separate electronic and ionic
+        conductivities.
 
         Parameters
         ----------
@@ -82,21 +179,37 @@ class Conductivity:
             List with conductivity values in S/m.
 
         """
-        conductivities = []
-        for i in range(0,len(thermodata.carrier_concentrations)):
-            carrier_concentrations = thermodata.carrier_concentrations[i]
-            dc = thermodata.defect_concentrations[i] 
-            defect_concentrations = []
-            for d in dc:
-                if d['name'] in self.mobilities.keys():
-                    defect_concentrations.append(d)
-            conductivity = self.get_conductivity(
-                                                carrier_concentrations=carrier_concentrations,
-                                                defect_concentrations=defect_concentrations)
-            conductivities.append(conductivity)
-        
-        return conductivities 
+        sigma_el, sigma_ionic = self.get_conductivity_contributions(thermodata)
+        return list(sigma_el + sigma_ionic)
+
+
 
+def _instrumented(method):
+    """
+    Collect SolverStats during `method` if instrumentation is active and store them
+    in the metadata of the output ThermoData.
+    """
+    @functools.wraps(method)
+    def wrapper(self,*args,**kwargs):
+        if not self.instrument:
+            return method(self,*args,**kwargs)
+        with collect_solver_stats() as stats:
+            t0 = time.perf_counter()
+            thermodata = method(self,*args,**kwargs)
+            stats.add_timing('total',time.perf_counter() - t0)
+        thermodata.metadata['solver_stats'] = stats.as_dict()
+        return thermodata
+    return wrapper
+
+
+def _run_collecting_stats(function,*args,**kwargs):
+    """
+    Run function (e.g. in a worker process) and return its output with the SolverStats 
+    collected during the call, as dict.
+    """
+    with collect_solver_stats() as stats:
+        output = function(*args,**kwargs)
+    return output, stats.as_dict()
 
 
 class DefectThermodynamics:
@@ -111,7 +224,9 @@ class DefectThermodynamics:
                 external_defects=[],
                 xtol=1e-05,
                 eform_kwargs={},
-                dconc_kwargs={}):
+                dconc_kwargs={},
+                instrument=False,
+                engine=None):
         """
         Parameters
         ----------
@@ -148,6 +263,14 @@ class DefectThermodynamics:
             Kwargs to pass to `entry.formation_energy`.
         dconc_kwargs : dict
             Kwargs to pass to `entry.defect_concentration`.
+        instrument : bool
+            Collect solver statistics (bisection iterations, charge evaluations, DOS integrations,
+            residual charge and timings of each stage) and store them in ThermoData.metadata['solver_stats'].
+            To collect the same statistics for any call use `instrumentation.collect_solver_stats`.
+        engine : str
+            Engine to solve charge neutrality and compute concentrations, "reference" or "fast"
+            (see `DefectsAnalysis`). If None the engine of `defects_analysis` is used.
+            Use `cross_check_engines` to compare the two engines on a sweep.
         """
         self.da = defects_analysis
         self.bulk_dos = bulk_dos
@@ -156,8 +279,96 @@ class DefectThermodynamics:
         self.xtol = xtol
         self.eform_kwargs = eform_kwargs
         self.dconc_kwargs = dconc_kwargs
+        self.instrument = instrument
+        self.engine = check_engine(engine) if engine else defects_analysis.engine
+
+
+    def cross_check_engines(self,
+                            reservoirs,
+                            temperature=None,
+                            npoints=5,
+                            final_temperature=None,
+                            quenched_species=None,
+                            quench_elements=False):
+        """
+        Run the "reference" and "fast" engines on points sampled from a sweep and
+        report the deviations in Fermi level and log-concentrations.
 
+        Parameters
+        ----------
+        reservoirs : dict, Reservoirs or PressureReservoirs
+            Object with partial pressure values (or labels) as keys and chempots dictionary as values.
+        temperature : float
+            Temperature in Kelvin (initial temperature if quenching). If None reservoirs.temperature is used.
+        npoints : int
+            Number of points sampled evenly from the reservoirs. If None all points are used.
+        final_temperature : float
+            If provided, the quenched calculation is checked (see `get_single_point_quenched_thermodata`).
+        quenched_species : list
+            List of defect species to quench. If None all defect species are quenched.
+        quench_elements : bool
+            Quench total concentrations of elements (see `get_single_point_quenched_thermodata`).
 
+        Returns
+        -------
+        deviations : dict
+            Dictionary with the following keys:
+
+            max_fermi_level_deviation : (float)
+                Max absolute deviation in Fermi level in eV.
+            max_log_concentration_deviation : (float)
+                Max absolute deviation in log10 of defect and carrier concentrations 
+                (concentrations below 1e-300 cm^-3 are clipped).
+            points : (list)
+                Keys of the sampled points and deviations for each of them.
+        """
+        T = temperature or getattr(reservoirs,'temperature',None)
+        if not T:
+            raise ValueError('Temperature needs to be provided or to be present ad attribute in PressureReservoirs object')
+        keys = list(reservoirs.keys())
+        if npoints and npoints < len(keys):
+            keys = [keys[int(i)] for i in np.linspace(0,len(keys)-1,num=npoints).round()]
+
+        thermodynamics = {}
+        for engine in ('reference','fast'):
+            thermodynamics[engine] = copy.copy(self)
+            thermodynamics[engine].engine = engine
+            thermodynamics[engine].instrument = False
+
+        def get_log_concentrations(single_thermodata):
+            concs = [c.conc for c in single_thermodata['defect_concentrations']]
+            concs += list(single_thermodata['carrier_concentrations'])
+            return np.log10(np.clip(concs,1e-300,None))
+
+        points = []
+        for key in keys:
+            results = {}
+            for engine, dt in thermodynamics.items():
+                if final_temperature:
+                    results[engine] = dt.get_single_point_quenched_thermodata(
+                                                            chemical_potentials=reservoirs[key],
+                                                            initial_temperature=T,
+                                                            final_temperature=final_temperature,
+                                                            quenched_species=quenched_species,
+                                                            quench_elements=quench_elements)
+                else:
+                    results[engine] = dt.get_single_point_thermodata(chemical_potentials=reservoirs[key],temperature=T)
+            ref, fast = results['reference'], results['fast']
+            points.append({
+                'key':key,
+                'fermi_level_deviation':abs(ref['fermi_levels'] - fast['fermi_levels']),
+                'log_concentration_deviation':float(np.max(np.abs(get_log_concentrations(ref) - get_log_concentrations(fast))))
+                })
+
+        deviations = {
+            'max_fermi_level_deviation':max([p['fermi_level_deviation'] for p in points]),
+            'max_log_concentration_deviation':max([p['log_concentration_deviation'] for p in points]),
+            'points':points
+            }
+        return deviations
+
+
+    @_instrumented
     def get_pO2_thermodata(
                         self,
                         reservoirs,
@@ -202,7 +413,7 @@ class DefectThermodynamics:
         carrier_concentrations = []
         fermi_levels=[]
 
-        for r,mu in res.items():
+        for r,mu in self._iter_chemical_potentials(res):
             single_thermodata = self.get_single_point_thermodata(
                                                             chemical_potentials=mu, 
                                                             temperature=T
@@ -223,6 +434,7 @@ class DefectThermodynamics:
         return thermodata
 
 
+    @_instrumented
     def get_pO2_quenched_thermodata(
                                 self,
                                 reservoirs,
@@ -273,18 +485,103 @@ class DefectThermodynamics:
         if hasattr(res,'temperature'):
             if res.temperature != initial_temperature:
                 warnings.warn('PressureReservoirs temperature is not set to the initial quenching temperature',UserWarning)
-        partial_pressures = list(res.keys())
+        initial_thermodata = self.get_pO2_thermodata(res,temperature=initial_temperature)
+        return self._get_pO2_quenched_from_initial(
+                                                res,
+                                                initial_thermodata=initial_thermodata,
+                                                initial_temperature=initial_temperature,
+                                                final_temperature=final_temperature,
+                                                quenched_species=quenched_species,
+                                                quench_elements=quench_elements,
+                                                name=name)
+
+
+    def get_pO2_multi_quenched_thermodata(
+                                    self,
+                                    reservoirs,
+                                    initial_temperature,
+                                    quench_conditions,
+                                    initial_thermodata=None,
+                                    workers=1):
+        """
+        Calculate quenched defect and carrier concentrations as a function of oxygen partial pressure
+        for several final temperatures and quench configurations. The equilibrium at initial temperature 
+        is solved only once (or taken from `initial_thermodata`) and shared by all quench conditions.
+
+        Parameters
+        ----------
+        reservoirs : dict, Reservoirs or PressureReservoirs
+            Object with partial pressure values as keys and chempots dictionary as values.
+        initial_temperature : float
+            Value of initial temperature in K.
+        quench_conditions : list
+            List of final temperatures in K, or of dictionaries with arguments of `get_pO2_quenched_thermodata`
+            ("final_temperature", and optionally "quenched_species", "quench_elements" and "name").
+        initial_thermodata : ThermoData
+            ThermoData at initial temperature computed on the same reservoirs (output of `get_pO2_thermodata`).
+            If None it is computed.
+        workers : int
+            Number of processes computing the quench conditions in parallel. 
+
+        Returns
+        -------
+        thermodata : list
+            List of ThermoData objects, same order of `quench_conditions` (see `get_pO2_quenched_thermodata`).
+        """
+        conditions = []
+        for condition in quench_conditions:
+            condition = condition.copy() if isinstance(condition,dict) else {'final_temperature':condition}
+            if 'final_temperature' not in condition:
+                raise ValueError('"final_temperature" needs to be provided in quench conditions')
+            conditions.append(condition)
+
+        res = reservoirs
+        if initial_thermodata is None:
+            initial_thermodata = self.get_pO2_thermodata(res,temperature=initial_temperature)
+        elif list(initial_thermodata['partial_pressures']) != list(res.keys()):
+            raise ValueError('Partial pressures of initial ThermoData do not match reservoirs')
+        
+        kwargs = {'initial_thermodata':initial_thermodata,'initial_temperature':initial_temperature}
+        if workers > 1 and len(conditions) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(workers,len(conditions))) as executor:
+                futures = [executor.submit(_run_collecting_stats,self._get_pO2_quenched_from_initial,res,**kwargs,**c)
+                           for c in conditions]
+                results = []
+                for future in futures:
+                    thermodata, stats = future.result()
+                    record_stats(stats) # solver statistics of the worker process
+                    results.append(thermodata)
+                return results
+        return [self._get_pO2_quenched_from_initial(res,**kwargs,**c) for c in conditions]
+
+
+    def _get_pO2_quenched_from_initial(
+                                    self,
+                                    reservoirs,
+                                    initial_thermodata,
+                                    initial_temperature,
+                                    final_temperature,
+                                    quenched_species=None,
+                                    quench_elements=False,
+                                    name=None):
+        """
+        Quenched ThermoData as a function of oxygen partial pressure from the ThermoData at initial temperature.
+        """
+        partial_pressures = list(reservoirs.keys())
         fermi_levels = []
         defect_concentrations = []
         carrier_concentrations = []
-                
-        for r,mu in res.items():
-            single_quenched_thermodata = self.get_single_point_quenched_thermodata(
+
+        for (r,mu),initial_concentrations in zip(self._iter_chemical_potentials(reservoirs),initial_thermodata['defect_concentrations']):
+            quenched_concentrations = self._get_quenched_concentrations(
+                                                            initial_concentrations,
+                                                            quenched_species=quenched_species,
+                                                            quench_elements=quench_elements)
+            single_quenched_thermodata = self.get_single_point_thermodata(
                                                         chemical_potentials=mu,
-                                                        initial_temperature=initial_temperature,
-                                                        final_temperature=final_temperature,
-                                                        quenched_species=quenched_species,
-                                                        quench_elements=quench_elements)
+                                                        temperature=final_temperature,
+                                                        fixed_concentrations=quenched_concentrations)
             
             carrier_concentrations.append(single_quenched_thermodata['carrier_concentrations'])
             defect_concentrations.append(single_quenched_thermodata['defect_concentrations'])
@@ -301,6 +598,132 @@ class DefectThermodynamics:
         return thermodata
 
 
+    @_instrumented
+    def get_pO2_adaptive_thermodata(
+                                self,
+                                get_reservoirs,
+                                pressure_range=(1e-20,1e10),
+                                temperature=None,
+                                npoints=9,
+                                max_npoints=100,
+                                fermi_level_tol=0.01,
+                                concentration_tol=0.05,
+                                quench_temperature=None,
+                                quenched_species=None,
+                                quench_elements=False,
+                                name=None):
+        """
+        Calculate defect and carrier concentrations as a function of the oxygen partial pressure on an
+        adaptive grid. The calculation starts from `npoints` uniformly spaced in log(pO2), then the
+        intervals where the Fermi level or the log-concentrations at the midpoint deviate from linear
+        interpolation by more than the tolerances are recursively bisected, until the tolerances are 
+        met or `max_npoints` are computed. Intervals with the largest deviation are refined first.
+        Regime boundaries are resolved with a fraction of the points of a uniform grid.
+
+        Parameters
+        ----------
+        get_reservoirs : function
+            Function that takes a list of partial pressures and returns the reservoirs (dict, Reservoirs
+            or PressureReservoirs) with those pressures as keys (e.g. `get_pressure_reservoirs_from_precursors`
+            with the `partial_pressures` argument).
+        pressure_range : tuple
+            Range of partial pressure in atm.
+        temperature : float
+            Temperature in Kelvin. If None the temperature of the reservoirs is used.
+        npoints : int
+            Number of points of the initial grid.
+        max_npoints : int
+            Maximum number of computed points.
+        fermi_level_tol : float
+            Tolerance on the Fermi level in eV.
+        concentration_tol : float
+            Tolerance on the log10 of defect and carrier concentrations.
+        quench_temperature : float
+            Value of quenching temperature in K. If provided `get_pO2_quenched_thermodata` is used, 
+            with `temperature` as initial temperature.
+        quenched_species : list
+            List of defect species to quench. If None all defect species are quenched.
+        quench_elements : bool
+            Quench total concentrations of elements instead of single defect species 
+            (see `get_pO2_quenched_thermodata`).
+        name : str
+            Name to assign to ThermoData.
+
+        Returns
+        -------
+        thermodata : ThermoData
+            ThermoData object with partial pressures sorted in ascending order (same data of
+            `get_pO2_thermodata`). The number of computed points is stored in 
+            `ThermoData.metadata['npoints']`.
+        """
+        if npoints < 2:
+            raise ValueError('At least 2 points are needed for the initial grid')
+
+        def compute(log_pressures):
+            reservoirs = get_reservoirs(list(10**np.array(log_pressures)))
+            if quench_temperature:
+                return self.get_pO2_quenched_thermodata(reservoirs=reservoirs,
+                                                        initial_temperature=temperature,
+                                                        final_temperature=quench_temperature,
+                                                        quenched_species=quenched_species,
+                                                        quench_elements=quench_elements)
+            return self.get_pO2_thermodata(reservoirs=reservoirs,temperature=temperature)
+
+        points = {} # log(pO2) : (partial pressure, defect concentrations, carrier concentrations, fermi level)
+        features = {} # log(pO2) : Fermi level and log-concentrations scaled by tolerances
+        def add_points(log_pressures):
+            thermodata = compute(log_pressures)
+            for i,logp in enumerate(log_pressures):
+                dc = thermodata['defect_concentrations'][i]
+                carriers = thermodata['carrier_concentrations'][i]
+                fermi_level = thermodata['fermi_levels'][i]
+                points[logp] = (thermodata['partial_pressures'][i],dc,carriers,fermi_level)
+                log_concs = np.log10(np.maximum([c.conc for c in dc] + list(carriers),1e-300))
+                features[logp] = np.concatenate(([fermi_level / fermi_level_tol],log_concs / concentration_tol))
+            return
+
+        log_pressures = list(np.linspace(np.log10(pressure_range[0]),np.log10(pressure_range[1]),num=npoints))
+        add_points(log_pressures)
+        candidates = [(np.inf,a,b) for a,b in zip(log_pressures[:-1],log_pressures[1:])]
+        while candidates and len(points) < max_npoints:
+            candidates.sort(key=lambda c: c[0],reverse=True)
+            batch = candidates[:max_npoints-len(points)]
+            midpoints = [(a+b)/2 for _,a,b in batch]
+            add_points(midpoints)
+            candidates = []
+            for (_,a,b),m in zip(batch,midpoints):
+                deviation = np.max(np.abs(features[m] - (features[a] + features[b])/2))
+                if deviation > 1 and b - a > 1e-3: # below 1e-3 pressure keys are not distinguishable
+                    candidates += [(deviation,a,m),(deviation,m,b)]
+
+        log_pressures = sorted(points)
+        thermodata = {}
+        thermodata['partial_pressures'] = [points[logp][0] for logp in log_pressures]
+        thermodata['defect_concentrations'] = [points[logp][1] for logp in log_pressures]
+        thermodata['carrier_concentrations'] = [points[logp][2] for logp in log_pressures]
+        thermodata['fermi_levels'] = [points[logp][3] for logp in log_pressures]
+        T = (temperature,quench_temperature) if quench_temperature else temperature
+        thermodata = ThermoData(thermodata,temperature=T,name=name,metadata={'npoints':len(log_pressures)})
+        
+        return thermodata
+
+
+    def _iter_chemical_potentials(self,reservoirs):
+        """
+        Iterate over (key,chemical_potentials) of reservoirs. With the "fast" engine, array-backed 
+        Reservoirs (see `Reservoirs.from_array`) are passed to the solver as rows of the chempot 
+        matrix, ordered as the elements of the DefectsAnalysis, without building dictionaries.
+        """
+        if isinstance(reservoirs,Reservoirs) and reservoirs.is_array_backed and self.da._use_fast_engine(self.engine):
+            array = reservoirs.get_array(elements=self.da.elements)
+            if np.isnan(array).any():
+                missing = [el for j,el in enumerate(self.da.elements) if np.isnan(array[:,j]).any()]
+                raise ValueError(f'Chemical potentials of {", ".join(missing)} are missing in reservoirs')
+            return zip(reservoirs.keys(),array)
+        return reservoirs.items()
+
+
+    @_instrumented
     def get_single_point_thermodata(self,
                                     chemical_potentials,
                                     temperature,
@@ -352,28 +775,32 @@ class DefectThermodynamics:
         eform_kwargs = eform_kwargs if eform_kwargs is not None else self.eform_kwargs
         dconc_kwargs = dconc_kwargs if dconc_kwargs is not None else self.dconc_kwargs
 
-        fermi_level = self.da.solve_fermi_level(
-                                                chemical_potentials=chemical_potentials,
-                                                bulk_dos=dos,
-                                                temperature=temperature,
-                                                fixed_concentrations=fixed_df,
-                                                external_defects=ext_df,
-                                                xtol=self.xtol,
-                                                eform_kwargs=eform_kwargs,
-                                                dconc_kwargs=dconc_kwargs)
-        
-        carrier_concentrations = self.da.carrier_concentrations(
-                                                            bulk_dos=dos,
-                                                            temperature=temperature,
-                                                            fermi_level=fermi_level)
+        with stage_timer('solve'):
+            fermi_level = self.da.solve_fermi_level(
+                                                    chemical_potentials=chemical_potentials,
+                                                    bulk_dos=dos,
+                                                    temperature=temperature,
+                                                    fixed_concentrations=fixed_df,
+                                                    external_defects=ext_df,
+                                                    xtol=self.xtol,
+                                                    eform_kwargs=eform_kwargs,
+                                                    dconc_kwargs=dconc_kwargs,
+                                                    engine=self.engine)
         
-        defect_concentrations = self.da.defect_concentrations(
-                                                            chemical_potentials=chemical_potentials,
-                                                            temperature=temperature,
-                                                            fermi_level=fermi_level,
-                                                            fixed_concentrations=fixed_df,
-                                                            eform_kwargs=eform_kwargs,
-                                                            **dconc_kwargs)
+        with stage_timer('concentrations'):
+            carrier_concentrations = self.da.carrier_concentrations(
+                                                                bulk_dos=dos,
+                                                                temperature=temperature,
+                                                                fermi_level=fermi_level)
+            
+            defect_concentrations = self.da.defect_concentrations(
+                                                                chemical_potentials=chemical_potentials,
+                                                                temperature=temperature,
+                                                                fermi_level=fermi_level,
+                                                                fixed_concentrations=fixed_df,
+                                                                eform_kwargs=eform_kwargs,
+                                                                engine=self.engine,
+                                                                **dconc_kwargs)
         if ext_df:
             for df in ext_df:         
                 defect_concentrations.append(df)
@@ -385,6 +812,7 @@ class DefectThermodynamics:
         return ThermoData(thermodata,temperature=temperature,name=name)
     
 
+    @_instrumented
     def get_single_point_quenched_thermodata(
                                             self,
                                             chemical_potentials,
@@ -394,7 +822,8 @@ class DefectThermodynamics:
                                             quench_elements=False,
                                             fixed_concentrations=None,
                                             external_defects=None,
-                                            name=None):
+                                            name=None,
+                                            initial_thermodata=None):
         """
         Compute carrier concentrations, defect concentrations and Fermi level for 
         a single set of chemical potentials.
@@ -422,6 +851,9 @@ class DefectThermodynamics:
             or a list of SingleDefConc objects. 
         name : str
             Label for ThermoData.
+        initial_thermodata : ThermoData
+            ThermoData at initial temperature (output of `get_single_point_thermodata`). If provided 
+            the equilibrium at initial temperature is not solved again.
 
         Returns
         -------
@@ -439,17 +871,39 @@ class DefectThermodynamics:
         fixed_df = fixed_concentrations or self.fixed_concentrations
         ext_df = external_defects or self.external_defects
         
-        single_thermodata = self.get_single_point_thermodata(
+        if initial_thermodata is None:
+            initial_thermodata = self.get_single_point_thermodata(
+                                                        chemical_potentials=chemical_potentials,
+                                                        temperature=initial_temperature,
+                                                        fixed_concentrations=fixed_df,
+                                                        external_defects=ext_df
+                                                        )
+
+        quenched_concentrations = self._get_quenched_concentrations(
+                                                        initial_thermodata['defect_concentrations'],
+                                                        quenched_species=quenched_species,
+                                                        quench_elements=quench_elements,
+                                                        fixed_concentrations=fixed_df)
+        
+        single_quenched_thermodata = self.get_single_point_thermodata(
                                                     chemical_potentials=chemical_potentials,
-                                                    temperature=initial_temperature,
-                                                    fixed_concentrations=fixed_df,
+                                                    temperature=final_temperature,
+                                                    fixed_concentrations=quenched_concentrations,
                                                     external_defects=ext_df
-                                                    )
+                                                    )    
+            
+        return single_quenched_thermodata
 
+
+    def _get_quenched_concentrations(self,defect_concentrations,quenched_species=None,quench_elements=False,fixed_concentrations=None):
+        """
+        Fixed concentrations at final temperature from DefectConcentrations at initial temperature.
+        """
+        fixed_df = fixed_concentrations or self.fixed_concentrations
         if quench_elements:
-            c1 = single_thermodata['defect_concentrations'].elemental
+            c1 = defect_concentrations.elemental
         else:
-            c1 = single_thermodata['defect_concentrations'].total
+            c1 = defect_concentrations.total
 
         if quenched_species is None:
             quenched_concentrations = c1.copy()
@@ -460,15 +914,7 @@ class DefectThermodynamics:
                 quenched_concentrations = {}
             for k in quenched_species:
                 quenched_concentrations[k] = c1[k]
-        
-        single_quenched_thermodata = self.get_single_point_thermodata(
-                                                    chemical_potentials=chemical_potentials,
-                                                    temperature=final_temperature,
-                                                    fixed_concentrations=quenched_concentrations,
-                                                    external_defects=ext_df
-                                                    )    
-            
-        return single_quenched_thermodata
+        return quenched_concentrations
 
 
     def _update_variable_species_concentration(self,variable_defect_specie, c, fixed_df, ext_df):
@@ -510,6 +956,7 @@ class DefectThermodynamics:
             raise ValueError('Variable species has to be either a string (if present in DefectsAnalysis) or dict (if not present in DefectsAnalysis)')
 
                  
+    @_instrumented
     def get_variable_species_thermodata(
                                         self,
                                         variable_defect_specie,
@@ -601,6 +1048,7 @@ class DefectThermodynamics:
         return thermodata
 
 
+    @_instrumented
     def get_variable_species_quenched_thermodata(
                                                 self,
                                                 variable_defect_specie,
@@ -707,12 +1155,195 @@ class DefectThermodynamics:
         return thermodata
 
 
+    def solve_doping_target(
+                        self,
+                        target,
+                        value,
+                        variable_defect_specie,
+                        concentration_range,
+                        chemical_potentials,
+                        temperature,
+                        external_defects=[],
+                        conductivity=None,
+                        rtol=1e-04,
+                        maxiter=50,
+                        name=None):
+        """
+        Find the concentration of the variable defect species (usually a dopant) that gives a target
+        value of an observable, by root finding on log(concentration) over nested charge neutrality 
+        solutions. Typically about 10 solves are needed instead of a dense sweep with 
+        `get_variable_species_thermodata`. If the observable is not monotonic in the concentration
+        range one of the solutions is returned.
+
+        Parameters
+        ----------
+        target : str
+            Target observable: "electrons" or "holes" (carrier densities in cm^-3), "fermi_level" (eV),
+            "conductivity" (S/m, requires `conductivity`) or the name of a defect species 
+            (total concentration in cm^-3).
+        value : float
+            Target value of the observable.
+        variable_defect_specie : str or dict
+            Variable species (see `get_variable_species_thermodata`).
+        concentration_range : tuple or list
+            Range of the concentration of the variable species in cm^-3 in which the solution is searched.
+        chemical_potentials : dict or Chempots
+            Chempots object containing chemical potentials.
+        temperature : float
+            Temperature in K.
+        external_defects : list
+            List of external defect concentrations (not present in defect entries).
+        conductivity : Conductivity
+            Conductivity object, needed if `target` is "conductivity".
+        rtol : float
+            Relative tolerance on the concentration.
+        maxiter : int
+            Maximum number of iterations of the root finding.
+        name : str
+            Label for ThermoData.
+
+        Returns
+        -------
+        concentration : float
+            Concentration of the variable species in cm^-3.
+        thermodata : ThermoData
+            ThermoData of the solution (same format of `get_single_point_thermodata`). The number
+            of charge neutrality solves is stored in `ThermoData.metadata['nsolves']`.
+        """
+        fixed_df = self.fixed_concentrations.copy() if self.fixed_concentrations else {}
+        ext_df = external_defects or self.external_defects
+        if ext_df and type(ext_df) != DefectConcentrations:                
+            ext_df = DefectConcentrations(ext_df)
+
+        def compute(log_concentration):
+            fixed, ext, _ = self._update_variable_species_concentration(
+                                                    variable_defect_specie,10**log_concentration,fixed_df.copy(),ext_df)
+            return self.get_single_point_thermodata(
+                                            chemical_potentials=chemical_potentials,
+                                            temperature=temperature,
+                                            fixed_concentrations=fixed,
+                                            external_defects=ext,
+                                            name=name)
+
+        log_concentration, thermodata = self._solve_target(compute,np.log10(concentration_range),target,value,
+                                                           conductivity,rtol,maxiter)
+        return 10**log_concentration, thermodata
+
+
+    def solve_pO2_target(
+                    self,
+                    target,
+                    value,
+                    get_reservoirs,
+                    pressure_range=(1e-20,1e10),
+                    temperature=None,
+                    conductivity=None,
+                    rtol=1e-04,
+                    maxiter=50,
+                    name=None):
+        """
+        Find the oxygen partial pressure (and the corresponding chemical potentials) that gives a 
+        target value of an observable, by root finding on log(pO2) over nested charge neutrality 
+        solutions (see `solve_doping_target`).
+
+        Parameters
+        ----------
+        target : str
+            Target observable: "electrons", "holes", "fermi_level", "conductivity" (requires 
+            `conductivity`) or the name of a defect species.
+        value : float
+            Target value of the observable.
+        get_reservoirs : function
+            Function that takes a list of partial pressures and returns the reservoirs with those
+            pressures as keys (see `get_pO2_adaptive_thermodata`).
+        pressure_range : tuple
+            Range of partial pressure in atm in which the solution is searched.
+        temperature : float
+            Temperature in K. If None the temperature of the reservoirs is used.
+        conductivity : Conductivity
+            Conductivity object, needed if `target` is "conductivity".
+        rtol : float
+            Relative tolerance on the partial pressure.
+        maxiter : int
+            Maximum number of iterations of the root finding.
+        name : str
+            Label for ThermoData.
+
+        Returns
+        -------
+        partial_pressure : float
+            Oxygen partial pressure in atm.
+        thermodata : ThermoData
+            ThermoData of the solution (same format of `get_single_point_thermodata`). The chemical
+            potentials are stored in `ThermoData.metadata['chemical_potentials']` and the number of 
+            charge neutrality solves in `ThermoData.metadata['nsolves']`.
+        """
+        def compute(log_pressure):
+            reservoirs = get_reservoirs([10**log_pressure])
+            T = temperature or reservoirs.temperature
+            chemical_potentials = list(reservoirs.values())[0]
+            thermodata = self.get_single_point_thermodata(chemical_potentials=chemical_potentials,temperature=T,name=name)
+            thermodata.metadata['chemical_potentials'] = dict(chemical_potentials)
+            return thermodata
+
+        log_pressure, thermodata = self._solve_target(compute,np.log10(pressure_range),target,value,
+                                                      conductivity,rtol,maxiter)
+        return 10**log_pressure, thermodata
+
+
+    def _solve_target(self,compute,xlim,target,value,conductivity,rtol,maxiter):
+        """
+        Find x in `xlim` such that the observable `target` of `compute(x)` (ThermoData) is equal to `value`.
+        """
+        from scipy.optimize import brentq
+
+        if target == 'conductivity' and conductivity is None:
+            raise ValueError('Conductivity object needs to be provided for target "conductivity"')
+        logscale = target != 'fermi_level'
+        if logscale and value <= 0:
+            raise ValueError(f'Target value of {target} must be positive')
+        goal = np.log10(value) if logscale else value
+        solutions = {}
+
+        def get_observable(thermodata):
+            if target == 'fermi_level':
+                return thermodata['fermi_levels']
+            elif target == 'holes':
+                observable = thermodata['carrier_concentrations'][0]
+            elif target == 'electrons':
+                observable = thermodata['carrier_concentrations'][1]
+            elif target == 'conductivity':
+                observable = conductivity.get_conductivity(thermodata['carrier_concentrations'],thermodata['defect_concentrations'])
+            elif target in thermodata['defect_concentrations'].names:
+                observable = thermodata['defect_concentrations'].total[target]
+            else:
+                raise ValueError(f'Target "{target}" is not "electrons", "holes", "fermi_level", "conductivity" or a defect species name')
+            return np.log10(max(observable,1e-300))
+
+        def residual(x):
+            solutions[x] = compute(x)
+            return get_observable(solutions[x]) - goal
+        
+        r0, r1 = residual(xlim[0]), residual(xlim[1])
+        if r0 * r1 > 0:
+            bounds = [get_observable(solutions[x]) for x in xlim]
+            bounds = [10**b for b in bounds] if logscale else bounds
+            raise ValueError(f'Target {target} = {value:.3g} is outside of the values in range ({bounds[0]:.3g}, {bounds[1]:.3g})')
+        if r0 == 0 or r1 == 0:
+            x = xlim[0] if r0 == 0 else xlim[1]
+        else:
+            x = brentq(residual,xlim[0],xlim[1],xtol=rtol/np.log(10),maxiter=maxiter) # relative tolerance on 10**x
+        thermodata = solutions[x] if x in solutions else compute(x)
+        thermodata.metadata['nsolves'] = len(solutions) + (x not in solutions)
+        return x, thermodata
+
+
 
 class ThermoData(MSONable):
     
     "Class to handle defect thermodynamics data"
     
-    def __init__(self,thermodata,temperature=None,name=None):
+    def __init__(self,thermodata,temperature=None,name=None,metadata=None):
         """
         Class that handles dict of defect thermodynamics data.
         
@@ -744,10 +1375,13 @@ class ThermoData(MSONable):
             Temperature in K at which the data is computed.
         name : str
             Name to assign to ThermoData.
+        metadata : dict
+            Additional information on the calculation (e.g. "solver_stats").
         """
         self.data = thermodata  
         self.temperature = temperature if temperature else None
         self.name = name if name else None
+        self.metadata = metadata if metadata else {}
         for k,v in thermodata.items():
             setattr(self, k, v)
         
@@ -777,7 +1411,8 @@ class ThermoData(MSONable):
               "@class": self.__class__.__name__,
               "thermodata":self.data.copy(),    
               "temperature": self.temperature,
-              "name": self.name
+              "name": self.name,
+              "metadata": self.metadata
               }
         if 'defect_concentrations' in self.data.keys():
             d['thermodata']['defect_concentrations'] = [dc.as_dict() for dc in self.defect_concentrations]
@@ -828,11 +1463,13 @@ class ThermoData(MSONable):
                 data['defect_concentrations'] = [DefectConcentrations.from_dict(dc) for dc in data['defect_concentrations']]
             temperature = d['temperature']
             name = d['name']
+            metadata = d.get('metadata')
         else:
             data = d # recover old 
             temperature = None
             name = None
-        return cls(data,temperature,name)
+            metadata = None
+        return cls(data,temperature,name,metadata)
      
          
     @staticmethod
@@ -857,6 +1494,30 @@ class ThermoData(MSONable):
         else:
             d = json.loads(path_or_string)
         return ThermoData.from_dict(d)
+
+
+    def get_concentrations_array(self,output='total',**kwargs):
+        """
+        Get defect concentrations as a single array with shape (number of points, number of series).
+        See `defermi.analysis.get_concentrations_array`.
+
+        Parameters
+        ----------
+        output : str
+            Type of output for defect concentrations ("all", "stable" or "total").
+        kwargs : dict
+            Kwargs to pass to `DefectConcentrations.filter_concentrations(**kwargs)`.
+
+        Returns
+        -------
+        names : list
+            Names of the series.
+        charges : numpy.ndarray
+            Charges of the series (None for "total").
+        concentrations : numpy.ndarray
+            Concentrations with shape (number of points, number of series).
+        """
+        return get_concentrations_array(self.defect_concentrations,output=output,**kwargs)
             
     
     def get_specific_pressures(self,p_values):
@@ -1,15 +1,31 @@
 #!/usr/bin/env python
 
+import copy
+import os
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
+from .mp_cache import MPCache
 
+# results of the queries shared by all MPDatabase objects in the session
+_session_store = {}
+_session_lock = threading.Lock()
+
+
+def clear_session_store():
+    """
+    Clear the in-memory store of Materials Project results shared in the session.
+    """
+    with _session_lock:
+        _session_store.clear()
 
 
 class  MPDatabase:
     
     from mp_api.client import MPRester # only import within this class
 
-    def __init__(self,mp_id=None,API_KEY=None):
+    def __init__(self,mp_id=None,API_KEY=None,cache=None,offline=None,mp_rester=None):
         """
         Class to retrieve data from Materials Project database
 
@@ -20,14 +36,155 @@ class  MPDatabase:
         API_KEY : str
             API_KEY for MAterials Project database. If None the default key from
             the configuration file for `pymatgen` is used.
+        cache : MPCache, str or bool
+            Persistent cache of the queries (see `MPCache`). Can be a MPCache object, the path 
+            to the cache directory or True for the default directory. If None the cache is used 
+            only if the environment variable "DEFERMI_MP_CACHE" is set.
+        offline : bool
+            Serve results only from the cache, without connecting to the database. Queries that
+            are not cached raise a ValueError. If None it is set from the environment variable
+            "DEFERMI_MP_OFFLINE" ("1" or "true").
+        mp_rester : class
+            Class used for the requests, called as `mp_rester(API_KEY)` and used as context manager.
+            If None `mp_api.client.MPRester` is used. Useful to work with a local stand-in of the database.
+
+        All results are also kept in an in-memory store shared by all MPDatabase objects in 
+        the session (see `clear_session_store`). Use `prefetch` to retrieve in batch the data 
+        needed by a workflow.
         """
         
         self.mp_id = mp_id if mp_id else None
         self.API_KEY = API_KEY
+        if offline is None:
+            offline = os.environ.get('DEFERMI_MP_OFFLINE','').lower() in ('1','true','yes')
+        if cache is None and (offline or 'DEFERMI_MP_CACHE' in os.environ):
+            cache = True
+        if cache is True:
+            cache = MPCache()
+        elif type(cache) == str:
+            cache = MPCache(cache)
+        self.cache = cache or None
+        self.offline = offline
+        self._mp_rester = mp_rester
     
     @property
     def mp_rester(self):
-        return self.MPRester(self.API_KEY)
+        return self._get_rester()
+
+    def _get_rester(self):
+        rester = self._mp_rester or self.MPRester
+        return rester(self.API_KEY)
+
+
+    def _query(self,query,fetch_function,**params):
+        """
+        Get result of a query from the session store or the cache, otherwise fetch it 
+        with `fetch_function(**params)` and store it. A deep copy of the stored result is 
+        returned, so that changes of the result (e.g. compatibility processing) do not affect
+        later queries.
+        """
+        key = MPCache.get_key(query,**params)
+        result = self._get_stored(key)
+        if result is None:
+            if self.offline:
+                raise ValueError(f'Query "{query}" with parameters {params} not found in the cache (offline mode)')
+            result = fetch_function(**params)
+            self._store(key,result)
+        return copy.deepcopy(result)
+
+
+    def _get_session_key(self,key):
+        # results of different databases (API key or rester) are stored separately in the session
+        return (self._mp_rester or self.MPRester, self.API_KEY, key)
+
+
+    def _get_stored(self,key):
+        session_key = self._get_session_key(key)
+        if session_key in _session_store:
+            return _session_store[session_key]
+        if self.offline and not self.cache:
+            raise ValueError('Offline mode requires a cache')
+        result = self.cache.get(key) if self.cache else None
+        if result is not None:
+            with _session_lock:
+                _session_store[session_key] = result
+        return result
+
+
+    def _store(self,key,result):
+        with _session_lock:
+            _session_store[self._get_session_key(key)] = result
+        if self.cache:
+            self.cache.set(key,result)
+
+
+    def prefetch(self,
+                chemsys=None,
+                stable_compositions=None,
+                entries_compositions=None,
+                thermo_type='GGA_GGA+U',
+                max_workers=4):
+        """
+        Retrieve in batch the data needed by a workflow and keep it in the session store 
+        (and in the cache), so that later calls of `get_phase_diagram_from_chemsys`, 
+        `get_stable_energy_pfu_from_composition` and `get_entries` do not send requests.
+        Queries are deduplicated and results already stored are skipped. Energies of stable 
+        phases and entries are retrieved with a single request each, phase diagrams 
+        (one request per chemical system) are retrieved in parallel.
+
+        Parameters
+        ----------
+        chemsys : list
+            Chemical systems (e.g. "Li-Nb-O") or compositions (the chemical system of
+            the composition is used) for `get_phase_diagram_from_chemsys`.
+        stable_compositions : list
+            Compositions for `get_stable_energy_pfu_from_composition`.
+        entries_compositions : list
+            Compositions for `get_entries` (default arguments).
+        thermo_type : str
+            Thermo type for phase diagrams and energies.
+        max_workers : int
+            Max number of requests sent at the same time.
+
+        Returns
+        -------
+        nrequests : int
+            Number of requests sent.
+        """
+        from pymatgen.core.composition import Composition
+
+        def get_chemsys(string):
+            elements = string.split('-') if '-' in string else [el.symbol for el in Composition(string).elements]
+            return '-'.join(sorted(elements))
+
+        chemsys = list(dict.fromkeys(get_chemsys(c) for c in chemsys or []))
+        chemsys = [c for c in chemsys if self._get_stored(
+                        MPCache.get_key('get_phase_diagram_from_chemsys',chemsys=c,thermo_type=thermo_type)) is None]
+        stable_compositions = [c for c in dict.fromkeys(stable_compositions or []) if self._get_stored(
+                        MPCache.get_key('get_stable_energy_pfu_from_composition',formula=c,thermo_types=[thermo_type])) is None]
+        entries_compositions = [c for c in dict.fromkeys(entries_compositions or []) if self._get_stored(
+                        self._get_entries_key(c)) is None]
+        if self.offline and (chemsys or stable_compositions or entries_compositions):
+            raise ValueError('Data missing from the cache cannot be retrieved in offline mode')
+
+        tasks = [(self.get_phase_diagram_from_chemsys,(c,thermo_type)) for c in chemsys]
+        if stable_compositions:
+            tasks.append((self.get_stable_energies_pfu_from_compositions,(stable_compositions,[thermo_type])))
+        if entries_compositions:
+            tasks.append((self.get_entries_from_compositions,(entries_compositions,)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(function,*args) for function,args in tasks]
+            for future in futures:
+                future.result()
+        return len(tasks)
+
+
+    def _get_entries_key(self,chemsys_formula_mpids,compatible_only=True,property_data=None,conventional_unit_cell=False):
+        return MPCache.get_key('get_entries',
+                            chemsys_formula_mpids=chemsys_formula_mpids,
+                            compatible_only=compatible_only,
+                            property_data=property_data,
+                            conventional_unit_cell=conventional_unit_cell)
         
         
     def get_entries(self,
@@ -65,12 +222,15 @@ class  MPDatabase:
             List of ComputedStructureEntry objects.
 
         """
-        with self.MPRester(self.API_KEY) as mpr:
-            entries = mpr.get_entries(
-                                chemsys_formula_mpids=chemsys_formula_mpids,
-                                compatible_only=compatible_only,
-                                property_data=property_data,
-                                conventional_unit_cell=conventional_unit_cell)
+        def fetch(**kwargs):
+            with self._get_rester() as mpr:
+                return mpr.get_entries(**kwargs)
+
+        entries = self._query('get_entries',fetch,
+                            chemsys_formula_mpids=chemsys_formula_mpids,
+                            compatible_only=compatible_only,
+                            property_data=property_data,
+                            conventional_unit_cell=conventional_unit_cell)
         return entries
     
     
@@ -101,19 +261,32 @@ class  MPDatabase:
         conventional_unit_cell : bool
             Whether to get the standard conventional unit cell.
 
+        Compositions that are not already stored are retrieved with a single request.
+
         Returns
         -------
         entries : list
             List of ComputedStructureEntry objects.
 
         """
+        from pymatgen.core.composition import Composition
+
+        kwargs = {
+            'compatible_only':compatible_only,
+            'property_data':property_data,
+            'conventional_unit_cell':conventional_unit_cell}
+        missing = [comp for comp in dict.fromkeys(compositions) if self._get_stored(self._get_entries_key(comp,**kwargs)) is None]
+        if missing and not self.offline:
+            with self._get_rester() as mpr:
+                entries = mpr.get_entries(chemsys_formula_mpids=missing,**kwargs)
+            for comp in missing:
+                reduced_formula = Composition(comp).reduced_formula
+                self._store(self._get_entries_key(comp,**kwargs),
+                            [e for e in entries if e.composition.reduced_formula == reduced_formula])
+
         entries_dict = {}
         for comp in compositions:
-            entries = self.get_entries(
-                                    chemsys_formula_mpids=comp,
-                                    compatible_only=compatible_only,
-                                    property_data=property_data,
-                                    conventional_unit_cell=conventional_unit_cell)
+            entries = self.get_entries(chemsys_formula_mpids=comp,**kwargs)
             entries_dict[comp] = entries
         
         return entries_dict
@@ -138,11 +311,12 @@ class  MPDatabase:
         pd : PhaseDiagram
             `PhaseDiagram` object.
         """
-        with self.MPRester(self.API_KEY) as mpr:
-            pd = mpr.materials.thermo.get_phase_diagram_from_chemsys(
-                                                                chemsys=chemsys,
-                                                                thermo_type=thermo_type,
-                                                                **kwargs)
+        def fetch(**kwargs):
+            with self._get_rester() as mpr:
+                return mpr.materials.thermo.get_phase_diagram_from_chemsys(**kwargs)
+
+        chemsys = '-'.join(sorted(chemsys.split('-')))
+        pd = self._query('get_phase_diagram_from_chemsys',fetch,chemsys=chemsys,thermo_type=thermo_type,**kwargs)
         return pd
         
 
@@ -167,16 +341,66 @@ class  MPDatabase:
             Energy per formula unit in eV.
 
         """
-        with self.MPRester(self.API_KEY) as mpr:
-            docs = mpr.materials.thermo.search(formula=composition,energy_above_hull=(0,0),thermo_types=thermo_types,**kwargs)
-        
-        if len(docs) > 1:
+        def fetch(**kwargs):
+            with self._get_rester() as mpr:
+                docs = mpr.materials.thermo.search(energy_above_hull=(0,0),**kwargs)
+            energies_pfu = []
+            for entry in docs:
+                nfu = entry.composition.get_reduced_composition_and_factor()[1]
+                energies_pfu.append(entry.energy_per_atom * (entry.composition.num_atoms/nfu))
+            return energies_pfu
+
+        energies_pfu = self._query('get_stable_energy_pfu_from_composition',fetch,
+                                   formula=composition,thermo_types=thermo_types,**kwargs)
+        if len(energies_pfu) > 1:
             warnings.warn('Search returned more than one entry with E above hull = 0 eV, check manually. Returning the first entry...')
         
-        entry = docs[0]
-        nfu = entry.composition.get_reduced_composition_and_factor()[1]
-        energy_pfu = entry.energy_per_atom * (entry.composition.num_atoms/nfu)
+        energy_pfu = energies_pfu[0]
         return energy_pfu
+
+
+    def get_stable_energies_pfu_from_compositions(self,compositions,thermo_types=['GGA_GGA+U'],**kwargs):
+        """
+        Pull from MP database the energies per formula unit (pfu) in eV of the entries 
+        with E above Convex Hull = 0 eV for a list of compositions. Compositions that are
+        not already stored are retrieved with a single request.
+
+        Parameters
+        ----------
+        compositions : list
+            Target compositions (eg. ["SrO","TiO2"]).
+        thermo_type : str
+            Thermo types to return data for (e.g. "GGA_GGA+U").
+            Check `mp_api` docs for information on thermo types.
+        kwargs : dict
+            Kwargs to pass to `MPRester().materials.thermo.search`.
+
+        Returns
+        -------
+        energies_pfu : dict
+            Dictionary with compositions as keys and energies per formula unit in eV as values.
+        """
+        from pymatgen.core.composition import Composition
+
+        def get_key(comp):
+            return MPCache.get_key('get_stable_energy_pfu_from_composition',formula=comp,thermo_types=thermo_types,**kwargs)
+
+        missing = [comp for comp in dict.fromkeys(compositions) if self._get_stored(get_key(comp)) is None]
+        if missing and not self.offline:
+            with self._get_rester() as mpr:
+                docs = mpr.materials.thermo.search(formula=missing,energy_above_hull=(0,0),thermo_types=thermo_types,**kwargs)
+            for comp in missing:
+                reduced_formula = Composition(comp).reduced_formula
+                energies_pfu = []
+                for entry in docs:
+                    if entry.composition.reduced_formula == reduced_formula:
+                        nfu = entry.composition.get_reduced_composition_and_factor()[1]
+                        energies_pfu.append(entry.energy_per_atom * (entry.composition.num_atoms/nfu))
+                if energies_pfu:
+                    self._store(get_key(comp),energies_pfu)
+        
+        return {comp:self.get_stable_energy_pfu_from_composition(comp,thermo_types=thermo_types,**kwargs) 
+                for comp in compositions}
         
 
     def get_structure(self,final=True,conventional_unit_cell=False):
@@ -199,8 +423,12 @@ class  MPDatabase:
             Structure object.
             
         """
-        with self.MPRester(self.API_KEY) as mpr:
-            structure = mpr.get_structure_by_material_id(self.mp_id,final=final,conventional_unit_cell=conventional_unit_cell)
+        def fetch(**kwargs):
+            with self._get_rester() as mpr:
+                return mpr.get_structure_by_material_id(**kwargs)
+
+        structure = self._query('get_structure',fetch,
+                                material_id=self.mp_id,final=final,conventional_unit_cell=conventional_unit_cell)
         return structure
 
     
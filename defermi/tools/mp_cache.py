@@ -0,0 +1,206 @@
+
+import hashlib
+import json
+import os
+import os.path as op
+import threading
+import time
+
+from monty.json import MontyDecoder, MontyEncoder
+
+
+def get_default_cache_dir():
+    """
+    Default directory of the Materials Project cache. Set with the environment variable
+    "DEFERMI_MP_CACHE", otherwise "~/.defermi/mp_cache".
+    """
+    return os.environ.get('DEFERMI_MP_CACHE',op.join(op.expanduser('~'),'.defermi','mp_cache'))
+
+
+class MPCache:
+
+    def __init__(self,path=None,ttl=None,max_size=500e6):
+        """
+        Persistent on-disk cache for Materials Project queries. Every query is stored as
+        a json file named after the hash of the query parameters (see `get_key`).
+        Results are encoded with `MontyEncoder`, so MSONable objects (entries, PhaseDiagram,
+        Structure) are restored as such. The modification time of each file is set to the
+        timestamp of the result and the access time to its last use, so that eviction does
+        not need to read the results.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the cache. If None `get_default_cache_dir()` is used.
+        ttl : float
+            Time to live of cached results in seconds. Expired results are treated as missing.
+            If None results never expire.
+        max_size : float
+            Maximum size of the cache in bytes. When exceeded, the least recently used results
+            are removed. If None the size is not limited.
+        """
+        self.path = path or get_default_cache_dir()
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.path,exist_ok=True)
+
+    def __contains__(self,key):
+        return self._read(key) is not None
+
+    def __len__(self):
+        return len(self._get_files())
+
+    @staticmethod
+    def get_key(query,**params):
+        """
+        Get cache key (str) from the query name (e.g. the MPDatabase method) and its parameters.
+        """
+        return json.dumps({'query':query,'params':params},sort_keys=True,default=str)
+
+    def get(self,key,default=None):
+        """
+        Get cached result. If not present or expired `default` is returned.
+        """
+        record = self._read(key)
+        if record is None:
+            return default
+        path = self._get_file_path(key)
+        try:
+            os.utime(path,(time.time(),op.getmtime(path))) # last access time for eviction
+        except OSError: # removed or being replaced by another process
+            pass
+        return MontyDecoder().process_decoded(record['data'])
+
+    def set(self,key,value,timestamp=None):
+        """
+        Store result in the cache and evict least recently used results if `max_size` is exceeded.
+        """
+        record = {
+            'key':key,
+            'timestamp':timestamp or time.time(),
+            'data':json.loads(json.dumps(value,cls=MontyEncoder))
+            }
+        path = self._get_file_path(key)
+        # write to temporary file first so that concurrent readers never see incomplete results
+        tmp_path = path + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path,'w') as file:
+            json.dump(record,file)
+        os.replace(tmp_path,path)
+        os.utime(path,(time.time(),record['timestamp']))
+        self.evict()
+
+    def delete(self,key):
+        """
+        Remove result from the cache.
+        """
+        path = self._get_file_path(key)
+        if op.isfile(path):
+            os.remove(path)
+
+    def clear(self):
+        """
+        Remove all results from the cache.
+        """
+        for path in self._get_files():
+            os.remove(path)
+
+    def evict(self):
+        """
+        Remove expired results, then least recently used results until the size of the
+        cache is below `max_size`.
+        """
+        files = []
+        for path in self._get_files():
+            try:
+                stat = os.stat(path)
+                if self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+                    os.remove(path)
+                    continue
+                files.append((stat.st_atime,stat.st_size,path))
+            except OSError: # removed or being replaced by another process
+                continue
+        if self.max_size is None:
+            return
+        size = sum(f[1] for f in files)
+        for _, fsize, path in sorted(files):
+            if size <= self.max_size:
+                break
+            if op.isfile(path):
+                os.remove(path)
+            size -= fsize
+
+    def export(self,path):
+        """
+        Export all results to a single json file, which can be used to prepopulate
+        caches on other machines (see `prepopulate`).
+        """
+        records = []
+        for fpath in self._get_files():
+            with open(fpath) as file:
+                records.append(json.load(file))
+        with open(path,'w') as file:
+            json.dump({'records':records},file)
+
+    def prepopulate(self,path,overwrite=False):
+        """
+        Import results from a json file created with `export`.
+
+        Parameters
+        ----------
+        path : str
+            Path to the exported json file.
+        overwrite : bool
+            Overwrite results already present in the cache.
+
+        Returns
+        -------
+        nrecords : int
+            Number of imported results.
+        """
+        with open(path) as file:
+            records = json.load(file)['records']
+        nrecords = 0
+        for record in records:
+            fpath = self._get_file_path(record['key'])
+            if op.isfile(fpath) and not overwrite:
+                continue
+            with open(fpath,'w') as file:
+                json.dump(record,file)
+            os.utime(fpath,(time.time(),record['timestamp']))
+            nrecords += 1
+        self.evict()
+        return nrecords
+
+    def _get_file_path(self,key):
+        return op.join(self.path,hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def _get_files(self):
+        return [op.join(self.path,f) for f in os.listdir(self.path) if f.endswith('.json')]
+
+    def _read(self,key):
+        """
+        Read record of `key`. Missing, expired or corrupted records (e.g. truncated files)
+        are treated as cache misses, expired and corrupted files are removed.
+        """
+        path = self._get_file_path(key)
+        try:
+            with open(path) as file:
+                record = json.load(file)
+        except OSError: # missing, or removed by another process
+            return None
+        except ValueError: # truncated or corrupted file
+            self._remove(path)
+            return None
+        if record['key'] != key:
+            return None
+        if self.ttl is not None and time.time() - record['timestamp'] > self.ttl:
+            self._remove(path)
+            return None
+        return record
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError: # already removed by another process
+            pass
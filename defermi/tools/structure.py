@@ -10,13 +10,10 @@ import numpy as np
 import os.path as op
 import os
 import collections
-from scipy.spatial import KDTree
-from ase.visualize import view
 from pymatgen.util.coord import pbc_shortest_vectors
 from pymatgen.core.periodic_table import Element
 from pymatgen.core.composition import Composition
 from pymatgen.core.structure import Structure
-from pymatgen.core.trajectory import Trajectory
 
 
 def _get_distance_vector_and_image(lattice,frac_coords1,frac_coords2,jimage=None):
@@ -135,6 +132,7 @@ def get_displacement_vectors(structures):
         Displacement vectors in cartesian coordinates.
 
     """
+    from pymatgen.core.trajectory import Trajectory
     traj = Trajectory.from_structures(structures,constant_lattice=True) #order of structures determines ref in traj
     traj.to_displacements()
     disp = traj.coords[1]
@@ -259,6 +257,7 @@ def is_site_in_structure_coords(site, structure, tol=1e-3, return_distance=False
 
     # Convert structure sites to fractional coordinates
     frac_coords_structure = np.array([s.frac_coords % 1 for s in structure]) # ensure no negative coords
+    from scipy.spatial import KDTree
     kdtree_structure = KDTree(frac_coords_structure, boxsize=1.0)  # Take periodicity into account
 
     # Query the KDTree for nearest neighbor
@@ -371,6 +370,7 @@ def view_structures_with_ase(structures):
             atoms.append(s.to_ase_atoms())
     else:
         atoms = structures.to_ase_atoms()
+    from ase.visualize import view
     view(atoms)
     return
 
@@ -411,6 +411,7 @@ def write_xdatcar_from_structures(structures,file='XDATCAR'):
     file : str
         Path to write XDATCAR to.
     """
+    from pymatgen.core.trajectory import Trajectory
     traj = Trajectory.from_structures(structures,constant_lattice=True) 
     if not op.exists(op.dirname(file)):
         os.makedirs(op.dirname(file))
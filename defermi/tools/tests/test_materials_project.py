@@ -7,7 +7,7 @@ Created on Tue May 16 10:24:50 2023
 """
 import json
 
-from defermi.tools.materials_project import MPDatabase
+from defermi.tools.materials_project import MPDatabase, clear_session_store
 
 from defermi.testing.core import DefermiTest
 from defermi.testing.structure import StructureTest
@@ -29,3 +29,93 @@ class TestMPDatabase(DefermiTest):
                 desired = -743.3118525
                 self.assertEqual(actual, desired)
         
+
+
+class FixtureRester:
+    """
+    Local stand-in of MPRester serving data from a phase diagram, records the requests.
+    """
+    requests = []
+    pd = None
+
+    def __init__(self,API_KEY=None):
+        self.materials = self
+        self.thermo = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        return
+
+    def get_entries(self,chemsys_formula_mpids,**kwargs):
+        from pymatgen.core.composition import Composition
+        FixtureRester.requests.append(('get_entries',chemsys_formula_mpids))
+        formulas = [Composition(c).reduced_formula for c in chemsys_formula_mpids]
+        return [e for e in self.pd.all_entries if e.composition.reduced_formula in formulas]
+
+    def search(self,formula,**kwargs):
+        from types import SimpleNamespace
+        from pymatgen.core.composition import Composition
+        FixtureRester.requests.append(('search',formula))
+        formulas = [Composition(f).reduced_formula for f in (formula if type(formula) == list else [formula])]
+        return [SimpleNamespace(composition=e.composition,energy_per_atom=e.energy_per_atom) 
+                for e in self.pd.stable_entries if e.composition.reduced_formula in formulas]
+
+    def get_phase_diagram_from_chemsys(self,chemsys,thermo_type):
+        from pymatgen.analysis.phase_diagram import PhaseDiagram
+        FixtureRester.requests.append(('get_phase_diagram_from_chemsys',chemsys))
+        elements = chemsys.split('-')
+        return PhaseDiagram([e for e in self.pd.all_entries if all(el.symbol in elements for el in e.composition.elements)])
+
+
+class TestMPDatabaseBatch(DefermiTest):
+
+    def setUp(self):
+        import os.path as op
+        from pymatgen.analysis.phase_diagram import PhaseDiagram
+        from defermi.tools.utils import get_object_from_json
+        clear_session_store()
+        pd_path = op.join(op.dirname(op.dirname(op.dirname(__file__))),'chempots','tests','test_files','PD_Na-Nb-O.json')
+        FixtureRester.pd = get_object_from_json(PhaseDiagram,pd_path)
+        FixtureRester.requests = []
+        self.mpd = MPDatabase(cache=False,mp_rester=FixtureRester)
+
+    def tearDown(self):
+        clear_session_store()
+
+    def test_prefetch(self):
+        nrequests = self.mpd.prefetch(chemsys=['Na-Nb-O','NaNbO3','O-Nb-Na','Na-O'],
+                                      stable_compositions=['Na2O','Nb2O5','Na2O'],
+                                      entries_compositions=['NaNbO3','Na2O'])
+        # 2 phase diagrams, 1 search for all energies, 1 request for all entries
+        assert nrequests == 4
+        assert len(FixtureRester.requests) == 4
+
+        # later calls are served from the session store, also by other MPDatabase objects
+        mpd = MPDatabase(cache=False,mp_rester=FixtureRester)
+        pd = mpd.get_phase_diagram_from_chemsys('O-Na-Nb')
+        assert len(pd.elements) == 3
+        energies = mpd.get_stable_energies_pfu_from_compositions(['Na2O','Nb2O5'])
+        entry = [e for e in FixtureRester.pd.stable_entries if e.composition.reduced_formula == 'Na2O'][0]
+        nfu = entry.composition.get_reduced_composition_and_factor()[1]
+        self.assert_all_close(energies['Na2O'],entry.energy/nfu)
+        entries = mpd.get_entries_from_compositions(['Na2O'])
+        assert all(e.composition.reduced_formula == 'Na2O' for e in entries['Na2O'])
+        assert len(FixtureRester.requests) == 4
+        assert self.mpd.prefetch(chemsys=['Na-Nb-O'],stable_compositions=['Na2O']) == 0
+
+    def test_session_store_isolation(self):
+        entries = self.mpd.get_entries_from_compositions(['Na2O'])['Na2O']
+        nentries = len(entries)
+        # results are copies, changes do not affect later queries
+        entries[0].correction = 100
+        entries.clear()
+        entries = MPDatabase(cache=False,mp_rester=FixtureRester).get_entries_from_compositions(['Na2O'])['Na2O']
+        assert len(entries) == nentries
+        assert entries[0].correction != 100
+        assert len(FixtureRester.requests) == 1
+
+        # results are not shared between different API keys or resters
+        MPDatabase(API_KEY='other',cache=False,mp_rester=FixtureRester).get_entries_from_compositions(['Na2O'])
+        assert len(FixtureRester.requests) == 2
@@ -0,0 +1,109 @@
+
+import os
+import os.path as op
+import tempfile
+import time
+from unittest import mock
+
+from pymatgen.analysis.phase_diagram import PhaseDiagram
+
+from defermi.tools.materials_project import MPDatabase, clear_session_store
+from defermi.tools.mp_cache import MPCache
+from defermi.tools.utils import get_object_from_json
+
+from defermi.testing.core import DefermiTest
+
+
+class TestMPCache(DefermiTest):
+
+    def setUp(self):
+        clear_session_store()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        pd_path = op.join(op.dirname(op.dirname(op.dirname(__file__))),'chempots','tests','test_files','PD_Na-Nb-O.json')
+        self.pd = get_object_from_json(PhaseDiagram,pd_path)
+
+    def tearDown(self):
+        clear_session_store()
+        self.tmpdir.cleanup()
+
+    def test_cache(self):
+        cache = MPCache(op.join(self.tmpdir.name,'cache'),ttl=None,max_size=None)
+        key = MPCache.get_key('get_phase_diagram_from_chemsys',chemsys='Na-Nb-O',thermo_type='GGA_GGA+U')
+        assert key == MPCache.get_key('get_phase_diagram_from_chemsys',thermo_type='GGA_GGA+U',chemsys='Na-Nb-O')
+        assert key not in cache
+        cache.set(key,self.pd)
+        assert key in cache
+        pd = cache.get(key)
+        assert type(pd) == PhaseDiagram
+        assert len(pd.stable_entries) == len(self.pd.stable_entries)
+
+        cache.set('energy',[-10.5])
+        assert cache.get('energy') == [-10.5]
+        assert len(cache) == 2
+
+        # ttl
+        cache.ttl = 100
+        cache.set('old',1,timestamp=time.time()-200)
+        assert cache.get('old') is None
+        assert cache.get('energy') == [-10.5]
+
+        # size-based eviction removes least recently used results
+        cache.ttl = None
+        size = op.getsize(cache._get_file_path('energy'))
+        os.utime(cache._get_file_path(key),(0,0))
+        cache.max_size = 3*size
+        cache.evict()
+        assert key not in cache
+        assert cache.get('energy') == [-10.5]
+
+    def test_evict_from_file_times(self):
+        cache = MPCache(op.join(self.tmpdir.name,'cache'),ttl=100,max_size=None)
+        cache.set('old',1,timestamp=time.time()-200)
+        cache.set('new',2)
+        assert op.isfile(cache._get_file_path('old')) is False
+        # eviction uses file times and does not parse the stored results
+        with mock.patch('json.load',side_effect=AssertionError('results parsed during eviction')):
+            cache.set('other',3)
+            cache.evict()
+        assert cache.get('new') == 2
+
+    def test_concurrent_changes(self):
+        cache = MPCache(op.join(self.tmpdir.name,'cache'),ttl=100,max_size=None)
+        # truncated file is a cache miss and is removed
+        cache.set('energy',[-10.5])
+        path = cache._get_file_path('energy')
+        with open(path,'r+') as file:
+            file.truncate(10)
+        assert cache.get('energy') is None
+        assert not op.isfile(path)
+
+        # files removed by another process between read and access time update, or before expiration
+        cache.set('energy',[-10.5])
+        with mock.patch('os.utime',side_effect=FileNotFoundError):
+            assert cache.get('energy') == [-10.5]
+        cache.ttl = None
+        cache.set('old',1,timestamp=time.time()-200)
+        cache.ttl = 100
+        with mock.patch('os.remove',side_effect=FileNotFoundError) as remove:
+            assert cache.get('old') is None
+        assert remove.called
+
+    def test_export_prepopulate_offline(self):
+        cache = MPCache(op.join(self.tmpdir.name,'cache'))
+        key = MPCache.get_key('get_phase_diagram_from_chemsys',chemsys='Na-Nb-O',thermo_type='GGA_GGA+U')
+        cache.set(key,self.pd)
+        cache.set(MPCache.get_key('get_stable_energy_pfu_from_composition',formula='Na2O',thermo_types=['GGA_GGA+U']),[-11.5])
+        path = op.join(self.tmpdir.name,'mp_cache_export.json')
+        cache.export(path)
+
+        offline_cache = MPCache(op.join(self.tmpdir.name,'offline_cache'))
+        assert offline_cache.prepopulate(path) == 2
+        assert offline_cache.prepopulate(path) == 0
+        mpd = MPDatabase(cache=offline_cache,offline=True)
+        pd = mpd.get_phase_diagram_from_chemsys('Na-Nb-O')
+        assert len(pd.stable_entries) == len(self.pd.stable_entries)
+        assert mpd.get_stable_energy_pfu_from_composition('Na2O') == -11.5
+        with self.assertRaises(ValueError):
+            mpd.get_phase_diagram_from_chemsys('Sr-Ti-O')
+        with self.assertRaises(ValueError):
+            MPDatabase(cache=False,offline=True).get_entries('SiO2')
@@ -16,7 +16,9 @@ from monty.json import MontyDecoder
 from pymatgen.core.composition import Composition
 
 from defermi import DefectsAnalysis
-from defermi.plotter import plot_pO2_vs_fermi_level
+from defermi.plotter import plot_pO2_vs_fermi_level, plot_pO2_vs_concentrations, plot_variable_species_vs_concentrations
+from defermi.gui.cache import get_computation_cache, get_brouwer_job, get_doping_job
+from defermi.gui.jobs import get_job_runner, rerun_while_running, show_sweep_status
 
 sns.set_theme(context='talk',style='whitegrid')
 
@@ -447,8 +449,7 @@ if "da" in st.session_state and band_gap:
                         ylim = ylim if set_ylim else None
 
                     with cols[0]:
-                        fig2 = brouwer_da.plot_brouwer_diagram(
-                            bulk_dos=dos,
+                        job = get_brouwer_job(
                             temperature=temperature,
                             quench_temperature=quench_temperature,
                             quenched_species=quenched_species,
@@ -457,18 +458,24 @@ if "da" in st.session_state and band_gap:
                             oxygen_ref=oxygen_ref,
                             pressure_range=pressure_range,
                             external_defects=external_defects,
-                            figsize=figsize,
-                            fontsize=fontsize,
                             npoints=npoints,
-                            xlim=xlim,
-                            ylim=ylim,
-                            colors=colors,
                         )
-                        fig2.grid()
-                        fig2.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
-                        fig2.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
-                        st.session_state.brouwer_thermodata = brouwer_da.thermodata
-                        st.pyplot(fig2, clear_figure=False, width="content")
+                        sweep = get_job_runner().submit('brouwer',job,brouwer_da,dos,cache=get_computation_cache())
+                        brouwer_thermodata = show_sweep_status(sweep)
+                        if brouwer_thermodata:
+                            fig2 = plot_pO2_vs_concentrations(
+                                thermodata=brouwer_thermodata,
+                                figsize=figsize,
+                                fontsize=fontsize,
+                                xlim=xlim,
+                                ylim=ylim,
+                                colors=colors,
+                            )
+                            fig2.grid()
+                            fig2.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
+                            fig2.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
+                            st.session_state.brouwer_thermodata = brouwer_thermodata
+                            st.pyplot(fig2, clear_figure=False, width="content")
 
 #### DOPING DIAGRAM ####
 
@@ -498,24 +505,29 @@ if "da" in st.session_state and band_gap:
                         ylim = ylim if set_ylim else None
 
                     with cols[0]:
-                        fig3 = da.plot_doping_diagram(
+                        job = get_doping_job(
                             variable_defect_specie=dopant,
                             concentration_range=conc_range,
                             chemical_potentials=st.session_state.chempots,
-                            bulk_dos=dos,
                             temperature=temperature,
                             quench_temperature=quench_temperature,
                             quenched_species=quenched_species,
-                            figsize=figsize,
-                            fontsize=fontsize,
                             npoints=npoints,
-                            xlim=xlim,
-                            ylim=ylim
                         )
-                        fig3.grid()
-                        fig3.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
-                        fig3.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
-                        st.pyplot(fig3, clear_figure=False, width=fig_width_in_pixels)
+                        sweep = get_job_runner().submit('doping',job,da,dos,cache=get_computation_cache())
+                        doping_thermodata = show_sweep_status(sweep)
+                        if doping_thermodata:
+                            fig3 = plot_variable_species_vs_concentrations(
+                                doping_thermodata,
+                                figsize=figsize,
+                                fontsize=fontsize,
+                                xlim=xlim,
+                                ylim=ylim
+                            )
+                            fig3.grid()
+                            fig3.xlabel(plt.gca().get_xlabel(), fontsize=label_size)
+                            fig3.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
+                            st.pyplot(fig3, clear_figure=False, width=fig_width_in_pixels)
 
 #### MUE DIAGRAM ####
 
@@ -540,4 +552,4 @@ if "da" in st.session_state and band_gap:
                     fig4.ylabel(plt.gca().get_ylabel(), fontsize=label_size)
                     st.pyplot(fig4, clear_figure=False, width=fig_width_in_pixels)
 
-    
\ No newline at end of file
+    rerun_while_running()